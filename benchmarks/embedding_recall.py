@@ -0,0 +1,74 @@
+"""Recall and footprint of reduced-dimension and int8 event vectors.
+
+Copies a case's stored vectors into throwaway stores, one per encoding, and runs the
+same queries against each. Ground truth is an exact search over the full float32
+vectors. Queries are stored vectors with a little noise, and each query's own event
+is left out of its results.
+
+    python -m benchmarks.embedding_recall --case "Case A" --variants float32:1536 int8:1536 int8:512 int8:256
+
+Nothing is written outside a temporary directory.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+import numpy as np
+from helper.vector_store import VectorStore, get_vector_store
+
+
+def _copy(source: VectorStore, target: VectorStore, ids, dim) -> None:
+    for start in range(0, len(ids), 10000):
+        batch = ids[start:start + 10000]
+        target.add(batch, np.stack([source.get(i) for i in batch])[:, :dim])
+
+
+def _top(store: VectorStore, query, k: int, exclude: str):
+    return [event_id for event_id, _ in store.search(query, k + 1) if event_id != exclude][:k]
+
+
+def main(case, variants, queries, k, noise, seed):
+    source = get_vector_store(case)
+    ids = source.ids()
+    if not ids:
+        raise SystemExit(f"No vectors stored for case {case!r}")
+    full_dim = source.get(ids[0]).shape[0]
+
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(ids), size=min(queries, len(ids)), replace=False)
+    probes = []
+    for i in picked:
+        vector = source.get(ids[i])
+        probes.append((ids[i], vector + rng.normal(0, noise, size=vector.shape).astype(np.float32)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = VectorStore(Path(tmp) / "exact", "float32")
+        _copy(source, exact, ids, None)
+        truth = {event_id: set(_top(exact, q, k, event_id)) for event_id, q in probes}
+
+        print(f"{len(ids)} vectors, {len(probes)} queries, recall@{k}")
+        print(f"{'variant':>14} {'bytes/vector':>13} {'vs float32':>11} {'vs float64':>11} {'recall':>8}")
+        for variant in variants:
+            dtype, dim = variant.split(":")
+            dim = min(int(dim), full_dim)
+            store = VectorStore(Path(tmp) / variant.replace(":", "_"), dtype)
+            _copy(source, store, ids, dim)
+            # Queries are truncated to the store's size inside search()
+            hits = [len(truth[event_id] & set(_top(store, q, k, event_id))) / max(len(truth[event_id]), 1)
+                    for event_id, q in probes]
+            size = dim * np.dtype(dtype).itemsize + (4 if dtype == "int8" else 0)
+            print(f"{variant:>14} {size:>13} {full_dim * 4 / size:>10.1f}x {full_dim * 8 / size:>10.1f}x "
+                  f"{np.mean(hits):>8.3f}")
+            store.drop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--case", required=True, help="Case whose stored vectors are measured")
+    parser.add_argument("--variants", nargs="+", default=["float32:1536", "int8:1536", "float32:512", "int8:512", "int8:256"],
+                        help="dtype:dimensions encodings to compare")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors sampled from the case")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared per query")
+    parser.add_argument("--noise", type=float, default=0.01, help="Gaussian noise added to each query vector")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.case, args.variants, args.queries, args.k, args.noise, args.seed)
@@ -0,0 +1,63 @@
+"""Check that reads are routed to readers and still see the writes before them.
+
+Each round writes a counter on a throwaway case in a write session, then reads it
+back through a routed read session carrying the write's bookmarks. It prints which
+server answered and fails if a read ever returns a stale value.
+
+    python -m benchmarks.read_routing_check --rounds 50
+
+With a single instance (bolt:// or neo4j:// to one server) every read is answered by
+that server. Against a cluster, point NEO4J_URI at neo4j:// so reads spread over the
+secondaries; run with --no-bookmarks to see the stale reads bookmarks prevent.
+"""
+import argparse
+import asyncio
+from collections import Counter
+from database import graph_session, graph_read_session, _case_bookmarks, close_neo4j_connection
+
+CHECK_CASE = "__read_routing_check__"
+
+_WRITE = "MERGE (c:Case {name: $case}) SET c.routingCheck = $value"
+_READ = "MATCH (c:Case {name: $case}) RETURN c.routingCheck AS value"
+
+
+async def _read(tx):
+    result = await tx.run(_READ, case=CHECK_CASE)
+    record = await result.single()
+    summary = await result.consume()
+    return record["value"], summary.server.address
+
+
+async def main(rounds, use_bookmarks):
+    servers = Counter()
+    stale = 0
+    for value in range(1, rounds + 1):
+        async with graph_session(CHECK_CASE) as s:
+            await (await s.run(_WRITE, case=CHECK_CASE, value=value)).consume()
+        if not use_bookmarks:
+            _case_bookmarks.pop(CHECK_CASE, None)
+
+        async with graph_read_session(CHECK_CASE) as s:
+            seen, address = await s.execute_read(_read)
+        servers[str(address)] += 1
+        if seen != value:
+            stale += 1
+            print(f"stale read from {address}: wrote {value}, read {seen}")
+
+    async with graph_session(CHECK_CASE) as s:
+        await (await s.run("MATCH (c:Case {name: $case}) DELETE c", case=CHECK_CASE)).consume()
+    await close_neo4j_connection()
+
+    for address, count in servers.most_common():
+        print(f"{address:>30} {count:>6} reads")
+    print(f"{stale} stale reads out of {rounds}")
+    if use_bookmarks and stale:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50, help="Write/read rounds")
+    parser.add_argument("--no-bookmarks", action="store_true", help="Read without the write's bookmarks")
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, not args.no_bookmarks))
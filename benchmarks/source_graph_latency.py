@@ -0,0 +1,141 @@
+"""Latency of the per-source graph query as the global REL edge count grows.
+
+Seeds a throwaway case with one measured source, then adds "noise" REL edges in a
+second throwaway case so only the global edge count changes between steps. Each
+step times the old two-query fetch with REL matched by an expression the planner
+cannot seek (as if there were no index) against the single query used by
+fetch_graph_data_new, which seeks the rel_event_id index from migration 1.
+
+    python -m benchmarks.source_graph_latency --steps 0 10000 100000 --repeat 20
+
+Every seeded node carries the BenchmarkSeed label and is deleted by that label at the
+end, even if the run fails. The schema is never changed.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from database import get_graph_driver, close_neo4j_connection
+from helper.neo4j_timeline import _SOURCE_GRAPH_QUERY
+
+BENCH_CASE = "__bench_source_graph__"
+NOISE_CASE = "__bench_source_graph_noise__"
+SOURCE_NAME = "bench-source"
+SEED_LABEL = "BenchmarkSeed"
+
+_LEGACY_NODES = """
+MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
+WHERE f.sourceId = $source_id
+RETURN DISTINCT e.name AS name, e.type AS type
+"""
+
+# `r.eventId + ''` keeps the planner off rel_event_id, standing in for the unindexed schema
+_LEGACY_LINKS = """
+MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)
+WHERE f.sourceId = $source_id
+MATCH (e1:Entity)-[r:REL]->(e2:Entity)
+WHERE r.eventId + '' = ev.id
+RETURN DISTINCT e1.name AS source, e2.name AS target, r.relType AS relType
+"""
+
+_SEED_SOURCE = f"""
+MERGE (c:Case {{name: $case}})
+SET c:{SEED_LABEL}
+MERGE (f:Source {{case: $case, name: $source}})
+SET f:{SEED_LABEL}, f.sourceId = $source
+MERGE (c)-[:HAS_FILE]->(f)
+WITH f
+UNWIND range(1, $events) AS i
+MERGE (ev:Event {{id: $case + '-ev-' + i}})
+SET ev:{SEED_LABEL}, ev.case = $case
+MERGE (f)-[:HAS_EVENT]->(ev)
+MERGE (a:Entity {{case: $case, name: 'entity-' + (i % 50)}})
+SET a:{SEED_LABEL}
+MERGE (b:Entity {{case: $case, name: 'entity-' + ((i + 1) % 50)}})
+SET b:{SEED_LABEL}
+MERGE (ev)-[:INVOLVES]->(a)
+MERGE (ev)-[:INVOLVES]->(b)
+MERGE (a)-[:REL {{relType: 'related_to', eventId: ev.id}}]->(b)
+RETURN f.sourceId AS sourceId
+"""
+
+_SEED_NOISE = f"""
+MERGE (a:Entity {{case: $case, name: 'noise-a'}})
+SET a:{SEED_LABEL}
+MERGE (b:Entity {{case: $case, name: 'noise-b'}})
+SET b:{SEED_LABEL}
+WITH a, b
+UNWIND range($start, $end - 1) AS i
+CREATE (a)-[:REL {{relType: 'noise', eventId: $case + '-ev-' + i}}]->(b)
+"""
+
+# Relationships first, in batches, so the noise entities are not deleted in one huge transaction
+_CLEANUP = [
+    f"MATCH (:{SEED_LABEL})-[r]->() CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF 10000 ROWS",
+    f"MATCH (n:{SEED_LABEL}) CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF 10000 ROWS",
+]
+
+_REL_INDEX_ONLINE = """
+SHOW INDEXES YIELD name, state
+WHERE name = 'rel_event_id' AND state = 'ONLINE'
+RETURN count(*) AS n
+"""
+
+
+async def _time(session, query, repeat, **params):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await (await session.run(query, **params)).consume()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def _legacy(session, repeat, **params):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await (await session.run(_LEGACY_NODES, **params)).consume()
+        await (await session.run(_LEGACY_LINKS, **params)).consume()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def main(steps, events, repeat, batch):
+    driver = get_graph_driver()
+    async with driver.session() as s:
+        if not (await (await s.run(_REL_INDEX_ONLINE)).single())["n"]:
+            raise SystemExit("rel_event_id is missing or not ONLINE; run python -m data_processing.schema_migrations")
+        try:
+            record = await (await s.run(_SEED_SOURCE, case=BENCH_CASE, source=SOURCE_NAME, events=events)).single()
+            source_id = record["sourceId"]
+            params = {"case": BENCH_CASE, "source_id": source_id}
+
+            print(f"{'global REL':>12} {'legacy, no index (ms)':>22} {'single query + index (ms)':>27}")
+            seeded = 0
+            for target in steps:
+                while seeded < target:
+                    upper = min(target, seeded + batch)
+                    await (await s.run(_SEED_NOISE, case=NOISE_CASE, start=seeded, end=upper)).consume()
+                    seeded = upper
+
+                legacy = await _legacy(s, repeat, **params)
+                indexed = await _time(s, _SOURCE_GRAPH_QUERY, repeat, **params)
+
+                total = (await (await s.run("MATCH ()-[r:REL]->() RETURN count(r) AS n")).single())["n"]
+                print(f"{total:>12} {legacy:>22.2f} {indexed:>27.2f}")
+        finally:
+            for statement in _CLEANUP:
+                await (await s.run(statement)).consume()
+    await close_neo4j_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[0, 10_000, 100_000, 1_000_000],
+                        help="Noise REL edge counts to measure at")
+    parser.add_argument("--events", type=int, default=200, help="Events in the measured source")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (median reported)")
+    parser.add_argument("--batch", type=int, default=50_000, help="Noise edges created per transaction")
+    args = parser.parse_args()
+    asyncio.run(main(args.steps, args.events, args.repeat, args.batch))
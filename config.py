@@ -1,6 +1,7 @@
 import os
 import secrets
 from pydantic_settings import BaseSettings
+from typing import Optional
 from pydantic import Field
 from dotenv import load_dotenv
 load_dotenv()
@@ -15,6 +16,66 @@ class Settings(BaseSettings):
     # MongoDB settings
     MONGODB_URL: str = Field(default="mongodb://localhost:27017", description="MongoDB connection string")
     MONGODB_DB_NAME: str = Field(default="CaseThreadDB", description="MongoDB database name")
+
+    # Neo4j settings
+    NEO4J_URI: str = Field(default="neo4j+s://localhost:7687", description="Neo4j connection URI")
+    NEO4J_USER: str = Field(default="neo4j", description="Neo4j user name")
+    NEO4J_PASSWORD: str = Field(default="password", description="Neo4j password")
+    NEO4J_DATABASE: str = Field(default="", description="Neo4j database name; empty uses the server default")
+    NEO4J_MAX_POOL_SIZE: int = Field(default=50, description="Maximum connections kept in the Neo4j driver pool")
+    NEO4J_ACQUISITION_TIMEOUT: float = Field(default=30.0, description="Seconds to wait for a free pooled Neo4j connection")
+    NEO4J_MIGRATE_ON_STARTUP: bool = Field(default=True, description="Apply pending Neo4j schema migrations at startup")
+    NEO4J_BOOKMARK_MAX_CASES: int = Field(default=1024, description="Cases whose last write bookmarks are remembered for later reads")
+    NEO4J_BOOKMARK_TTL_SECONDS: float = Field(default=60.0, description="Seconds a case's write bookmarks are waited on; set well above the cluster's replication lag")
+
+    # Response cache settings
+    RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=1024, description="Maximum cached timeline/graph responses per process")
+    RESPONSE_CACHE_TTL_SECONDS: float = Field(default=300.0, description="Seconds a cached timeline/graph response stays valid")
+    TIMELINE_EXPORT_FETCH_SIZE: int = Field(default=500, description="Records pulled per batch when streaming a timeline export")
+    TIMELINE_SEARCH_MAX_HITS: int = Field(default=10000, description="Most full-text hits ranked per timeline keyword search")
+    CHANGE_LOG_RETENTION: int = Field(default=5000, description="Change log versions kept per case for delta sync")
+
+    # Embedding / semantic search settings
+    EMBEDDING_MODEL: str = Field(default="text-embedding-3-small", description="OpenAI model used for event and query embeddings")
+    EMBEDDING_DIMENSIONS: Optional[int] = Field(default=None, description="Shorten embeddings to this many dimensions (text-embedding-3 models); None keeps the model's full size")
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = Field(default=2048, description="Search query embeddings kept per process")
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: float = Field(default=86400.0, description="Seconds a cached query embedding stays valid")
+    SEMANTIC_SEARCH_EXACT_MAX_EVENTS: int = Field(default=5000, description="Cases up to this many timeline rows are scored exactly in NumPy")
+    SEMANTIC_SEARCH_OVERSAMPLE: int = Field(default=20, description="Vector index candidates fetched per requested result")
+    SEMANTIC_SEARCH_VECTOR_MAX_CANDIDATES: int = Field(default=20000, description="Most vector index candidates fetched before a case falls back to exact scoring")
+    SEMANTIC_SEARCH_INDEX_COUNT_TTL_SECONDS: float = Field(default=300.0, description="Seconds the event count of the whole vector index is reused when sizing candidate requests")
+
+    # Event vector store settings
+    VECTOR_STORE_DIR: str = Field(default="./vector_store", description="Directory holding the per-case memory-mapped embedding stores")
+    VECTOR_STORE_DTYPE: str = Field(default="float32", description="Encoding of new vector stores: float32, or int8 with a per-row scale")
+    VECTOR_STORE_IVF_MIN_ROWS: int = Field(default=20000, description="Build an IVF index for a case once its store reaches this many rows")
+    VECTOR_STORE_IVF_NPROBE: int = Field(default=8, description="IVF lists scanned per nearest-neighbour query")
+    EVENT_EMBEDDINGS_IN_GRAPH: bool = Field(default=False, description="Also keep embeddings as Event.embedding in Neo4j")
+
+    # Entity adjacency cache settings
+    ADJACENCY_CACHE_MAX_CASES: int = Field(default=32, description="Case entity graphs kept in memory for path/neighbourhood queries")
+    ADJACENCY_RECHECK_SECONDS: float = Field(default=5.0, description="Seconds between change-version checks of a cached entity graph")
+
+    # Graph layout settings
+    GRAPH_LAYOUT_WORKERS: int = Field(default=2, description="Worker processes computing server-side graph layouts")
+    GRAPH_LAYOUT_ITERATIONS: int = Field(default=300, description="Force-directed layout iterations")
+    GRAPH_LAYOUT_WIDTH: float = Field(default=1000.0, description="Width and height of the precomputed layout canvas")
+    INGEST_REL_BATCH_SIZE: int = Field(default=1000, description="REL triples written per UNWIND query during ingest")
+    INGEST_CHUNK_ROWS: int = Field(default=200, description="Events written per ingest transaction")
+    INGEST_MAX_RETRIES: int = Field(default=5, description="Times a failed ingest transaction is retried after the driver gives up")
+    INGEST_RETRY_BASE_DELAY: float = Field(default=0.5, description="Seconds before the first ingest retry; doubles on each attempt")
+    EMBEDDING_QUEUE_SIZE: int = Field(default=10000, description="Statements waiting to be embedded before callers block")
+    EMBEDDING_CONCURRENCY: int = Field(default=4, description="Embedding API requests in flight at once")
+    EMBEDDING_BATCH_MAX_TOKENS: int = Field(default=100000, description="Token budget of one embedding request")
+    EMBEDDING_BATCH_MAX_INPUTS: int = Field(default=2048, description="Inputs in one embedding request")
+    EMBEDDING_INPUT_MAX_TOKENS: int = Field(default=8191, description="Longer statements are truncated to this many tokens")
+    EMBEDDING_BATCH_WAIT_MS: int = Field(default=20, description="Milliseconds a batch waits for more statements before it is sent")
+    DELETE_BATCH_ROWS: int = Field(default=5000, description="Nodes deleted per transaction when purging sources and cases")
+    DELETION_BATCH_DOCUMENTS: int = Field(default=100, description="Documents (files and records) purged per batch by the deletion worker")
+    DELETION_MAX_ATTEMPTS: int = Field(default=5, description="Attempts before a deletion job is marked failed")
+    DELETION_RETRY_BASE_DELAY: float = Field(default=5.0, description="Seconds before a failed deletion job is retried; doubles on each attempt")
+    DELETION_LEASE_SECONDS: float = Field(default=600.0, description="Seconds a running deletion job may go without a heartbeat before it is assumed abandoned and retried")
+    DELETION_POLL_SECONDS: float = Field(default=5.0, description="Seconds between deletion queue checks when idle")
     
     # Security settings
     # SECRET_KEY: str = Field(default=secrets.token_hex(32), description="Secret key for JWT")
@@ -5,9 +5,12 @@ from fastapi import HTTPException
 from dotenv import load_dotenv
 from data_processing.data_parsing import parse_file
 from data_processing.graph_db import neo4j_data_ingestor
+from bson import ObjectId
+from helper.neo4j_timeline import delete_case_from_neo4j, delete_file_from_neo4j
 from database import get_database
 from data_processing.data_parsing import error_logger
 from helper.scraper import scrape_content
+from helper.response_cache import response_cache
 from llama_index.llms.openai import OpenAI
 from typing import Dict, Any, List
 from datetime import datetime, timezone
@@ -89,11 +92,32 @@ def clean_source(source: str) -> str:
     return re.sub(r"^uploads[\\/]", "", source)
 
 
+async def _deleting(db, doc) -> bool:
+    """Whether the document (or its case) was deleted or marked deleting since it was picked up."""
+    current = await db.documents.find_one({"_id": doc["_id"]}, {"deleting": 1})
+    return current is None or bool(current.get("deleting"))
+
+
+async def _discard_ingested(db, doc, case_id: str, source_url: str) -> None:
+    """Remove graph data pushed for a document that was deleted while it was ingesting.
+
+    The deletion worker may already have purged the graph, so the push would have
+    brought the Source (or, for a deleted case, the Case) back.
+    """
+    case = await db.cases.find_one({"_id": ObjectId(case_id)}, {"deleting": 1})
+    if case is None or case.get("deleting"):
+        await delete_case_from_neo4j(case_id)
+    else:
+        await delete_file_from_neo4j(case_id, source_url)
+    print(f"[INFO] Document {doc['_id']} was deleted during ingestion; discarded its graph data")
+
+
 async def process_data(db, limit=10):
     try:
         pending_docs = db.documents.find({
             "status": "pending",
-            "is_md_file": True
+            "is_md_file": True,
+            "deleting": {"$ne": True}
         }).sort("created_at", 1).limit(limit)
         
         pending_docs_data = await pending_docs.to_list(length=limit)
@@ -114,6 +138,9 @@ async def process_data(db, limit=10):
             )
         for doc in pending_docs_data:
             try:
+                # Deleted while waiting in this batch
+                if await _deleting(db, doc):
+                    continue
                 file_path = doc["md_file_path"]
                 source_url = doc.get("document_url") if doc["document_type"] == 'link' else clean_source(doc['file_path'])
                 case_id = doc.get("case_id")
@@ -130,7 +157,16 @@ async def process_data(db, limit=10):
                     continue
                 
                 # Push to Neo4j with embbedding
-                await neo4j_data_ingestor.push(case_id, source_url, doc_title, json_data)
+                # The Mongo document id doubles as the stable, indexed Source id in the graph
+                source_id = str(doc["_id"])
+                if await _deleting(db, doc):
+                    continue
+                await neo4j_data_ingestor.push(case_id, source_url, doc_title, json_data, source_id=source_id)
+                response_cache.bump(case_id)
+                # Deleted while the push ran; the purge may have missed what was written
+                if await _deleting(db, doc):
+                    await _discard_ingested(db, doc, case_id, source_url)
+                    continue
                 
                 # wihout embbeding
                 # push_to_neo4j(case_id, source_url, json_data)
@@ -145,7 +181,7 @@ async def process_data(db, limit=10):
                 # Update document status
                 await db.documents.update_one(
                     {"_id": doc["_id"]},
-                    {"$set": {"status": "processed", "updated_at": datetime.now(timezone.utc)}}
+                    {"$set": {"status": "processed", "source_id": source_id, "updated_at": datetime.now(timezone.utc)}}
                 )
 
             except Exception as err:
@@ -162,7 +198,7 @@ async def process_data(db, limit=10):
 # Create markdown file from document
 async def create_markdown_file(db, limit: int=10):
     try:
-        document = db.documents.find({"is_md_file": {"$ne": True}, "status": "pending", "document_type": "file"}).sort("created_at", 1).limit(limit)
+        document = db.documents.find({"is_md_file": {"$ne": True}, "status": "pending", "document_type": "file", "deleting": {"$ne": True}}).sort("created_at", 1).limit(limit)
         pending_docs_data = await document.to_list(length=limit)
        
         if not pending_docs_data:
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import tiktoken
+from openai import AsyncOpenAI
+from pymongo import UpdateOne
+from config import settings
+from database import get_database
+
+# Statement embeddings with a persistent cache.
+# Vectors are stored in the Mongo `embedding_cache` collection, keyed by a hash of
+# (model, dimensions, text). Re-ingesting a document, or a statement shared between
+# documents, reuses the stored vector instead of paying for another API call.
+
+embedding_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def embedding_options() -> Dict[str, Any]:
+    """Extra embeddings.create arguments; `dimensions` only when a shortened size is configured."""
+    return {"dimensions": settings.EMBEDDING_DIMENSIONS} if settings.EMBEDDING_DIMENSIONS else {}
+
+
+# Full output size of the supported models, for when EMBEDDING_DIMENSIONS is not set
+MODEL_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+
+def embedding_dimensions() -> int:
+    """Size of the vectors the configured model and EMBEDDING_DIMENSIONS produce."""
+    return settings.EMBEDDING_DIMENSIONS or MODEL_DIMENSIONS.get(settings.EMBEDDING_MODEL, 1536)
+
+
+def embedding_cache_key(text: str, model: str, dimensions: Optional[int] = None) -> str:
+    return hashlib.sha256(f"{model}|{dimensions or 0}|{text}".encode()).hexdigest()
+
+
+def _closed() -> RuntimeError:
+    return RuntimeError("Embedding service closed")
+
+
+class EmbeddingService:
+    """Shared, bounded queue of texts to embed.
+
+    A single dispatcher drains the queue into batches capped at EMBEDDING_BATCH_MAX_TOKENS
+    tokens (counted with tiktoken) and EMBEDDING_BATCH_MAX_INPUTS inputs. Statements from
+    concurrent documents can share a batch. At most EMBEDDING_CONCURRENCY batches are in
+    flight at once, and every caller gets its own vectors back through a future.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._batches: Set[asyncio.Task] = set()
+        self._encoding = None
+
+    def _tokens(self, text: str) -> List[int]:
+        if self._encoding is None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(settings.EMBEDDING_MODEL)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        return self._encoding.encode(text)
+
+    def _fit(self, text: str) -> Tuple[str, int]:
+        """The text (cut to the per-input token limit) and its token count."""
+        tokens = self._tokens(text)
+        limit = settings.EMBEDDING_INPUT_MAX_TOKENS
+        if len(tokens) > limit:
+            return self._encoding.decode(tokens[:limit]), limit
+        return text, len(tokens)
+
+    def _ensure_started(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._queue = asyncio.Queue(maxsize=settings.EMBEDDING_QUEUE_SIZE)
+            self._semaphore = asyncio.Semaphore(settings.EMBEDDING_CONCURRENCY)
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Vectors for `texts`, in order; waits for queue space when the service is saturated."""
+        self._ensure_started()
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            await queue.put((*self._fit(text), future))
+            futures.append(future)
+            # The service was closed while this caller waited for queue space
+            if self._queue is not queue:
+                self._fail([(None, 0, future)], _closed())
+        return list(await asyncio.gather(*futures))
+
+    @staticmethod
+    def _fail(items, error: BaseException) -> None:
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _dispatch(self) -> None:
+        """Group queued texts into batches; a batch that cannot be sent fails its own callers only."""
+        carry = None
+        while True:
+            batch = []
+            acquired = False
+            try:
+                batch.append(carry or await self._queue.get())
+                carry = None
+                tokens = batch[0][1]
+                # Give concurrent callers a moment to add to this batch
+                deadline = asyncio.get_running_loop().time() + settings.EMBEDDING_BATCH_WAIT_MS / 1000
+                while len(batch) < settings.EMBEDDING_BATCH_MAX_INPUTS:
+                    timeout = deadline - asyncio.get_running_loop().time()
+                    try:
+                        item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                    except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                        break
+                    if tokens + item[1] > settings.EMBEDDING_BATCH_MAX_TOKENS:
+                        carry = item
+                        break
+                    batch.append(item)
+                    tokens += item[1]
+
+                await self._semaphore.acquire()
+                acquired = True
+                task = asyncio.create_task(self._run_batch(batch))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+            except asyncio.CancelledError:
+                self._fail(batch + ([carry] if carry else []), _closed())
+                raise
+            except Exception as e:
+                print(f"Embedding dispatch of {len(batch)} text(s) failed: {e}")
+                if acquired:
+                    self._semaphore.release()
+                self._fail(batch, e)
+
+    async def _run_batch(self, batch: List[Tuple[str, int, asyncio.Future]]) -> None:
+        try:
+            response = await embedding_client.embeddings.create(
+                model=settings.EMBEDDING_MODEL,
+                input=[text for text, _, _ in batch],
+                **embedding_options()
+            )
+            for (_, _, future), item in zip(batch, response.data):
+                if not future.done():
+                    future.set_result(item.embedding)
+        except Exception as e:
+            print(f"Embedding batch of {len(batch)} failed: {e}")
+            self._fail(batch, e)
+        finally:
+            self._semaphore.release()
+
+    async def close(self) -> None:
+        """Stop the dispatcher, let in-flight batches finish, and fail whatever is still queued."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, *self._batches, return_exceptions=True)
+            self._dispatcher = None
+            queue, self._queue = self._queue, None
+            while not queue.empty():
+                self._fail([queue.get_nowait()], _closed())
+
+
+embedding_service = EmbeddingService()
+
+
+async def embed_statements(texts: Sequence[str]) -> List[List[float]]:
+    """Embeddings for `texts` in order; only statements missing from the cache reach the API."""
+    model = settings.EMBEDDING_MODEL
+    keys = [embedding_cache_key(t, model, settings.EMBEDDING_DIMENSIONS) for t in texts]
+    unique = dict(zip(keys, texts))
+
+    db = await get_database()
+    found: Dict[str, List[float]] = {}
+    if db is not None and unique:
+        async for doc in db.embedding_cache.find({"_id": {"$in": list(unique)}}, {"embedding": 1}):
+            found[doc["_id"]] = doc["embedding"]
+
+    missing = [key for key in unique if key not in found]
+    if missing:
+        vectors = await embedding_service.embed([unique[key] for key in missing])
+        found.update(zip(missing, vectors))
+        if db is not None:
+            now = datetime.now(timezone.utc)
+            await db.embedding_cache.bulk_write([
+                UpdateOne(
+                    {"_id": key},
+                    {"$setOnInsert": {"model": model, "dimensions": len(vector), "embedding": vector, "created_at": now}},
+                    upsert=True
+                )
+                for key, vector in zip(missing, vectors)
+            ], ordered=False)
+
+    print(f"Embeddings: {len(unique) - len(missing)} cached, {len(missing)} requested")
+    return [found[key] for key in keys]
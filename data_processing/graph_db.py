@@ -1,32 +1,23 @@
 import re
 import os, hashlib
+import asyncio
+import random
 import pandas as pd
 from datetime import datetime, timezone
+from uuid import uuid4
 from typing import List, Dict, Any
-from neo4j import GraphDatabase, ResultSummary
+from neo4j import ResultSummary
+from neo4j.exceptions import TransientError, ServiceUnavailable, SessionExpired
 from openai import OpenAI, AsyncOpenAI
-from neo4j import AsyncGraphDatabase
+from config import settings
+from database import get_graph_driver, graph_session, run_read_single
+from data_processing.embeddings import embed_statements
+from helper.timeline_projection import adjust_entity_count, refresh_timeline_rows
+from helper.change_log import EVENT, ENTITY, RELATION, UPSERT, changes, record_changes
+from helper.vector_store import get_vector_store
+from helper.neo4j_timeline import delete_file_from_neo4j
 
-## Graphdb configuration
-URI      = os.getenv("NEO4J_URI", "neo4j+s://localhost:7687")
-USER     = os.getenv("NEO4J_USER", "neo4j")
-PASSWORD = os.getenv("NEO4J_PASSWORD", "password")  
-
-
-_CONSTRAINT_STATEMENTS = [
-    """CREATE CONSTRAINT case_name_unique IF NOT EXISTS\nFOR (c:Case) REQUIRE c.name IS UNIQUE""",
-    """CREATE CONSTRAINT source_unique IF NOT EXISTS\nFOR (f:Source) REQUIRE f.name IS UNIQUE""",
-    """CREATE CONSTRAINT event_id_unique IF NOT EXISTS\nFOR (ev:Event) REQUIRE ev.id IS UNIQUE""",
-    """CREATE CONSTRAINT entity_name_unique IF NOT EXISTS\nFOR (e:Entity) REQUIRE e.name IS UNIQUE""",
-    """CREATE INDEX event_date IF NOT EXISTS\nFOR (ev:Event) ON (ev.date)""",
-]
-
-def ensure_constraints() -> None:
-    """Create constraints / indexes exactly once; safe to rerun."""
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-        for stmt in _CONSTRAINT_STATEMENTS:
-            s.run(stmt)
-    print("✅ Constraints ensured (safe to run repeatedly)")
+# Schema constraints and indexes live in data_processing.schema_migrations
 
 
 # _CYPHER_PUSH = """
@@ -396,9 +387,127 @@ _YEAR_RE = re.compile(r"\b(19|20)\d{2}\b")
 llm_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 
+# Returns the status the source had before this attempt ('new' if it did not exist)
+_SOURCE_START_CYPHER = """
+MERGE (c:Case {name:$case})
+MERGE (f:Source {case:$case, name:$source})
+  ON CREATE SET f.ingestedAt=datetime($ingestedAt),
+    f.docTitle = $doc_title,
+    f.ingestStatus = 'new'
+WITH c, f, coalesce(f.ingestStatus, 'complete') AS previous
+SET f.sourceId = coalesce($source_id, f.sourceId),
+    f.ingestStatus = 'ingesting',
+    f.ingestAttempt = $attempt,
+    f.ingestChunks = $chunks,
+    f.ingestedChunks = 0
+MERGE (c)-[:HAS_FILE]->(f)
+RETURN previous
+"""
+
+_CORE_CYPHER = """
+MATCH (f:Source {case:$case, name:$source})
+WITH f, $case AS case_name, $rows AS rows
+UNWIND rows AS row
+MERGE (ev:Event {id:row.evId})
+  ON CREATE SET ev.date = date(row.date),
+                ev.statement = row.statement,
+                ev.category = row.category,
+                ev.embedding = CASE WHEN $embeddings_in_graph THEN row.embedding END,
+                ev.case = case_name
+// Links made by this attempt are tagged so a failed re-ingest can remove just those
+MERGE (f)-[h:HAS_EVENT]->(ev)
+  ON CREATE SET h.ingestAttempt = $attempt
+WITH ev, row
+UNWIND row.entities AS e
+MERGE (ent:Entity {case:$case, name:e.name})
+  ON CREATE SET ent.type = e.type
+MERGE (ev)-[:INVOLVES]->(ent)
+WITH ev, row
+UNWIND row.years AS yy
+MERGE (y:Year {value:yy})
+MERGE (ev)-[:HAPPENED_IN]->(y)
+"""
+
+_REL_CYPHER = """
+UNWIND $triples AS t
+MATCH (sub:Entity {case:$case, name:t.subj})
+FOREACH (_ IN CASE WHEN t.objIsYear THEN [1] ELSE [] END |
+  MERGE (y:Year {value:toInteger(t.obj)})
+  MERGE (sub)-[:REL {relType:t.pred, eventId:t.evId}]->(y)
+)
+FOREACH (_ IN CASE WHEN t.objIsYear THEN [] ELSE [1] END |
+  MERGE (obj:Entity {case:$case, name:t.obj})
+  MERGE (sub)-[:REL {relType:t.pred, eventId:t.evId}]->(obj)
+)
+"""
+
+_SOURCE_CHUNK_CYPHER = """
+MATCH (f:Source {case:$case, name:$source})
+SET f.ingestedChunks = $done
+"""
+
+_SOURCE_COMPLETE_CYPHER = """
+MATCH (f:Source {case:$case, name:$source})
+SET f.ingestStatus = 'complete',
+    f.ingestCompletedAt = datetime()
+"""
+
+_SOURCE_FAILED_CYPHER = """
+MATCH (f:Source {case:$case, name:$source})
+SET f.ingestStatus = 'failed',
+    f.ingestFailedAt = datetime()
+"""
+
+# A failed re-ingest of a complete source goes back to serving what it had before
+_SOURCE_RESTORED_CYPHER = """
+MATCH (f:Source {case:$case, name:$source})
+SET f.ingestStatus = 'complete',
+    f.ingestFailedAt = datetime()
+"""
+
+# Every entity of a chunk, merged up front so the statement's nodes_created is exactly
+# the number of new entities; the core and REL statements then only match them
+_ENTITY_MERGE_CYPHER = """
+UNWIND $entities AS e
+MERGE (ent:Entity {case:$case, name:e.name})
+  ON CREATE SET ent.type = e.type
+"""
+
+_RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+
+async def _run_consumed(tx, query: str, parameters: Dict[str, Any]):
+    return await (await tx.run(query, parameters)).consume()
+
+
+async def _run_single(tx, query: str, parameters: Dict[str, Any]):
+    record = await (await tx.run(query, parameters)).single()
+    return dict(record) if record else None
+
+
+async def write_with_retry(session, work, *args):
+    """execute_write with exponential backoff on top of the driver's own retries.
+
+    The driver gives up once its retry window passes; a failover or leader election
+    can outlast that, so wait INGEST_RETRY_BASE_DELAY * 2^attempt (with jitter) and
+    run the whole transaction again, up to INGEST_MAX_RETRIES times.
+    """
+    for attempt in range(settings.INGEST_MAX_RETRIES + 1):
+        try:
+            return await session.execute_write(work, *args)
+        except _RETRYABLE_ERRORS as e:
+            if attempt == settings.INGEST_MAX_RETRIES:
+                raise
+            delay = settings.INGEST_RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+            print(f"Graph write failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
 class AsyncNeo4jEmbedIngestor:
-    def __init__(self):
-        self.driver = AsyncGraphDatabase.driver(URI, auth=(USER, PASSWORD))
+    @property
+    def driver(self):
+        # Share the application-wide pool instead of opening a driver per ingestor
+        return get_graph_driver()
 
     def _extract_years(self, text: str) -> List[int]:
         return [int(m.group()) for m in _YEAR_RE.finditer(text)]
@@ -406,16 +515,22 @@ class AsyncNeo4jEmbedIngestor:
     def _hash_event(self, case_name: str, date: str, stmt: str) -> str:
         return hashlib.sha256(f"{case_name}|{date}|{stmt}".encode()).hexdigest()
 
-    async def _batch_generate_embeddings(self, statements: List[str]) -> List[List[float]]:
-        response = await llm_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=statements
+    async def _known_event_ids(self, case_name: str, event_ids: List[str]) -> set:
+        """Events already in the graph whose vectors are already in the case's store."""
+        record = await run_read_single(
+            "MATCH (ev:Event) WHERE ev.id IN $ids RETURN collect(ev.id) AS ids",
+            {"ids": event_ids}, case=case_name
         )
-        return [item.embedding for item in response.data]
+        existing = record["ids"] if record else []
+        return await asyncio.to_thread(get_vector_store(case_name).known, existing)
 
     async def _prepare_rows(self, case_name: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        statements = [r["Statement"] for r in rows]
-        embeddings = await self._batch_generate_embeddings(statements)
+        event_ids = [self._hash_event(case_name, r["Date"], r["Statement"]) for r in rows]
+        # Only embed statements that are new to this case; the rest already have a stored vector
+        known = await self._known_event_ids(case_name, event_ids)
+        new_rows = [i for i, ev_id in enumerate(event_ids) if ev_id not in known]
+        vectors = await embed_statements([rows[i]["Statement"] for i in new_rows])
+        embeddings = dict(zip(new_rows, vectors))
 
         prepped = []
         for i, rec in enumerate(rows):
@@ -427,90 +542,176 @@ class AsyncNeo4jEmbedIngestor:
                 for j, e in enumerate(entities)
             ]
             prepped.append({
-                "evId": self._hash_event(case_name, rec["Date"], rec["Statement"]),
+                "evId": event_ids[i],
                 "date": rec["Date"],
                 "statement": rec["Statement"],
                 "category": rec.get("Category", "Other"),
                 "entities": entity_info,
                 "years": years,
                 "relations": rec.get("Relations", []),
-                "embedding": embeddings[i]
+                "embedding": embeddings.get(i)
             })
         return prepped
 
-    async def push(self, case_name: str, file_name: str, doc_title: str, rows: List[Dict[str, Any]]) -> ResultSummary:
-        prepared = await self._prepare_rows(case_name, rows)
-
-        _CORE_CYPHER = """
-        MERGE (c:Case {name:$case})
-        MERGE (f:Source {case:$case, name:$source})
-          ON CREATE SET f.ingestedAt=datetime($ingestedAt),
-            f.docTitle = $doc_title
-        MERGE (c)-[:HAS_FILE]->(f)
-        WITH f, $case AS case_name, $rows AS rows
-        UNWIND rows AS row
-        MERGE (ev:Event {id:row.evId})
-          ON CREATE SET ev.date = date(row.date),
-                        ev.statement = row.statement,
-                        ev.category = row.category,
-                        ev.embedding = row.embedding,
-                        ev.case = case_name
-        MERGE (f)-[:HAS_EVENT]->(ev)
-        WITH ev, row
-        UNWIND row.entities AS e
-        MERGE (ent:Entity {case:$case, name:e.name})
-          ON CREATE SET ent.type = e.type
-        MERGE (ev)-[:INVOLVES]->(ent)
-        WITH ev, row
-        UNWIND row.years AS yy
-        MERGE (y:Year {value:yy})
-        MERGE (ev)-[:HAPPENED_IN]->(y);
+    def _relation_triples(self, prepared: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Flatten every event's relations into one REL parameter list, skipping incomplete ones."""
+        triples = []
+        for r in prepared:
+            for rel in r["relations"]:
+                subj = rel.get("Subject", "").strip()
+                pred = rel.get("Predicate", "").strip()
+                obj = rel.get("Object", "").strip()
+                if not subj or not pred or not obj:
+                    continue
+                triples.append({
+                    "subj": subj,
+                    "pred": pred,
+                    "obj": obj,
+                    "objIsYear": bool(re.fullmatch(r"\d{4}", obj)),
+                    "evId": r["evId"]
+                })
+        return triples
+
+    def _add_counters(self, totals: Dict[str, int], summary: ResultSummary) -> Dict[str, int]:
+        c = summary.counters
+        for key, value in (
+            ("nodes_created", c.nodes_created),
+            ("relationships_created", c.relationships_created),
+            ("properties_set", c.properties_set),
+        ):
+            totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def _relation_entities(self, triples: List[Dict[str, Any]]) -> List[str]:
+        return [t["subj"] for t in triples] + [t["obj"] for t in triples if not t["objIsYear"]]
+
+    async def _write_chunk(self, tx, case_name: str, file_name: str, rows: List[Dict[str, Any]], attempt: str, chunk_no: int) -> Dict[str, Any]:
+        """One chunk of events, their relations and timeline rows, in one transaction.
+
+        Every statement MERGEs, so a retried chunk (or a re-ingest after a failure) is idempotent.
+        Nothing is logged for delta sync yet: the source's rows stay hidden until it completes.
         """
-
-        _REL_CYPHER = """
-        UNWIND $triples AS t
-        MATCH (sub:Entity {case:$case, name:t.subj})
-        FOREACH (_ IN CASE WHEN t.objIsYear THEN [1] ELSE [] END |
-          MERGE (y:Year {value:toInteger(t.obj)})
-          MERGE (sub)-[:REL {relType:t.pred, eventId:t.evId}]->(y)
+        triples = self._relation_triples(rows)
+        rel_entities = self._relation_entities(triples)
+        # Typed mentions win over REL-only names, which are created without a type
+        entities = {name: None for name in rel_entities}
+        for r in rows:
+            for e in r["entities"]:
+                if entities.get(e["name"]) is None:
+                    entities[e["name"]] = e["type"]
+        merged = await (await tx.run(
+            _ENTITY_MERGE_CYPHER, case=case_name,
+            entities=[{"name": name, "type": type_} for name, type_ in entities.items()]
+        )).consume()
+        # Counted inside this transaction, so concurrent ingests never count each other's entities
+        await adjust_entity_count(tx, case_name, merged.counters.nodes_created)
+        counters = self._add_counters({}, merged)
+
+        core = await tx.run(
+            _CORE_CYPHER,
+            case=case_name,
+            source=file_name,
+            attempt=attempt,
+            embeddings_in_graph=settings.EVENT_EMBEDDINGS_IN_GRAPH,
+            rows=[
+                {k: v for k, v in r.items() if k != "embedding" or settings.EVENT_EMBEDDINGS_IN_GRAPH}
+                for r in rows
+            ]
         )
-        FOREACH (_ IN CASE WHEN t.objIsYear THEN [] ELSE [1] END |
-          MERGE (obj:Entity {case:$case, name:t.obj})
-          MERGE (sub)-[:REL {relType:t.pred, eventId:t.evId}]->(obj)
-        );
-        """
+        self._add_counters(counters, await core.consume())
+
+        # All triples of the chunk go out in a few UNWIND batches, not one query per event
+        batch_size = settings.INGEST_REL_BATCH_SIZE
+        for i in range(0, len(triples), batch_size):
+            res = await tx.run(_REL_CYPHER, case=case_name, triples=triples[i:i + batch_size])
+            self._add_counters(counters, await res.consume())
+
+        # Keep the materialized timeline in step with the events just written
+        await refresh_timeline_rows(tx, case_name, [r["evId"] for r in rows])
+
+        await (await tx.run(_SOURCE_CHUNK_CYPHER, case=case_name, source=file_name, done=chunk_no + 1)).consume()
+        counters["relations"] = len(triples)
+        return counters
+
+    async def _publish_chunk(self, tx, case_name: str, rows: List[Dict[str, Any]]) -> None:
+        """Project a completed source's chunk onto the timeline and log it for delta sync.
 
-        async with self.driver.session() as s:
-            core = await s.run(
-                _CORE_CYPHER,
-                case=case_name,
-                source=file_name,
-                doc_title=doc_title,
-                ingestedAt=datetime.now(timezone.utc).isoformat(),
-                rows=prepared
-            )
-            await core.consume()
-
-            for r in prepared:
-                triples = []
-                for rel in r["relations"]:
-                    subj = rel.get("Subject", "").strip()
-                    pred = rel.get("Predicate", "").strip()
-                    obj = rel.get("Object", "").strip()
-                    if not subj or not pred or not obj:
-                        continue
-                    triples.append({
-                        "subj": subj,
-                        "pred": pred,
-                        "obj": obj,
-                        "objIsYear": bool(re.fullmatch(r"\d{4}", obj)),
-                        "evId": r["evId"]
-                    })
-                if triples:
-                    await s.run(_REL_CYPHER, case=case_name, triples=triples)
-
-        print(f"📥 {file_name}@{case_name}: embedding + neo4j ingestion complete, {len(prepared)}")
-        return core
+        The chunk's events only become visible here, so this is where pollers learn of them;
+        logging them at write time would let a poller move past versions it could not read.
+        """
+        triples = self._relation_triples(rows)
+        await refresh_timeline_rows(tx, case_name, [r["evId"] for r in rows])
+        await record_changes(tx, case_name,
+            changes(EVENT, UPSERT, [r["evId"] for r in rows])
+            + changes(ENTITY, UPSERT, [e["name"] for r in rows for e in r["entities"]] + self._relation_entities(triples))
+            + changes(RELATION, UPSERT, [t["evId"] for t in triples]))
+
+    async def _abandon(self, session, case_name: str, file_name: str, attempt: str, previous: str, written: List[Dict[str, Any]]) -> None:
+        """Clean up after a chunk ran out of retries.
+
+        A source that was complete before this attempt keeps its earlier data: only the
+        events this attempt linked are removed, and it is marked complete again, with the
+        surviving events it touched re-projected. Any other source is marked failed, which
+        keeps it out of reads even if the cleanup cannot run now, and removed entirely.
+        """
+        try:
+            if previous == "complete":
+                deleted = set(await delete_file_from_neo4j(case_name, file_name, attempt=attempt))
+                await write_with_retry(session, _run_consumed, _SOURCE_RESTORED_CYPHER, {"case": case_name, "source": file_name})
+                kept = [r for r in written if r["evId"] not in deleted]
+                chunk_size = settings.INGEST_CHUNK_ROWS
+                for i in range(0, len(kept), chunk_size):
+                    await write_with_retry(session, self._publish_chunk, case_name, kept[i:i + chunk_size])
+            else:
+                await write_with_retry(session, _run_consumed, _SOURCE_FAILED_CYPHER, {"case": case_name, "source": file_name})
+                await delete_file_from_neo4j(case_name, file_name)
+        except Exception as e:
+            print(f"[ERROR] Cleanup of failed ingest {file_name}@{case_name} did not finish: {e}")
+
+    async def push(self, case_name: str, file_name: str, doc_title: str, rows: List[Dict[str, Any]], source_id: str = None) -> Dict[str, int]:
+        prepared = await self._prepare_rows(case_name, rows)
+        chunk_size = settings.INGEST_CHUNK_ROWS
+        chunks = [prepared[i:i + chunk_size] for i in range(0, len(prepared), chunk_size)]
+        store = get_vector_store(case_name)
+
+        counters: Dict[str, int] = {}
+        attempt = uuid4().hex
+        written: List[Dict[str, Any]] = []
+        async with graph_session(case_name) as s:
+            started = await write_with_retry(s, _run_single, _SOURCE_START_CYPHER, {
+                "case": case_name,
+                "source": file_name,
+                "doc_title": doc_title,
+                "source_id": source_id,
+                "attempt": attempt,
+                "chunks": len(chunks),
+                "ingestedAt": datetime.now(timezone.utc).isoformat(),
+            })
+            try:
+                for chunk_no, chunk in enumerate(chunks):
+                    chunk_counters = await write_with_retry(s, self._write_chunk, case_name, file_name, chunk, attempt, chunk_no)
+                    written.extend(chunk)
+                    for key, value in chunk_counters.items():
+                        counters[key] = counters.get(key, 0) + value
+                    # Embeddings live in the case's memory-mapped vector store, not on the Event nodes
+                    embedded = [r for r in chunk if r["embedding"] is not None]
+                    await asyncio.to_thread(store.add, [r["evId"] for r in embedded], [r["embedding"] for r in embedded])
+            except Exception:
+                await self._abandon(s, case_name, file_name, attempt, started["previous"] if started else "new", written)
+                raise
+
+            # Only now does the source count as fully ingested. Timeline rows skip sources
+            # that are not complete, so project its events again and log them, a chunk at a time.
+            await write_with_retry(s, _run_consumed, _SOURCE_COMPLETE_CYPHER, {"case": case_name, "source": file_name})
+            for chunk in chunks:
+                await write_with_retry(s, self._publish_chunk, case_name, chunk)
+
+        await asyncio.to_thread(store.maybe_build_ivf)
+
+        counters["events"] = len(prepared)
+        counters["chunks"] = len(chunks)
+        print(f"📥 {file_name}@{case_name}: embedding + neo4j ingestion complete, {counters}")
+        return counters
 
 
 neo4j_data_ingestor = AsyncNeo4jEmbedIngestor()
@@ -0,0 +1,45 @@
+"""Re-encode the per-case event vector stores.
+
+Rewrites every store under VECTOR_STORE_DIR (or only the given cases) as float32 or
+int8, optionally shortened to fewer dimensions. Live rows are copied in batches into
+a new generation of the store, which replaces the old one when it is complete. Run it while ingest is paused:
+
+    python -m data_processing.reencode_embeddings --dtype int8
+    python -m data_processing.reencode_embeddings --dtype int8 --dimensions 512 --case "Case A"
+
+When shortening, set EMBEDDING_DIMENSIONS to the same value so newly ingested events
+and search queries match the stored size.
+"""
+import argparse
+from pathlib import Path
+from config import settings
+from helper.vector_store import VectorStore, get_vector_store
+
+
+def reencode_stores(dtype: str, dimensions, cases, batch_rows: int) -> None:
+    if cases:
+        stores = [get_vector_store(case) for case in cases]
+    else:
+        root = Path(settings.VECTOR_STORE_DIR)
+        stores = [
+            VectorStore(path) for path in sorted(root.iterdir())
+            # Skip leftovers of an interrupted run
+            if path.is_dir() and VectorStore.exists_at(path) and path.suffix not in (".reencode", ".old")
+        ] if root.exists() else []
+
+    for store in stores:
+        before = sum(f.stat().st_size for f in store.path.rglob("*") if f.is_file())
+        rows = len(store)
+        store.reencode(dtype, dimensions, batch_rows)
+        after = sum(f.stat().st_size for f in store.path.rglob("*") if f.is_file()) if store.path.exists() else 0
+        print(f"{store.path.name}: {rows} vectors, {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode the per-case event vector stores")
+    parser.add_argument("--dtype", choices=["float32", "int8"], default=settings.VECTOR_STORE_DTYPE)
+    parser.add_argument("--dimensions", type=int, default=None, help="Keep only the first N dimensions")
+    parser.add_argument("--case", action="append", default=[], help="Case to re-encode (repeatable); default all")
+    parser.add_argument("--batch", type=int, default=65536, help="Rows copied per batch")
+    args = parser.parse_args()
+    reencode_stores(args.dtype, args.dimensions, args.case, args.batch)
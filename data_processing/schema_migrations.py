@@ -0,0 +1,389 @@
+"""Versioned Neo4j schema migrations.
+
+Each migration has a version, a description and a list of steps. A step is either a
+Cypher statement (run in its own auto-commit transaction, as schema operations
+require) or an async callable taking a session, for data backfills. Every step must
+be idempotent: a migration interrupted halfway is simply run again.
+
+The applied version is stored on a single (:SchemaVersion {id: 'casethread'}) node.
+Migrations run at application startup and can be run by hand:
+
+    python -m data_processing.schema_migrations            # apply pending migrations
+    python -m data_processing.schema_migrations status     # show version and index state
+    python -m data_processing.schema_migrations drop-graph-embeddings   # see below
+
+Migration 6 copies Event.embedding into the vector store and leaves the graph property
+alone. Removing it is a separate, opt-in command that only touches events whose stored
+vector has been verified against the graph copy.
+"""
+import argparse
+import asyncio
+import logging
+from config import settings
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+from database import get_graph_driver, close_neo4j_connection, get_database, connect_to_mongodb, close_mongodb_connection
+from helper.timeline_projection import rebuild_timeline_projection
+from helper.vector_store import get_vector_store
+from data_processing.data_pre_processing import clean_source
+from data_processing.embeddings import embedding_dimensions
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_ID = "casethread"
+LOCK_TIMEOUT = timedelta(minutes=30)
+
+
+async def _rebuild_all_timelines(session) -> None:
+    cases = await (await session.run("MATCH (c:Case) RETURN c.name AS name")).data()
+    for case in cases:
+        await session.execute_write(rebuild_timeline_projection, case["name"])
+    logger.info(f"Rebuilt timeline projection for {len(cases)} case(s)")
+
+
+async def _backfill_source_ids(session) -> None:
+    """Copy each processed Mongo document id onto its Source node (and the document)."""
+    mongo = await get_database()
+    if mongo is None:
+        raise RuntimeError("MongoDB is not connected; cannot backfill source ids")
+
+    rows = []
+    async for doc in mongo.documents.find({"status": "processed"}):
+        name = doc.get("document_url") if doc.get("document_type") == "link" else clean_source(doc.get("file_path", ""))
+        rows.append({"case": doc.get("case_id"), "name": name, "sourceId": str(doc["_id"])})
+
+    for i in range(0, len(rows), 1000):
+        await (await session.run("""
+            UNWIND $rows AS row
+            MATCH (f:Source {case: row.case, name: row.name})
+            SET f.sourceId = row.sourceId
+        """, rows=rows[i:i + 1000])).consume()
+
+    await mongo.documents.update_many(
+        {"status": "processed", "source_id": {"$exists": False}},
+        [{"$set": {"source_id": {"$toString": "$_id"}}}]
+    )
+    logger.info(f"Backfilled source ids for {len(rows)} document(s)")
+
+
+async def _move_embeddings_to_vector_store(session) -> None:
+    """Copy Event.embedding into each case's vector store.
+
+    The graph property is left in place; `drop-graph-embeddings` removes it once the
+    store has been checked against it."""
+    cases = await (await session.run("MATCH (c:Case) RETURN c.name AS name")).data()
+    moved = 0
+    for case in cases:
+        store = get_vector_store(case["name"])
+        after = ""
+        while True:
+            batch = await (await session.run("""
+                MATCH (ev:Event {case: $case})
+                WHERE ev.embedding IS NOT NULL AND ev.id > $after
+                RETURN ev.id AS id, ev.embedding AS embedding
+                ORDER BY ev.id
+                LIMIT 1000
+            """, case=case["name"], after=after)).data()
+            if not batch:
+                break
+            await asyncio.to_thread(store.add, [r["id"] for r in batch], [r["embedding"] for r in batch])
+            after = batch[-1]["id"]
+            moved += len(batch)
+        await asyncio.to_thread(store.maybe_build_ivf)
+    logger.info(f"Copied {moved} event embedding(s) to the vector store")
+
+
+async def drop_graph_embeddings() -> Dict[str, int]:
+    """Remove Event.embedding for events whose vector is verified in the vector store.
+
+    Separate from the migrations because it cannot be undone; events missing from the
+    store (or stored differently) keep their property and are counted as skipped."""
+    if settings.EVENT_EMBEDDINGS_IN_GRAPH:
+        raise RuntimeError("EVENT_EMBEDDINGS_IN_GRAPH is set; graph embeddings are still in use")
+    removed = skipped = 0
+    async with get_graph_driver().session() as session:
+        cases = await (await session.run("MATCH (c:Case) RETURN c.name AS name")).data()
+        for case in cases:
+            store = get_vector_store(case["name"])
+            after = ""
+            while True:
+                batch = await (await session.run("""
+                    MATCH (ev:Event {case: $case})
+                    WHERE ev.embedding IS NOT NULL AND ev.id > $after
+                    RETURN ev.id AS id, ev.embedding AS embedding
+                    ORDER BY ev.id
+                    LIMIT 1000
+                """, case=case["name"], after=after)).data()
+                if not batch:
+                    break
+                ids = await asyncio.to_thread(store.matching, {r["id"]: r["embedding"] for r in batch})
+                if ids:
+                    await (await session.run(
+                        "UNWIND $ids AS id MATCH (ev:Event {id: id}) REMOVE ev.embedding", ids=ids
+                    )).consume()
+                after = batch[-1]["id"]
+                removed += len(ids)
+                skipped += len(batch) - len(ids)
+    logger.info(f"Removed {removed} graph embedding(s); kept {skipped} not verified in the vector store")
+    return {"removed": removed, "skipped": skipped}
+
+
+async def _rebuild_duplicated_timelines(session) -> None:
+    """Rebuild cases whose projection has several rows for one key, so the unique
+    constraint can be created (buckets and totals were counted twice too)."""
+    cases = await (await session.run("""
+        MATCH (row:TimelineRow)
+        WITH row.case AS case, row.key AS key, count(*) AS n
+        WHERE n > 1
+        RETURN DISTINCT case AS name
+    """)).data()
+    for case in cases:
+        await session.execute_write(rebuild_timeline_projection, case["name"])
+    logger.info(f"Rebuilt timeline projection for {len(cases)} case(s) with duplicate rows")
+
+
+async def _ensure_event_embedding_index(session) -> None:
+    """Vector index over Event.embedding sized for the configured embeddings.
+
+    Nodes whose vector has a different size are silently left out of a vector index,
+    so an index built for another size is dropped and rebuilt.
+    """
+    dimensions = embedding_dimensions()
+    record = await (await session.run("""
+        SHOW INDEXES YIELD name, options
+        WHERE name = 'event_embedding'
+        RETURN options.indexConfig['vector.dimensions'] AS dimensions
+    """)).single()
+    if record and record["dimensions"] == dimensions:
+        return
+    if record:
+        logger.info(f"Rebuilding event_embedding for {dimensions} dimensions (was {record['dimensions']})")
+        await (await session.run("DROP INDEX event_embedding IF EXISTS")).consume()
+    await (await session.run(f"""
+        CREATE VECTOR INDEX event_embedding IF NOT EXISTS
+        FOR (ev:Event) ON (ev.embedding)
+        OPTIONS {{indexConfig: {{`vector.dimensions`: {int(dimensions)}, `vector.similarity_function`: 'cosine'}}}}
+    """)).consume()
+
+
+async def _backfill_timeline_buckets(session) -> None:
+    cases = await (await session.run("MATCH (c:Case) RETURN c.name AS name")).data()
+    for case in cases:
+        await (await session.run("MATCH (b:TimelineBucket {case: $case}) DELETE b", case=case["name"])).consume()
+        await (await session.run("""
+            MATCH (row:TimelineRow {case: $case})
+            WHERE row.date IS NOT NULL
+            WITH row.date AS day, coalesce(row.category, '') AS category, coalesce(row.tag, '') AS tag, count(*) AS n
+            CREATE (:TimelineBucket {case: $case, day: day, category: category, tag: tag, count: n})
+        """, case=case["name"])).consume()
+    logger.info(f"Backfilled timeline buckets for {len(cases)} case(s)")
+
+
+MIGRATIONS: List[Dict[str, Any]] = [
+    {
+        "version": 1,
+        "description": "Per-case uniqueness for Source/Entity and ingest lookup indexes",
+        "steps": [
+            # Entity and Source names are only unique within a case; the old global
+            # constraints made the per-case MERGEs fail across cases.
+            "DROP CONSTRAINT entity_name_unique IF EXISTS",
+            "DROP CONSTRAINT source_unique IF EXISTS",
+            "CREATE CONSTRAINT case_name_unique IF NOT EXISTS FOR (c:Case) REQUIRE c.name IS UNIQUE",
+            "CREATE CONSTRAINT event_id_unique IF NOT EXISTS FOR (ev:Event) REQUIRE ev.id IS UNIQUE",
+            "CREATE CONSTRAINT source_case_name_unique IF NOT EXISTS FOR (f:Source) REQUIRE (f.case, f.name) IS UNIQUE",
+            "CREATE CONSTRAINT entity_case_name_unique IF NOT EXISTS FOR (e:Entity) REQUIRE (e.case, e.name) IS UNIQUE",
+            "CREATE CONSTRAINT year_value_unique IF NOT EXISTS FOR (y:Year) REQUIRE y.value IS UNIQUE",
+            "CREATE INDEX source_case IF NOT EXISTS FOR (f:Source) ON (f.case)",
+            "CREATE INDEX entity_case IF NOT EXISTS FOR (e:Entity) ON (e.case)",
+            "CREATE INDEX event_case IF NOT EXISTS FOR (ev:Event) ON (ev.case)",
+            "CREATE INDEX event_date IF NOT EXISTS FOR (ev:Event) ON (ev.date)",
+            # Timeline projection: re-keying events, page/range scans and row rebuilds
+            "CREATE INDEX event_case_timeline_key IF NOT EXISTS FOR (ev:Event) ON (ev.case, ev.timelineKey)",
+            "CREATE INDEX timeline_row_case_date IF NOT EXISTS FOR (r:TimelineRow) ON (r.case, r.date, r.eventId)",
+            "CREATE INDEX timeline_row_case_key IF NOT EXISTS FOR (r:TimelineRow) ON (r.case, r.key)",
+            # Source graph fetch seeks REL edges by the event that produced them
+            "CREATE INDEX rel_event_id IF NOT EXISTS FOR ()-[r:REL]-() ON (r.eventId)",
+        ],
+    },
+    {
+        "version": 2,
+        "description": "Backfill materialized timelines and case counters",
+        "steps": [_rebuild_all_timelines],
+    },
+    {
+        "version": 3,
+        "description": "Stable Source.sourceId taken from the Mongo document id",
+        "steps": [
+            "CREATE CONSTRAINT source_id_unique IF NOT EXISTS FOR (f:Source) REQUIRE f.sourceId IS UNIQUE",
+            _backfill_source_ids,
+        ],
+    },
+    {
+        "version": 4,
+        "description": "Per-case change log for delta sync",
+        "steps": [
+            "CREATE INDEX change_log_case_version IF NOT EXISTS FOR (l:ChangeLog) ON (l.case, l.version)",
+        ],
+    },
+    {
+        "version": 5,
+        "description": "Vector index over Event.embedding for semantic search",
+        "steps": [_ensure_event_embedding_index],
+    },
+    {
+        "version": 6,
+        "description": "Move event embeddings into the per-case vector store",
+        "steps": [_move_embeddings_to_vector_store],
+    },
+    {
+        "version": 7,
+        "description": "Per-day timeline buckets for histograms",
+        "steps": [
+            "CREATE CONSTRAINT timeline_bucket_unique IF NOT EXISTS FOR (b:TimelineBucket) REQUIRE (b.case, b.day, b.category, b.tag) IS UNIQUE",
+            _backfill_timeline_buckets,
+        ],
+    },
+    {
+        "version": 8,
+        "description": "Full-text index over timeline statements and entity names",
+        "steps": [
+            """
+            MATCH (row:TimelineRow)
+            WHERE row.entityText IS NULL
+            CALL {
+                WITH row
+                SET row.entityText = apoc.text.join(coalesce(row.entities, []), ' ')
+            } IN TRANSACTIONS OF 10000 ROWS
+            """,
+            # `case` is indexed too so a search is narrowed to one case inside Lucene
+            "CREATE FULLTEXT INDEX timeline_row_text IF NOT EXISTS FOR (row:TimelineRow) ON EACH [row.statement, row.entityText, row.case]",
+        ],
+    },
+    {
+        "version": 9,
+        "description": "Unique timeline rows per (case, key)",
+        "steps": [
+            _rebuild_duplicated_timelines,
+            # The constraint brings its own index on the same properties
+            "DROP INDEX timeline_row_case_key IF EXISTS",
+            "CREATE CONSTRAINT timeline_row_case_key_unique IF NOT EXISTS FOR (r:TimelineRow) REQUIRE (r.case, r.key) IS UNIQUE",
+        ],
+    },
+    {
+        "version": 10,
+        "description": "Size event_embedding from EMBEDDING_DIMENSIONS instead of a fixed 1536",
+        "steps": [_ensure_event_embedding_index],
+    },
+]
+
+LATEST_VERSION = max(m["version"] for m in MIGRATIONS)
+
+
+async def _acquire_lock(session, owner: str) -> bool:
+    """Take the migration lock so concurrent workers do not run backfills twice."""
+    record = await (await session.run("""
+        MERGE (v:SchemaVersion {id: $id})
+          ON CREATE SET v.version = 0
+        WITH v
+        WHERE v.lockedBy IS NULL OR v.lockedAt < datetime($staleBefore)
+        SET v.lockedBy = $owner, v.lockedAt = datetime()
+        RETURN v.lockedBy = $owner AS acquired
+    """, id=SCHEMA_ID, owner=owner,
+        staleBefore=(datetime.now(timezone.utc) - LOCK_TIMEOUT).isoformat())).single()
+    return bool(record and record["acquired"])
+
+
+async def _release_lock(session, owner: str) -> None:
+    await (await session.run("""
+        MATCH (v:SchemaVersion {id: $id, lockedBy: $owner})
+        REMOVE v.lockedBy, v.lockedAt
+    """, id=SCHEMA_ID, owner=owner)).consume()
+
+
+async def get_schema_version(session) -> int:
+    record = await (await session.run(
+        "MATCH (v:SchemaVersion {id: $id}) RETURN v.version AS version", id=SCHEMA_ID
+    )).single()
+    return record["version"] if record and record["version"] is not None else 0
+
+
+async def get_pending_indexes(session) -> List[Dict[str, Any]]:
+    """Indexes that are not ONLINE yet (still populating or failed)."""
+    return await (await session.run("""
+        SHOW INDEXES YIELD name, state, populationPercent
+        WHERE state <> 'ONLINE'
+        RETURN name, state, populationPercent
+    """)).data()
+
+
+async def run_schema_migrations() -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    owner = f"migrator-{datetime.now(timezone.utc).timestamp()}"
+    async with get_graph_driver().session() as session:
+        version = await get_schema_version(session)
+        if version < LATEST_VERSION:
+            if not await _acquire_lock(session, owner):
+                logger.info("Schema migrations are running elsewhere; skipping")
+                return version
+            try:
+                version = await get_schema_version(session)
+                for migration in MIGRATIONS:
+                    if migration["version"] <= version:
+                        continue
+                    logger.info(f"Applying schema migration {migration['version']}: {migration['description']}")
+                    for step in migration["steps"]:
+                        if callable(step):
+                            await step(session)
+                        else:
+                            await (await session.run(step)).consume()
+                    await (await session.run("""
+                        MATCH (v:SchemaVersion {id: $id})
+                        SET v.version = $version, v.appliedAt = datetime()
+                    """, id=SCHEMA_ID, version=migration["version"])).consume()
+                    version = migration["version"]
+            finally:
+                await _release_lock(session, owner)
+
+        # EMBEDDING_DIMENSIONS can change after migration 5/10 ran
+        if version >= 5:
+            await _ensure_event_embedding_index(session)
+
+        for index in await get_pending_indexes(session):
+            logger.warning(
+                f"Index {index['name']} is {index['state']} ({index['populationPercent']:.1f}% populated)"
+            )
+    return version
+
+
+async def _status() -> None:
+    async with get_graph_driver().session() as session:
+        version = await get_schema_version(session)
+        print(f"Schema version: {version} (latest {LATEST_VERSION})")
+        pending = await get_pending_indexes(session)
+        if not pending:
+            print("All indexes ONLINE")
+        for index in pending:
+            print(f"  {index['name']}: {index['state']} ({index['populationPercent']:.1f}%)")
+
+
+async def _main(command: str) -> None:
+    await connect_to_mongodb()
+    try:
+        if command == "status":
+            await _status()
+        elif command == "drop-graph-embeddings":
+            result = await drop_graph_embeddings()
+            print(f"Removed {result['removed']} graph embedding(s), kept {result['skipped']}")
+        else:
+            version = await run_schema_migrations()
+            print(f"Schema at version {version}")
+    finally:
+        await close_neo4j_connection()
+        await close_mongodb_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Neo4j schema migrations")
+    parser.add_argument("command", nargs="?", default="migrate", choices=["migrate", "status", "drop-graph-embeddings"])
+    asyncio.run(_main(parser.parse_args().command))
@@ -1,5 +1,13 @@
+import base64
+import json
 import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorClient
+from neo4j import AsyncGraphDatabase, Bookmarks, READ_ACCESS, WRITE_ACCESS
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -9,6 +17,7 @@ class DatabaseHelper:
     _instance = None
     _db = None
     _client = None
+    _graph_driver = None
 
     @classmethod
     def get_instance(cls):
@@ -32,6 +41,14 @@ class DatabaseHelper:
     def client(self, value):
         self._client = value
 
+    @property
+    def graph_driver(self):
+        return self._graph_driver
+
+    @graph_driver.setter
+    def graph_driver(self, value):
+        self._graph_driver = value
+
 db = DatabaseHelper.get_instance()
 
 async def connect_to_mongodb():
@@ -60,3 +77,144 @@ async def close_mongodb_connection():
 async def get_database():
     """Get database connection."""
     return db.db
+
+
+def _create_graph_driver():
+    return AsyncGraphDatabase.driver(
+        settings.NEO4J_URI,
+        auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
+        max_connection_pool_size=settings.NEO4J_MAX_POOL_SIZE,
+        connection_acquisition_timeout=settings.NEO4J_ACQUISITION_TIMEOUT,
+    )
+
+
+async def connect_to_neo4j():
+    """Create the shared Neo4j driver (connection pool)."""
+    try:
+        logger.info("Connecting to Neo4j...")
+        if db.graph_driver is None:
+            db.graph_driver = _create_graph_driver()
+        await db.graph_driver.verify_connectivity()
+        logger.info("Connected to Neo4j")
+    except Exception as e:
+        logger.error(f"Could not connect to Neo4j: {str(e)}")
+
+
+async def close_neo4j_connection():
+    """Close the shared Neo4j driver."""
+    logger.info("Closing Neo4j connection...")
+    if db.graph_driver:
+        await db.graph_driver.close()
+        db.graph_driver = None
+        logger.info("Neo4j connection closed")
+
+
+def get_graph_driver():
+    """Get the shared Neo4j driver, created lazily when used outside the app lifespan."""
+    if db.graph_driver is None:
+        db.graph_driver = _create_graph_driver()
+    return db.graph_driver
+
+
+# Causal consistency for routed reads.
+# Writes remember the bookmarks they produced, per case in this process and on the
+# current request (sent back as BOOKMARK_HEADER). Reads wait for both, so a user sees
+# their own writes even when the read is routed to a secondary that is still catching up.
+# Per-case bookmarks are an LRU of NEO4J_BOOKMARK_MAX_CASES entries that expire after
+# NEO4J_BOOKMARK_TTL_SECONDS, by which time every secondary has caught up anyway.
+BOOKMARK_HEADER = "X-Neo4j-Bookmarks"
+
+_case_bookmarks: "OrderedDict[str, Tuple[float, Bookmarks]]" = OrderedDict()
+# Holds a dict per request: {"in": Bookmarks | None, "out": Bookmarks | None}
+request_bookmarks: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_bookmarks", default=None)
+
+
+def encode_bookmarks(bookmarks: Bookmarks) -> str:
+    payload = json.dumps(sorted(bookmarks.raw_values))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_bookmarks(value: Optional[str]) -> Optional[Bookmarks]:
+    """Bookmarks from a BOOKMARK_HEADER value; malformed values are ignored."""
+    if not value:
+        return None
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        return Bookmarks.from_raw_values(json.loads(base64.urlsafe_b64decode(padded.encode())))
+    except (ValueError, TypeError):
+        return None
+
+
+def _case_bookmarks_for(case: Optional[str]) -> Optional[Bookmarks]:
+    entry = _case_bookmarks.get(case) if case is not None else None
+    if entry is None:
+        return None
+    written_at, bookmarks = entry
+    if time.monotonic() - written_at > settings.NEO4J_BOOKMARK_TTL_SECONDS:
+        del _case_bookmarks[case]
+        return None
+    _case_bookmarks.move_to_end(case)
+    return bookmarks
+
+
+def _bookmarks_for(case: Optional[str]) -> Optional[Bookmarks]:
+    bookmarks = Bookmarks()
+    case_bookmarks = _case_bookmarks_for(case)
+    if case_bookmarks is not None:
+        bookmarks = bookmarks + case_bookmarks
+    holder = request_bookmarks.get()
+    for key in ("in", "out"):
+        if holder and holder.get(key) is not None:
+            bookmarks = bookmarks + holder[key]
+    return bookmarks if bookmarks.raw_values else None
+
+
+def remember_bookmarks(case: Optional[str], bookmarks: Bookmarks) -> None:
+    """Record a write's bookmarks for later reads of `case` and for the current response."""
+    if case is not None:
+        _case_bookmarks[case] = (time.monotonic(), bookmarks)
+        _case_bookmarks.move_to_end(case)
+        while len(_case_bookmarks) > settings.NEO4J_BOOKMARK_MAX_CASES:
+            _case_bookmarks.popitem(last=False)
+    holder = request_bookmarks.get()
+    if holder is not None:
+        holder["out"] = bookmarks
+
+
+@asynccontextmanager
+async def graph_session(case: Optional[str] = None, access_mode: str = WRITE_ACCESS, **kwargs):
+    """Session on the shared driver that waits for the case's (and request's) last writes.
+
+    Write sessions record the bookmarks they end with once the block exits cleanly.
+    """
+    async with get_graph_driver().session(
+        default_access_mode=access_mode,
+        bookmarks=_bookmarks_for(case),
+        database=settings.NEO4J_DATABASE or None,
+        **kwargs
+    ) as session:
+        yield session
+        if access_mode == WRITE_ACCESS:
+            remember_bookmarks(case, await session.last_bookmarks())
+
+
+def graph_read_session(case: Optional[str] = None, **kwargs):
+    return graph_session(case, READ_ACCESS, **kwargs)
+
+
+async def run_read(query: str, parameters: Optional[Dict[str, Any]] = None, case: Optional[str] = None) -> List[Any]:
+    """Run `query` in a managed read transaction: routed to a reader in a cluster and
+    retried on transient errors. Bookmarks follow `case`, or the `case` parameter."""
+    parameters = parameters or {}
+
+    async def _work(tx):
+        result = await tx.run(query, parameters)
+        return [record async for record in result]
+
+    async with graph_read_session(case or parameters.get("case")) as session:
+        return await session.execute_read(_work)
+
+
+async def run_read_single(query: str, parameters: Optional[Dict[str, Any]] = None, case: Optional[str] = None) -> Optional[Any]:
+    records = await run_read(query, parameters, case)
+    return records[0] if records else None
@@ -0,0 +1,74 @@
+from typing import Any, Dict, Iterable, List, Optional
+from config import settings
+
+# Per-case change log behind the delta sync endpoint. Every write that touches a case
+# bumps c.changeVersion once and leaves one (:ChangeLog) per changed event, entity or
+# event's relations, all stamped with that version. Readers ask for everything after
+# the version they last saw. Entries older than CHANGE_LOG_RETENTION versions are
+# pruned and c.changeLogFloor remembers where the log now starts.
+
+EVENT = "event"
+ENTITY = "entity"
+RELATION = "relation"  # keyed by event id: the REL edges written for that event
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+_CYPHER_RECORD_CHANGES = """
+MATCH (c:Case {name: $case})
+SET c.changeVersion = coalesce(c.changeVersion, 0) + 1
+WITH c
+FOREACH (ch IN $changes |
+    CREATE (:ChangeLog {case: $case, version: c.changeVersion, kind: ch.kind, op: ch.op, key: ch.key, at: datetime()})
+)
+RETURN c.changeVersion AS version
+"""
+
+_CYPHER_PRUNE_CHANGES = """
+MATCH (c:Case {name: $case})
+WHERE c.changeVersion - $retention > coalesce(c.changeLogFloor, 0)
+SET c.changeLogFloor = c.changeVersion - $retention
+WITH c
+MATCH (l:ChangeLog {case: $case})
+WHERE l.version <= c.changeLogFloor
+DELETE l
+"""
+
+_CYPHER_MISSING_EVENTS = """
+UNWIND $eventIds AS eid
+WITH eid WHERE NOT EXISTS { MATCH (:Event {id: eid}) }
+RETURN collect(eid) AS missing
+"""
+
+_CYPHER_MISSING_ENTITIES = """
+UNWIND $names AS name
+WITH name WHERE NOT EXISTS { MATCH (:Entity {case: $case, name: name}) }
+RETURN collect(name) AS missing
+"""
+
+
+def changes(kind: str, op: str, keys: Iterable[Any]) -> List[Dict[str, Any]]:
+    return [{"kind": kind, "op": op, "key": key} for key in dict.fromkeys(keys) if key is not None]
+
+
+async def record_changes(tx, case: str, entries: List[Dict[str, Any]]) -> Optional[int]:
+    """Log `entries` under a new case version and return it (None if nothing changed).
+
+    `tx` is anything with an async `run` (session or transaction).
+    """
+    if not entries:
+        return None
+    record = await (await tx.run(_CYPHER_RECORD_CHANGES, case=case, changes=entries)).single()
+    await (await tx.run(_CYPHER_PRUNE_CHANGES, case=case, retention=settings.CHANGE_LOG_RETENTION)).consume()
+    return record["version"] if record else None
+
+
+async def missing_events(tx, event_ids: Iterable[str]) -> List[str]:
+    """Which of `event_ids` no longer exist; used after deletes with orphan sweeps."""
+    record = await (await tx.run(_CYPHER_MISSING_EVENTS, eventIds=list(event_ids))).single()
+    return record["missing"] if record else []
+
+
+async def missing_entities(tx, case: str, names: Iterable[str]) -> List[str]:
+    record = await (await tx.run(_CYPHER_MISSING_ENTITIES, case=case, names=list(names))).single()
+    return record["missing"] if record else []
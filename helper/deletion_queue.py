@@ -0,0 +1,262 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+from config import settings
+from database import get_database
+from helper.neo4j_timeline import delete_case_from_neo4j, delete_file_from_neo4j
+
+# Asynchronous purge of deleted cases and documents.
+# A DELETE request only marks the record `deleting` (hidden from listings) and queues a
+# job in the Mongo `deletion_jobs` collection. A background worker then removes the
+# files, Mongo records and graph data. Every step is idempotent, so a job that fails
+# (or whose worker dies mid-purge) is simply run again after an exponential backoff,
+# up to DELETION_MAX_ATTEMPTS times. Jobs carry a `progress` document for polling.
+#
+# The record being deleted holds the id of its job (`deletion_job_id`), claimed
+# atomically, so repeated DELETEs get the job already in flight instead of a new one.
+# A job that fails for good releases the claim and can be queued again.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _notify() -> None:
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _enqueue(db, job: Dict[str, Any]) -> str:
+    now = _now()
+    job.update({
+        "status": QUEUED,
+        "attempts": 0,
+        "progress": {},
+        "error": None,
+        "next_attempt_at": now,
+        "created_at": now,
+        "updated_at": now,
+    })
+    result = await db.deletion_jobs.insert_one(job)
+    _notify()
+    return str(result.inserted_id)
+
+
+async def _claim_record(collection, record_id: ObjectId, job_id: ObjectId) -> Optional[str]:
+    """Mark the record deleting under `job_id`; returns the id of the job that already owns it, if any."""
+    claimed = await collection.find_one_and_update(
+        {"_id": record_id, "deletion_job_id": None},
+        {"$set": {"deleting": True, "deletion_job_id": job_id, "updated_at": _now()}},
+    )
+    if claimed is not None:
+        return None
+    record = await collection.find_one({"_id": record_id}, {"deletion_job_id": 1})
+    return str(record["deletion_job_id"]) if record and record.get("deletion_job_id") else None
+
+
+async def enqueue_case_deletion(db, case_id: str, user_id: str) -> str:
+    job_id = ObjectId()
+    existing = await _claim_record(db.cases, ObjectId(case_id), job_id)
+    if existing:
+        return existing
+    await db.documents.update_many({"case_id": case_id}, {"$set": {"deleting": True, "updated_at": _now()}})
+    return await _enqueue(db, {"_id": job_id, "kind": "case", "case_id": case_id, "user_id": user_id})
+
+
+async def enqueue_document_deletion(db, case_id: str, document: Dict[str, Any], source: str, user_id: str) -> str:
+    # A queued case deletion already covers the document
+    case = await db.cases.find_one({"_id": ObjectId(case_id)}, {"deletion_job_id": 1})
+    if case and case.get("deletion_job_id"):
+        return str(case["deletion_job_id"])
+    job_id = ObjectId()
+    existing = await _claim_record(db.documents, document["_id"], job_id)
+    if existing:
+        return existing
+    return await _enqueue(db, {
+        "_id": job_id,
+        "kind": "document",
+        "case_id": case_id,
+        "document_id": str(document["_id"]),
+        "source": source,
+        "user_id": user_id,
+    })
+
+
+async def get_deletion_job(db, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """The job, if `job_id` is valid and it was queued by `user_id`.
+
+    Ownership is recorded on the job itself because the case is gone once it is done.
+    """
+    if not ObjectId.is_valid(job_id):
+        return None
+    job = await db.deletion_jobs.find_one({"_id": ObjectId(job_id), "user_id": user_id})
+    if job:
+        job["id"] = str(job.pop("_id"))
+    return job
+
+
+def _unlink(file_path: str) -> None:
+    path = Path("." + file_path)
+    if path.exists():
+        path.unlink()
+
+
+async def _set_progress(db, job_id, **progress) -> None:
+    await db.deletion_jobs.update_one(
+        {"_id": job_id},
+        {"$set": {**{f"progress.{k}": v for k, v in progress.items()}, "updated_at": _now()}}
+    )
+
+
+async def _purge_document(db, job: Dict[str, Any]) -> None:
+    document = await db.documents.find_one({"_id": ObjectId(job["document_id"])})
+    if document and "file_path" in document:
+        await asyncio.to_thread(_unlink, document["file_path"])
+    await _set_progress(db, job["_id"], step="graph")
+
+    await delete_file_from_neo4j(job["case_id"], job["source"])
+    await _set_progress(db, job["_id"], step="records")
+
+    await db.graph_layouts.delete_many({"case_id": job["case_id"], "source_id": job["document_id"]})
+    await db.documents.delete_one({"_id": ObjectId(job["document_id"])})
+    await _set_progress(db, job["_id"], step="done")
+
+
+async def _purge_case(db, job: Dict[str, Any]) -> None:
+    case_id = job["case_id"]
+    total = await db.documents.count_documents({"case_id": case_id})
+    deleted = job["progress"].get("documents_deleted", 0)
+    await _set_progress(db, job["_id"], step="documents", documents_total=deleted + total, documents_deleted=deleted)
+
+    # Files and document records go in bounded batches so progress moves steadily
+    while True:
+        batch = await db.documents.find(
+            {"case_id": case_id}, {"file_path": 1}
+        ).limit(settings.DELETION_BATCH_DOCUMENTS).to_list(length=settings.DELETION_BATCH_DOCUMENTS)
+        if not batch:
+            break
+        for document in batch:
+            if "file_path" in document:
+                await asyncio.to_thread(_unlink, document["file_path"])
+        await db.documents.delete_many({"_id": {"$in": [d["_id"] for d in batch]}})
+        deleted += len(batch)
+        await _set_progress(db, job["_id"], documents_deleted=deleted)
+
+    await _set_progress(db, job["_id"], step="graph")
+    await delete_case_from_neo4j(case_id)
+    await _set_progress(db, job["_id"], step="records")
+
+    await db.graph_layouts.delete_many({"case_id": case_id})
+    await db.cases.delete_one({"_id": ObjectId(case_id)})
+    await _set_progress(db, job["_id"], step="done")
+
+
+async def _claim_job(db) -> Optional[Dict[str, Any]]:
+    """Atomically take the oldest due job, including running ones whose lease expired."""
+    now = _now()
+    return await db.deletion_jobs.find_one_and_update(
+        {"$or": [
+            {"status": QUEUED, "next_attempt_at": {"$lte": now}},
+            {"status": RUNNING, "lease_until": {"$lt": now}},
+        ]},
+        {"$set": {
+            "status": RUNNING,
+            "lease_until": now + timedelta(seconds=settings.DELETION_LEASE_SECONDS),
+            "updated_at": now,
+        }, "$inc": {"attempts": 1}},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _heartbeat(db, job: Dict[str, Any]) -> None:
+    """Keep extending the job's lease while this worker is still running it.
+
+    A single step (a large case's graph delete) can outlast the lease; without renewal
+    another worker would claim the job and purge the same records concurrently.
+    """
+    interval = settings.DELETION_LEASE_SECONDS / 3
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await db.deletion_jobs.update_one(
+                {"_id": job["_id"], "status": RUNNING, "attempts": job["attempts"]},
+                {"$set": {"lease_until": _now() + timedelta(seconds=settings.DELETION_LEASE_SECONDS)}}
+            )
+        except Exception as e:
+            print(f"[ERROR] Deletion job {job['_id']} heartbeat failed: {e}")
+
+
+async def _run_job(db, job: Dict[str, Any]) -> None:
+    heartbeat = asyncio.create_task(_heartbeat(db, job))
+    try:
+        await _purge(db, job)
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+
+async def _purge(db, job: Dict[str, Any]) -> None:
+    try:
+        if job["kind"] == "case":
+            await _purge_case(db, job)
+        else:
+            await _purge_document(db, job)
+        await db.deletion_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": DONE, "error": None, "finished_at": _now(), "updated_at": _now()}}
+        )
+        print(f"🗑 Deletion job {job['_id']} ({job['kind']} {job.get('document_id') or job['case_id']}) done")
+    except Exception as e:
+        failed = job["attempts"] >= settings.DELETION_MAX_ATTEMPTS
+        delay = settings.DELETION_RETRY_BASE_DELAY * 2 ** (job["attempts"] - 1)
+        print(f"[ERROR] Deletion job {job['_id']} attempt {job['attempts']} failed: {e}")
+        await db.deletion_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {
+                "status": FAILED if failed else QUEUED,
+                "error": str(e),
+                "next_attempt_at": _now() + timedelta(seconds=delay),
+                "updated_at": _now(),
+            }}
+        )
+        if failed:
+            # Let a later DELETE queue a fresh job; the record stays hidden meanwhile
+            collection = db.cases if job["kind"] == "case" else db.documents
+            record_id = ObjectId(job["case_id"] if job["kind"] == "case" else job["document_id"])
+            await collection.update_one(
+                {"_id": record_id, "deletion_job_id": job["_id"]}, {"$unset": {"deletion_job_id": ""}}
+            )
+
+
+async def run_deletion_worker() -> None:
+    """Process deletion jobs until cancelled; polls every DELETION_POLL_SECONDS or when woken."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    while True:
+        try:
+            db = await get_database()
+            job = await _claim_job(db) if db is not None else None
+            if job is not None:
+                await _run_job(db, job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[ERROR] Deletion worker: {e}")
+
+        _wakeup.clear()
+        try:
+            await asyncio.wait_for(_wakeup.wait(), settings.DELETION_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
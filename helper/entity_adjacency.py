@@ -0,0 +1,279 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import settings
+from database import graph_read_session, run_read_single
+from helper.response_cache import response_cache
+
+# In-memory compressed sparse row (CSR) adjacency of a case's entity graph.
+# Two entities are adjacent when a REL edge joins them or an event INVOLVES both.
+# Neighbourhood and path queries walk these arrays level by level with NumPy instead of
+# running variable-length Cypher expansions.
+#
+# A cached graph is tagged with the version of the case's latest change-log entry
+# (helper.change_log) that can alter it: an entity or relation change, or a deleted
+# event. The version is checked again as soon as this process writes to the case
+# (response_cache.bump), and otherwise at most every ADJACENCY_RECHECK_SECONDS. Only a
+# new version rebuilds the graph, so edits to statements, dates or categories do not.
+
+_CO_INVOLVED = "co_involved"
+
+# Newest first through the (case, version) index. Once pruning removed every such entry,
+# the log floor stands in for it.
+_GRAPH_VERSION_QUERY = """
+MATCH (c:Case {name: $case})
+RETURN coalesce(COLLECT {
+    MATCH (l:ChangeLog {case: $case})
+    WHERE l.kind IN ['entity', 'relation'] OR (l.kind = 'event' AND l.op = 'delete')
+    RETURN l.version ORDER BY l.version DESC LIMIT 1
+}[0], c.changeLogFloor, 0) AS version
+"""
+
+# Name order, so ties broken by node index are broken by name
+_ENTITIES_QUERY = """
+MATCH (e:Entity {case: $case})
+RETURN e.name AS name, coalesce(e.type, 'unknown') AS type
+ORDER BY name
+"""
+
+# Each co-involved pair once, deduplicated by the database rather than per event in Python
+_CO_INVOLVED_PAIRS_QUERY = """
+MATCH (ev:Event {case: $case})-[:INVOLVES]->(a:Entity)
+MATCH (ev)-[:INVOLVES]->(b:Entity)
+WHERE a.name < b.name
+RETURN DISTINCT a.name AS source, b.name AS target
+"""
+
+_REL_EDGES_QUERY = """
+MATCH (a:Entity {case: $case})-[r:REL]->(b:Entity {case: $case})
+WHERE a <> b
+RETURN a.name AS source, b.name AS target, r.relType AS relType, count(r) AS count
+"""
+
+
+class EntityAdjacency:
+    """Undirected entity graph as CSR arrays; `labels[k]` names the relation behind edge k.
+
+    `rel_degree[i]` counts the REL relationships of entity i in either direction.
+    """
+
+    def __init__(self, names: List[str], types: List[str], pairs: Dict[Tuple[int, int], str],
+                 rel_degree: Optional[np.ndarray] = None):
+        self.names = names
+        self.types = types
+        self.index = {name: i for i, name in enumerate(names)}
+        self.rel_degree = rel_degree if rel_degree is not None else np.zeros(len(names), dtype=np.int64)
+
+        n = len(names)
+        if pairs:
+            edges = np.asarray(list(pairs.keys()), dtype=np.int64)
+            edge_labels = np.asarray(list(pairs.values()), dtype=object)
+            # Store both directions, then sort by source row
+            src = np.concatenate([edges[:, 0], edges[:, 1]])
+            dst = np.concatenate([edges[:, 1], edges[:, 0]])
+            labels = np.concatenate([edge_labels, edge_labels])
+            order = np.lexsort((dst, src))
+            src, dst, labels = src[order], dst[order], labels[order]
+        else:
+            src = dst = np.zeros(0, dtype=np.int64)
+            labels = np.zeros(0, dtype=object)
+
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+        self.indices = dst.astype(np.int32)
+        self.labels = labels
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    def degree(self, node: int) -> int:
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def top_by_rel_degree(self, limit: int, min_degree: int = 0) -> np.ndarray:
+        """Up to `limit` nodes with at least `min_degree` REL relationships, highest first."""
+        candidates = np.flatnonzero(self.rel_degree >= min_degree)
+        order = np.argsort(-self.rel_degree[candidates], kind="stable")
+        return candidates[order[:limit]]
+
+    def _expand(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """All (source, neighbour, edge position) triples leaving `frontier`, vectorized."""
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        positions = np.arange(total) + offsets
+        return np.repeat(frontier, counts), self.indices[positions].astype(np.int64), positions
+
+    def bfs(self, start: int, max_hops: int, limit: Optional[int] = None, target: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Level-synchronous BFS; returns (distance, parent, parent_edge) arrays (-1 = unreached).
+
+        Stops early once `target` is reached or `limit` nodes have been visited.
+        """
+        n = len(self.names)
+        distance = np.full(n, -1, dtype=np.int64)
+        parent = np.full(n, -1, dtype=np.int64)
+        parent_edge = np.full(n, -1, dtype=np.int64)
+        distance[start] = 0
+        visited = 1
+        frontier = np.asarray([start], dtype=np.int64)
+
+        for hop in range(1, max_hops + 1):
+            src, dst, pos = self._expand(frontier)
+            fresh = distance[dst] < 0
+            src, dst, pos = src[fresh], dst[fresh], pos[fresh]
+            # Keep the first edge that reaches each new node
+            dst, first = np.unique(dst, return_index=True)
+            if not len(dst):
+                break
+            if limit is not None and visited + len(dst) > limit:
+                keep = limit - visited
+                dst, first = dst[:keep], first[:keep]
+            distance[dst] = hop
+            parent[dst] = src[first]
+            parent_edge[dst] = pos[first]
+            visited += len(dst)
+            if (target is not None and distance[target] >= 0) or (limit is not None and visited >= limit):
+                break
+            frontier = dst
+        return distance, parent, parent_edge
+
+    def links_between(self, nodes: np.ndarray) -> List[Dict[str, Any]]:
+        """Edges with both ends in `nodes`, each reported once."""
+        inside = np.zeros(len(self.names), dtype=bool)
+        inside[nodes] = True
+        src, dst, pos = self._expand(np.asarray(nodes, dtype=np.int64))
+        keep = inside[dst] & (src < dst)
+        return [
+            {"source": self.names[s], "target": self.names[d], "relType": self.labels[p]}
+            for s, d, p in zip(src[keep].tolist(), dst[keep].tolist(), pos[keep].tolist())
+        ]
+
+
+class _CachedAdjacency:
+    def __init__(self, graph: EntityAdjacency, version: int, local_version: int):
+        self.graph = graph
+        self.version = version
+        self.local_version = local_version
+        self.checked_at = time.monotonic()
+
+
+_cache: "OrderedDict[str, _CachedAdjacency]" = OrderedDict()
+_build_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def _build(tx, case: str) -> EntityAdjacency:
+    entities = await (await tx.run(_ENTITIES_QUERY, case=case)).data()
+    names = [e["name"] for e in entities]
+    types = [e["type"] for e in entities]
+    index = {name: i for i, name in enumerate(names)}
+
+    # REL labels win over plain co-involvement for the same pair
+    pairs: Dict[Tuple[int, int], str] = {}
+    result = await tx.run(_CO_INVOLVED_PAIRS_QUERY, case=case)
+    async for record in result:
+        a, b = index.get(record["source"]), index.get(record["target"])
+        if a is not None and b is not None:
+            pairs[(a, b) if a < b else (b, a)] = _CO_INVOLVED
+    rel_degree = np.zeros(len(names), dtype=np.int64)
+    result = await tx.run(_REL_EDGES_QUERY, case=case)
+    async for record in result:
+        a, b = index.get(record["source"]), index.get(record["target"])
+        if a is None or b is None:
+            continue
+        rel_degree[a] += record["count"]
+        rel_degree[b] += record["count"]
+        key = (a, b) if a < b else (b, a)
+        if pairs.get(key, _CO_INVOLVED) == _CO_INVOLVED:
+            pairs[key] = record["relType"]
+    return EntityAdjacency(names, types, pairs, rel_degree)
+
+
+async def get_entity_adjacency(case: str) -> EntityAdjacency:
+    cached = _cache.get(case)
+    local_version = response_cache.version(case)
+    if cached and cached.local_version == local_version \
+            and time.monotonic() - cached.checked_at < settings.ADJACENCY_RECHECK_SECONDS:
+        _cache.move_to_end(case)
+        return cached.graph
+
+    lock = _build_locks.setdefault(case, asyncio.Lock())
+    async with lock:
+        record = await run_read_single(_GRAPH_VERSION_QUERY, {"case": case})
+        version = record["version"] if record else 0
+        cached = _cache.get(case)
+        if cached and cached.version == version:
+            cached.local_version = local_version
+            cached.checked_at = time.monotonic()
+            _cache.move_to_end(case)
+            return cached.graph
+        async with graph_read_session(case) as s:
+            graph = await s.execute_read(_build, case)
+
+        _cache[case] = _CachedAdjacency(graph, version, local_version)
+        _cache.move_to_end(case)
+        while len(_cache) > settings.ADJACENCY_CACHE_MAX_CASES:
+            _cache.popitem(last=False)
+        return graph
+
+
+async def get_entity_neighbourhood(case: str, entity: str, hops: int, limit: int) -> Optional[Dict[str, Any]]:
+    graph = await get_entity_adjacency(case)
+    start = graph.index.get(entity)
+    if start is None:
+        return None
+
+    distance, _, _ = graph.bfs(start, hops, limit=limit)
+    reached = np.flatnonzero(distance >= 0)
+    reached = reached[np.argsort(distance[reached], kind="stable")]
+    # More nodes were in range if the last hop still had unvisited neighbours
+    frontier = reached[distance[reached] < hops]
+    _, beyond, _ = graph._expand(frontier)
+    truncated = bool(len(beyond) and (distance[beyond] < 0).any())
+    return {
+        "entity": entity,
+        "hops": hops,
+        "nodes": [
+            {"name": graph.names[i], "type": graph.types[i], "distance": int(distance[i]), "degree": graph.degree(i)}
+            for i in reached.tolist()
+        ],
+        "links": graph.links_between(reached),
+        "truncated": truncated,
+    }
+
+
+async def get_entity_path(case: str, source: str, target: str, max_hops: int) -> Optional[Dict[str, Any]]:
+    graph = await get_entity_adjacency(case)
+    start, end = graph.index.get(source), graph.index.get(target)
+    if start is None or end is None:
+        return None
+
+    distance, parent, parent_edge = graph.bfs(start, max_hops, target=end)
+    if distance[end] < 0:
+        return {"source": source, "target": target, "found": False, "hops": None, "path": [], "links": []}
+
+    path, links = [end], []
+    node = end
+    while node != start:
+        links.append({
+            "source": graph.names[int(parent[node])],
+            "target": graph.names[node],
+            "relType": graph.labels[int(parent_edge[node])],
+        })
+        node = int(parent[node])
+        path.append(node)
+    path.reverse()
+    links.reverse()
+    return {
+        "source": source,
+        "target": target,
+        "found": True,
+        "hops": int(distance[end]),
+        "path": [{"name": graph.names[i], "type": graph.types[i]} for i in path],
+        "links": links,
+    }
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import settings
+from database import get_database
+
+# Server-side force-directed layout for the per-source entity graph.
+# Coordinates are computed once in a process pool and stored in the Mongo
+# `graph_layouts` collection, one document per (case, source). Each document carries
+# a signature of the graph's node names and links: once the source's events change,
+# the graph (and so its signature) changes too and the layout is recomputed.
+
+_LAYOUT_VERSION = 1
+_BLOCK_SIZE = 1024
+
+_executor: Optional[ProcessPoolExecutor] = None
+_in_flight: Dict[Tuple[str, str, str], "asyncio.Future"] = {}
+
+
+def force_directed_layout(node_count: int, edges: List[Tuple[int, int]], iterations: int, seed: int = 42) -> np.ndarray:
+    """Fruchterman-Reingold on an (n, 2) array; repulsion is computed in row blocks so
+    memory stays O(block * n) instead of O(n^2)."""
+    if node_count == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    pos = rng.uniform(-1.0, 1.0, size=(node_count, 2))
+    if node_count == 1:
+        return np.zeros((1, 2))
+
+    k = np.sqrt(4.0 / node_count)  # ideal edge length in a [-1, 1]^2 box
+    edge_index = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        disp = np.zeros_like(pos)
+
+        # Repulsion between every pair: k^2 / d along the pair direction
+        for start in range(0, node_count, _BLOCK_SIZE):
+            block = pos[start:start + _BLOCK_SIZE]
+            delta = block[:, None, :] - pos[None, :, :]
+            dist2 = np.einsum("ijk,ijk->ij", delta, delta)
+            np.maximum(dist2, 1e-9, out=dist2)
+            disp[start:start + _BLOCK_SIZE] += np.einsum("ijk,ij->ik", delta, k * k / dist2)
+
+        # Attraction along edges: d^2 / k along the edge direction
+        if len(edge_index):
+            delta = pos[edge_index[:, 0]] - pos[edge_index[:, 1]]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-9)
+            force = delta * (dist / k)[:, None]
+            np.add.at(disp, edge_index[:, 0], -force)
+            np.add.at(disp, edge_index[:, 1], force)
+
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-9)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    scale = np.abs(pos).max()
+    return pos / scale if scale > 0 else pos
+
+
+def _layout_job(node_count: int, edges: List[Tuple[int, int]], iterations: int, width: float) -> List[List[float]]:
+    # Runs in a worker process; module-level so it can be pickled
+    pos = force_directed_layout(node_count, edges, iterations)
+    return np.round(pos * width / 2, 2).tolist()
+
+
+def get_layout_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.GRAPH_LAYOUT_WORKERS)
+    return _executor
+
+
+def shutdown_layout_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def graph_signature(graph: Dict[str, Any]) -> str:
+    names = {node["id"]: node["name"] for node in graph.get("nodes", [])}
+    links = sorted(
+        (names.get(link["source"]), names.get(link["target"]))
+        for link in graph.get("links", [])
+    )
+    payload = json.dumps([_LAYOUT_VERSION, sorted(names.values()), links], default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+async def _compute_positions(graph: Dict[str, Any]) -> Dict[str, List[float]]:
+    nodes = graph.get("nodes", [])
+    index = {node["id"]: i for i, node in enumerate(nodes)}
+    edges = [
+        (index[link["source"]], index[link["target"]])
+        for link in graph.get("links", [])
+        if link["source"] in index and link["target"] in index and link["source"] != link["target"]
+    ]
+    loop = asyncio.get_running_loop()
+    coords = await loop.run_in_executor(
+        get_layout_executor(), _layout_job,
+        len(nodes), edges, settings.GRAPH_LAYOUT_ITERATIONS, settings.GRAPH_LAYOUT_WIDTH
+    )
+    return {node["name"]: coords[i] for i, node in enumerate(nodes)}
+
+
+async def get_source_layout(case_id: str, source_id: str, graph: Dict[str, Any]) -> Dict[str, List[float]]:
+    """Stored node positions (by entity name) for this source graph, computing them if stale."""
+    db = await get_database()
+    signature = graph_signature(graph)
+    if db is not None:
+        stored = await db.graph_layouts.find_one({"case_id": case_id, "source_id": source_id})
+        if stored and stored.get("signature") == signature:
+            return {name: [x, y] for name, x, y in stored["positions"]}
+
+    # Concurrent requests for the same graph share one layout job
+    job_key = (case_id, source_id, signature)
+    future = _in_flight.get(job_key)
+    if future is None:
+        future = asyncio.ensure_future(_compute_positions(graph))
+        _in_flight[job_key] = future
+        future.add_done_callback(lambda _: _in_flight.pop(job_key, None))
+    positions = await future
+
+    if db is not None:
+        await db.graph_layouts.update_one(
+            {"case_id": case_id, "source_id": source_id},
+            {"$set": {
+                "signature": signature,
+                # Entity names may contain '.' or '$', so they cannot be Mongo keys
+                "positions": [[name, x, y] for name, (x, y) in positions.items()],
+                "node_count": len(positions),
+                "updated_at": datetime.now(timezone.utc),
+            }},
+            upsert=True
+        )
+    return positions
+
+
+async def apply_precomputed_layout(case_id: str, source_id: str, graph: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of `graph` with x/y on every node, for ECharts `layout: 'none'`."""
+    positions = await get_source_layout(case_id, source_id, graph)
+    nodes = []
+    for node in graph.get("nodes", []):
+        x, y = positions.get(node["name"], (0.0, 0.0))
+        nodes.append({**node, "x": x, "y": y})
+    return {**graph, "nodes": nodes, "layout": "precomputed"}
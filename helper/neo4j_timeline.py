@@ -1,16 +1,24 @@
-import os
-from neo4j import GraphDatabase
-from typing import Any, Dict, List, Optional
+import asyncio
+import base64
+import json
+import logging
+import math
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from datetime import date
 from neo4j.time import Date
 from dotenv import load_dotenv
 from uuid import uuid4
-load_dotenv()
+from config import settings
+from database import graph_session, graph_read_session, remember_bookmarks, run_read, run_read_single
+from helper.timeline_projection import adjust_entity_count, detach_timeline_rows, project_timeline_rows, refresh_timeline_rows
+from helper.response_cache import response_cache
+from helper.vector_store import get_vector_store
+from helper.entity_adjacency import get_entity_adjacency
+from helper.change_log import EVENT, ENTITY, RELATION, UPSERT, DELETE, changes, record_changes, missing_events, missing_entities
 
-## Graphdb configuration
-URI      = os.getenv("NEO4J_URI", "neo4j+s://localhost:7687")
-USER     = os.getenv("NEO4J_USER", "neo4j")
-PASSWORD = os.getenv("NEO4J_PASSWORD", "password")  
+load_dotenv()
+logger = logging.getLogger(__name__)
 
 
 def serialize_neo4j_value(value: Any):
@@ -78,57 +86,85 @@ def serialize_neo4j_value(value: Any):
 #     return data, total_items
 
 
+# Deduplicated timeline rows are materialized at write time (see helper.timeline_projection),
+# one per unique (date, statement, category, tag, entities) with the latest source.
+_TIMELINE_ROWS_QUERY = """
+    MATCH (row:TimelineRow {{case: $case}})
+    {where_clause}
+    WITH row.source AS source,
+        row.eventId AS eventId,
+        row.date AS date,
+        row.statement AS statement,
+        row.category AS category,
+        row.tag AS tag,
+        row.entities AS entities
+"""
+
+
+def _timeline_where_clause(start_date, end_date, params: Dict[str, Any], extra: Optional[str] = None) -> str:
+    filters = []
+    if start_date:
+        filters.append("row.date >= date($start_date)")
+        params["start_date"] = start_date.isoformat()
+    if end_date:
+        filters.append("row.date <= date($end_date)")
+        params["end_date"] = end_date.isoformat()
+    if extra:
+        filters.append(f"({extra})")
+
+    return f"WHERE {' AND '.join(filters)}" if filters else ""
+
+
+def encode_timeline_cursor(date_value: str, event_id: str) -> str:
+    """Opaque cursor pointing just after the (date, eventId) of a timeline row."""
+    payload = json.dumps({"date": date_value, "eventId": event_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_timeline_cursor(cursor: str) -> Tuple[str, str]:
+    """Return (date, eventId) from a cursor; raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(payload["date"]).isoformat(), str(payload["eventId"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
 # # Get the timeline data by case id based on the unique date and the entity name
-def get_timeline_data_by_case_id(case_id: str, skip: int, limit: int, start_date, end_date):
+async def get_timeline_data_by_case_id(case_id: str, skip: int, limit: int, start_date, end_date):
+    cache_key = response_cache.key(case_id, "timeline", skip, limit, start_date, end_date)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        filters = []
         params = {
             "case": case_id,
             "skip": skip,
             "limit": limit
         }
+        where_clause = _timeline_where_clause(start_date, end_date, params)
 
-        if start_date:
-            filters.append("ev.date >= date($start_date)")
-            params["start_date"] = start_date.isoformat()
-        if end_date:
-            filters.append("ev.date <= date($end_date)")
-            params["end_date"] = end_date.isoformat()
-
-        where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+        # Unfiltered totals come from the counter kept on the Case node;
+        # date-filtered ones are a range count on the (case, date) index.
+        if start_date or end_date:
+            total_expr = f"COUNT {{ MATCH (row:TimelineRow {{case: $case}}) {where_clause} }}"
+        else:
+            total_expr = "coalesce(c.timelineCount, 0)"
 
+        # Order by eventId as well so rows sharing a date page deterministically
         query = f"""
-            MATCH (c:Case {{name: $case}})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
-            {where_clause}
-            WITH ev, f, collect(DISTINCT e.name) AS entityList
-            WITH ev, f, apoc.coll.sort(entityList) AS sortedEntities
-            WITH ev.date AS date,
-                ev.id AS eventId,
-                ev.statement AS statement,
-                ev.category AS category,
-                coalesce(ev.tag, '') AS tag,
-                sortedEntities AS entities,
-                f.name AS source,
-                f.ingestedAt AS ingestedAt
-            ORDER BY ingestedAt DESC
-            WITH date, statement, category, tag, entities, collect({{
-                eventId: eventId,
-                statement: statement,
-                category: category,
-                tag: tag,
-                source: source,
-                ingestedAt: ingestedAt
-            }})[0] AS latest
-            RETURN latest.source AS source,
-                latest.eventId AS eventId,
-                date,
-                latest.statement AS statement,
-                latest.category AS category,
-                latest.tag AS tag,
-                entities
-            ORDER BY date
-            SKIP $skip
-            LIMIT $limit
+            CALL {{
+                MATCH (row:TimelineRow {{case: $case}})
+                {where_clause}
+                RETURN row
+                ORDER BY row.date, row.eventId
+                SKIP $skip
+                LIMIT $limit
+            }}
+            WITH collect(row {{.source, .eventId, .date, .statement, .category, .tag, .entities}}) AS rows
+            OPTIONAL MATCH (c:Case {{name: $case}})
+            RETURN rows, {total_expr} AS total
         """
         # query = f"""
         #     MATCH (c:Case {{name: $case}})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
@@ -165,52 +201,453 @@ def get_timeline_data_by_case_id(case_id: str, skip: int, limit: int, start_date
         #     LIMIT $limit
         # """
 
-        count_query = f"""
-            MATCH (c:Case {{name: $case}})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
-            {where_clause}
-            WITH ev, collect(DISTINCT e.name) AS entityList
-            WITH ev.date AS date, ev.statement AS statement, ev.category AS category, coalesce(ev.tag, '') AS tag, apoc.coll.sort(entityList) AS sortedEntities
-            WITH date, statement, category, sortedEntities,
-                date + '|' + statement + '|' + category + '|' + tag + '|' + apoc.text.join(sortedEntities, ',') AS uniqueKey
-            RETURN count(DISTINCT uniqueKey) AS total
-
-        """
-
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as driver, driver.session() as session:
-            result = session.run(query, **params)
-            data = result.data()
-
-            count_result = session.run(count_query, **params)
-            total_items = count_result.single()["total"]
+        record = await run_read_single(query, params)
+        data = record["rows"]
+        total_items = record["total"]
 
         # Convert Neo4j Date to ISO string
         for item in data:
             if "date" in item and isinstance(item["date"], Date):
                 item["date"] = item["date"].iso_format()
 
+        response_cache.set(cache_key, (data, total_items))
         return data, total_items
     except Exception as e:
         print(f"Error in get_timeline_data_by_case_id: {e}")
         return [], 0
 
 
-def delete_case_from_neo4j(case_id: str):
-    """Delete the case, its files, and any orphan events/entities."""
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^~*?:\\/]|&&|\|\|)')
+_QUERY_TERMS = re.compile(r'"([^"]+)"|(\S+)')
+# Lucene only reads these as operators in upper case
+_LUCENE_KEYWORDS = {"AND", "OR", "NOT"}
+
+
+def _lucene_query(case_id: str, q: str) -> str:
+    """Per-case Lucene query over statement and entity names. Quoted parts stay phrases;
+    every other Lucene operator in `q` is escaped, and the AND/OR/NOT keywords are
+    lowercased so they are searched as plain words."""
+    parts = []
+    for phrase, word in _QUERY_TERMS.findall(q):
+        if phrase:
+            parts.append('"' + _LUCENE_SPECIAL.sub(r"\\\1", phrase) + '"')
+        elif word.strip('"'):
+            word = word.strip('"')
+            if word in _LUCENE_KEYWORDS:
+                word = word.lower()
+            parts.append(_LUCENE_SPECIAL.sub(r"\\\1", word))
+    terms = " ".join(parts) or '""'
+    case = case_id.replace("\\", "\\\\").replace('"', '\\"')
+    return f'case:"{case}" AND (statement:({terms}) OR entityText:({terms}))'
+
+
+def _highlight(text: Optional[str], q: str) -> Optional[str]:
+    if not text:
+        return text
+    words = [w for phrase, word in _QUERY_TERMS.findall(q) for w in (phrase or word).strip('"').split()]
+    if not words:
+        return text
+    pattern = re.compile(r"\b(" + "|".join(re.escape(w) for w in sorted(set(words), key=len, reverse=True)) + r")\w*", re.IGNORECASE)
+    return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
+
+
+# The maxHits cap is applied after the date filter, so a date range still gets its
+# best-ranked maxHits rows rather than whatever survives of the case-wide top maxHits.
+# Unfiltered searches pass the cap to the index itself.
+_TEXT_SEARCH_QUERY = """
+    CALL db.index.fulltext.queryNodes('timeline_row_text', $lucene{index_options})
+    YIELD node AS row, score
+    {where_clause}
+    WITH row, score LIMIT $maxHits
+    WITH collect({{row: row, score: score}}) AS hits
+    RETURN size(hits) AS total,
+           [h IN hits[$skip..($skip + $limit)] | h.row {{
+               .source, .eventId, .date, .statement, .category, .tag, .entities, score: h.score
+           }}] AS rows
+"""
+
+
+# Keyword search over the timeline: relevance-ranked rows with highlighted matches
+async def search_timeline_by_text(case_id: str, q: str, skip: int, limit: int, start_date, end_date):
+    cache_key = response_cache.key(case_id, "timeline_text", q, skip, limit, start_date, end_date)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    params = {
+        "lucene": _lucene_query(case_id, q),
+        "maxHits": settings.TIMELINE_SEARCH_MAX_HITS,
+        "skip": skip,
+        "limit": limit,
+    }
+    where_clause = _timeline_where_clause(start_date, end_date, params)
+    index_options = "" if where_clause else ", {limit: $maxHits}"
+    query = _TEXT_SEARCH_QUERY.format(where_clause=where_clause, index_options=index_options)
+
+    record = await run_read_single(query, params, case=case_id)
+    data = record["rows"] if record else []
+    total = record["total"] if record else 0
+
+    for item in data:
+        if isinstance(item["date"], Date):
+            item["date"] = item["date"].iso_format()
+        item["score"] = round(item["score"], 6)
+        item["highlight"] = {
+            "statement": _highlight(item["statement"], q),
+            "entities": [_highlight(e, q) for e in item["entities"] or []],
+        }
+
+    response_cache.set(cache_key, (data, total))
+    return data, total
+
+
+# Keyset (seek) pagination over (date, eventId); no SKIP, so deep pages cost the same as the first
+async def get_timeline_page_by_cursor(case_id: str, limit: int, cursor: Optional[str], seek_date: Optional[date], start_date, end_date):
+    cache_key = response_cache.key(case_id, "timeline_cursor", limit, cursor, seek_date, start_date, end_date)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    params = {
+        "case": case_id,
+        "limit": limit + 1
+    }
+
+    seek_clause = None
+    if cursor:
+        params["after_date"], params["after_id"] = decode_timeline_cursor(cursor)
+        seek_clause = "row.date > date($after_date) OR (row.date = date($after_date) AND row.eventId > $after_id)"
+    elif seek_date:
+        params["seek_date"] = seek_date.isoformat()
+        seek_clause = "row.date >= date($seek_date)"
+    where_clause = _timeline_where_clause(start_date, end_date, params, seek_clause)
+
+    query = _TIMELINE_ROWS_QUERY.format(where_clause=where_clause) + """
+        RETURN source, eventId, date, statement, category, tag, entities
+        ORDER BY date, eventId
+        LIMIT $limit
+    """
+
+    data = [record.data() for record in await run_read(query, params)]
+
+    for item in data:
+        if "date" in item and isinstance(item["date"], Date):
+            item["date"] = item["date"].iso_format()
+
+    # One extra row was fetched only to learn whether another page exists
+    next_cursor = None
+    if len(data) > limit:
+        data = data[:limit]
+        last = data[-1]
+        next_cursor = encode_timeline_cursor(last["date"], last["eventId"])
+
+    response_cache.set(cache_key, (data, next_cursor))
+    return data, next_cursor
+
+
+# Stream every timeline row of a case in (date, eventId) order without SKIP;
+# records are pulled from the server in fetch_size batches so memory stays flat.
+# A managed transaction would buffer the whole result, so this runs as an auto-commit
+# query on a read session (still routed to a reader).
+async def stream_timeline_rows(case_id: str, start_date, end_date) -> AsyncIterator[Dict[str, Any]]:
+    params = {"case": case_id}
+    where_clause = _timeline_where_clause(start_date, end_date, params)
+    query = _TIMELINE_ROWS_QUERY.format(where_clause=where_clause) + """
+        RETURN source, eventId, date, statement, category, tag, entities
+        ORDER BY date, eventId
+    """
+
+    async with graph_read_session(case_id, fetch_size=settings.TIMELINE_EXPORT_FETCH_SIZE) as session:
+        result = await session.run(query, **params)
+        async for record in result:
+            item = record.data()
+            if isinstance(item["date"], Date):
+                item["date"] = item["date"].iso_format()
+            yield item
+
+
+HISTOGRAM_INTERVALS = ("day", "week", "month", "quarter", "year")
+HISTOGRAM_SPLITS = ("category", "tag")
+
+
+# Event counts per day/week/month/quarter/year from the pre-aggregated TimelineBuckets
+async def get_timeline_histogram(case_id: str, interval: str, split_by: List[str], start_date, end_date) -> Dict[str, Any]:
+    cache_key = response_cache.key(case_id, "histogram", interval, tuple(split_by), start_date, end_date)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    params: Dict[str, Any] = {"case": case_id, "unit": interval}
+    filters = []
+    if start_date:
+        filters.append("b.day >= date($start_date)")
+        params["start_date"] = start_date.isoformat()
+    if end_date:
+        filters.append("b.day <= date($end_date)")
+        params["end_date"] = end_date.isoformat()
+    where_clause = f"WHERE {' AND '.join(filters)}" if filters else ""
+    # Only whitelisted split names reach the query text
+    split_columns = "".join(f", b.{field} AS {field}" for field in split_by if field in HISTOGRAM_SPLITS)
+
+    query = f"""
+        MATCH (b:TimelineBucket {{case: $case}})
+        {where_clause}
+        WITH date.truncate($unit, b.day) AS bucket{split_columns}, sum(b.count) AS count
+        RETURN *
+        ORDER BY bucket
+    """
+    data = [record.data() for record in await run_read(query, params)]
+
+    buckets = []
+    for item in data:
+        bucket = {"date": item.pop("bucket").iso_format(), "count": item.pop("count")}
+        bucket.update(item)
+        buckets.append(bucket)
+
+    histogram = {
+        "interval": interval,
+        "splitBy": split_by,
+        "total": sum(b["count"] for b in buckets),
+        "buckets": buckets,
+    }
+    response_cache.set(cache_key, histogram)
+    return histogram
+
+
+# Per-case totals maintained by helper.timeline_projection
+async def get_case_timeline_stats(case_id: str) -> Dict[str, Any]:
+    query = """
+        MATCH (c:Case {name: $case})
+        RETURN coalesce(c.timelineCount, 0) AS eventCount,
+               coalesce(c.entityCount, 0) AS entityCount,
+               coalesce(c.sourceCount, 0) AS sourceCount,
+               c.minDate AS minDate,
+               c.maxDate AS maxDate
+    """
+    record = await run_read_single(query, {"case": case_id})
+    if not record:
+        return {"eventCount": 0, "entityCount": 0, "sourceCount": 0, "minDate": None, "maxDate": None}
+    return serialize_neo4j_value(dict(record))
+
+
+_CHANGES_SINCE_QUERY = """
+    OPTIONAL MATCH (c:Case {name: $case})
+    RETURN coalesce(c.changeVersion, 0) AS version,
+           coalesce(c.changeLogFloor, 0) AS floor,
+           COLLECT {
+               MATCH (l:ChangeLog {case: $case})
+               WHERE l.version > $since
+               RETURN l {.kind, .op, .key}
+               ORDER BY l.version
+           } AS changes
+"""
+
+_CHANGED_EVENTS_QUERY = """
+    UNWIND $eventIds AS eid
+    MATCH (row:TimelineRow {case: $case})-[:PROJECTS]->(ev:Event {id: eid})
+    WHERE $source_id IS NULL OR EXISTS { MATCH (:Source {sourceId: $source_id})-[:HAS_EVENT]->(ev) }
+    WITH DISTINCT row
+    RETURN row.source AS source, row.eventId AS eventId, row.date AS date, row.statement AS statement,
+           row.category AS category, row.tag AS tag, row.entities AS entities
+"""
+
+_CHANGED_ENTITIES_QUERY = """
+    UNWIND $names AS name
+    MATCH (e:Entity {case: $case, name: name})
+    RETURN e.name AS name, coalesce(e.type, 'unknown') AS type
+"""
+
+_CHANGED_RELATIONS_QUERY = """
+    UNWIND $eventIds AS eid
+    MATCH (ev:Event {id: eid})
+    WHERE $source_id IS NULL OR EXISTS { MATCH (:Source {sourceId: $source_id})-[:HAS_EVENT]->(ev) }
+    MATCH (a:Entity)-[r:REL {eventId: eid}]->(b)
+    WHERE b:Year OR b.case = $case
+    RETURN DISTINCT a.name AS source, coalesce(b.name, toString(b.value)) AS target,
+           r.relType AS relType, r.eventId AS eventId
+"""
+
+
+# Delta sync: what changed in a case after version `since` (see helper.change_log).
+# `reset` tells the client its version is no longer covered by the log and it has to
+# refetch in full; upserts carry the current state, deletes only the keys.
+async def get_case_changes_since(case_id: str, since: int, source_id: Optional[str] = None) -> Dict[str, Any]:
+    cache_key = response_cache.key(case_id, "changes", since, source_id)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    delta = {
+        "version": 0,
+        "since": since,
+        "reset": False,
+        "events": {"upserted": [], "deleted": []},
+        "entities": {"upserted": [], "deleted": []},
+        "relations": {"upserted": [], "deleted": []},
+    }
+
+    # One read transaction, so the log and the current state come from the same snapshot
+    async def _read(tx) -> Optional[Dict[Any, Any]]:
+        record = await (await tx.run(_CHANGES_SINCE_QUERY, case=case_id, since=since)).single()
+        delta["version"] = record["version"]
+        if since < record["floor"] or since > record["version"]:
+            delta["reset"] = True
+            return None
+
+        # Later entries win, so an event added then deleted is reported only as deleted
+        latest: Dict[str, Dict[Any, str]] = {EVENT: {}, ENTITY: {}, RELATION: {}}
+        for change in record["changes"]:
+            latest.setdefault(change["kind"], {})[change["key"]] = change["op"]
+
+        def keys(kind: str, op: str) -> List[Any]:
+            return [key for key, key_op in latest[kind].items() if key_op == op]
+
+        if keys(EVENT, UPSERT):
+            events = await (await tx.run(
+                _CHANGED_EVENTS_QUERY, case=case_id, eventIds=keys(EVENT, UPSERT), source_id=source_id
+            )).data()
+            for item in events:
+                if isinstance(item["date"], Date):
+                    item["date"] = item["date"].iso_format()
+            delta["events"]["upserted"] = events
+        if keys(ENTITY, UPSERT):
+            delta["entities"]["upserted"] = await (await tx.run(
+                _CHANGED_ENTITIES_QUERY, case=case_id, names=keys(ENTITY, UPSERT)
+            )).data()
+        if keys(RELATION, UPSERT):
+            delta["relations"]["upserted"] = await (await tx.run(
+                _CHANGED_RELATIONS_QUERY, case=case_id, eventIds=keys(RELATION, UPSERT), source_id=source_id
+            )).data()
+
+        delta["events"]["deleted"] = keys(EVENT, DELETE)
+        delta["entities"]["deleted"] = keys(ENTITY, DELETE)
+        delta["relations"]["deleted"] = keys(RELATION, DELETE)
+        return delta
+
+    async with graph_read_session(case_id) as s:
+        await s.execute_read(_read)
+
+    response_cache.set(cache_key, delta)
+    return delta
+
+
+# Orphan cleanup scoped to what a delete touched: the events it unlinked and the
+# entities and years those events reached. Only these candidates are checked, instead of
+# sweeping every Event, Entity and Year in the database.
+_AFFECTED_NODES_QUERY = """
+UNWIND $eventIds AS eid
+MATCH (ev:Event {id: eid})
+CALL {
+    WITH ev
+    MATCH (ev)-[:INVOLVES]->(node:Entity) RETURN node
+    UNION
+    WITH ev
+    MATCH (ev)-[:HAPPENED_IN]->(node:Year) RETURN node
+    UNION
+    WITH ev
+    MATCH (a)-[:REL {eventId: ev.id}]->(b)
+    UNWIND [a, b] AS node
+    RETURN node
+}
+WITH collect(DISTINCT node) AS nodes
+RETURN [n IN nodes WHERE n:Entity | n.name] AS entityNames,
+       [n IN nodes WHERE n:Year | n.value] AS years
+"""
+
+# (list parameter, row variable, per-row delete)
+_ORPHAN_STEPS = [
+    ("eventIds", "eid", """
+    MATCH (ev:Event {id: eid})
+    WHERE NOT (ev)<-[:HAS_EVENT]-(:Source)
+    OPTIONAL MATCH ()-[r:REL {eventId: eid}]->()
+    DELETE r
+    WITH DISTINCT ev
+    DETACH DELETE ev
+    """),
+    ("entityNames", "name", """
+    MATCH (e:Entity {case: $case, name: name})
+    WHERE NOT (e)<-[:INVOLVES]-(:Event)
+    DETACH DELETE e
+    """),
+    ("years", "value", """
+    MATCH (y:Year {value: value})
+    WHERE NOT ()-[:HAPPENED_IN]->(y)
+    DETACH DELETE y
+    """),
+]
+
+
+def _orphan_query(param: str, var: str, body: str, batched: bool) -> str:
+    if batched:
+        return f"UNWIND ${param} AS {var}\nCALL {{\n    WITH {var}{body}}} IN TRANSACTIONS OF $batch ROWS"
+    return f"UNWIND ${param} AS {var}{body}"
+
+
+async def affected_nodes(runner, event_ids: List[str]) -> Dict[str, List[Any]]:
+    """Entity names and year values reached by `event_ids`, collected before they are unlinked."""
+    record = await (await runner.run(_AFFECTED_NODES_QUERY, eventIds=list(event_ids))).single()
+    return {
+        "entityNames": record["entityNames"] if record else [],
+        "years": record["years"] if record else [],
+    }
+
+
+async def delete_orphans(runner, case: str, event_ids: List[str], affected: Dict[str, List[Any]], batched: bool = True) -> Tuple[int, int]:
+    """Delete whichever candidates lost their last link; returns (nodes, relationships) deleted.
+
+    Batched runs commit every DELETE_BATCH_ROWS candidates (CALL ... IN TRANSACTIONS), so
+    they need an auto-commit session; pass batched=False inside a managed transaction.
+    """
+    params = {"eventIds": list(event_ids), **affected}
+    nodes = rels = 0
+    for param, var, body in _ORPHAN_STEPS:
+        if not params[param]:
+            continue
+        res = await (await runner.run(
+            _orphan_query(param, var, body, batched),
+            {param: params[param], "case": case, "batch": settings.DELETE_BATCH_ROWS}
+        )).consume()
+        nodes += res.counters.nodes_deleted
+        rels += res.counters.relationships_deleted
+    return nodes, rels
+
+
+async def delete_case_from_neo4j(case_id: str):
+    """Delete the case, its files, events, entities and materialized timeline."""
+    # Event ids hash the case name, so every event and entity of the case belongs to it alone.
+    # Each label is found through its case index and deleted in batches.
     _DELETE_CASE = [
-        # 1. remove all files under the case
-        "MATCH (c:Case {name:$case})-[:HAS_FILE]->(f:Source) DETACH DELETE f",
-        # 2. delete the case node
+        "MATCH (f:Source {case:$case}) CALL { WITH f DETACH DELETE f } IN TRANSACTIONS OF $batch ROWS",
+        "MATCH (ev:Event {case:$case}) CALL { WITH ev DETACH DELETE ev } IN TRANSACTIONS OF $batch ROWS",
+        "MATCH (e:Entity {case:$case}) CALL { WITH e DETACH DELETE e } IN TRANSACTIONS OF $batch ROWS",
+        "MATCH (row:TimelineRow {case:$case}) CALL { WITH row DETACH DELETE row } IN TRANSACTIONS OF $batch ROWS",
+        "MATCH (b:TimelineBucket {case:$case}) CALL { WITH b DELETE b } IN TRANSACTIONS OF $batch ROWS",
+        "MATCH (l:ChangeLog {case:$case}) CALL { WITH l DELETE l } IN TRANSACTIONS OF $batch ROWS",
         "MATCH (c:Case {name:$case}) DETACH DELETE c",
-        # 3. orphan sweeps
-        "MATCH (ev:Event) WHERE NOT (ev)<-[:HAS_EVENT]-(:Source) DETACH DELETE ev",
-        "MATCH (e:Entity) WHERE NOT (e)<-[:INVOLVES]-(:Event) DETACH DELETE e",
     ]
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
+    async with graph_session(case_id) as s:
+        # Years are shared between cases; only those this case reached are checked afterwards
+        record = await (await s.run(
+            """
+            CALL {
+                MATCH (:Event {case:$case})-[:HAPPENED_IN]->(y:Year) RETURN y
+                UNION
+                MATCH (:Entity {case:$case})-[:REL]->(y:Year) RETURN y
+            }
+            RETURN collect(y.value) AS years
+            """,
+            case=case_id,
+        )).single()
         n = r = 0
         for stmt in _DELETE_CASE:
-            res = s.run(stmt, case=case_id).consume()
+            res = await (await s.run(stmt, case=case_id, batch=settings.DELETE_BATCH_ROWS)).consume()
             n += res.counters.nodes_deleted
             r += res.counters.relationships_deleted
+        orphan_nodes, orphan_rels = await delete_orphans(s, case_id, [], {"entityNames": [], "years": record["years"]})
+        n += orphan_nodes
+        r += orphan_rels
+    await asyncio.to_thread(get_vector_store(case_id).drop)
+    response_cache.bump(case_id)
     print(f"🗑 CASE {case_id}: -{n} nodes, -{r} rels")
     
 
@@ -231,55 +668,107 @@ def delete_case_from_neo4j(case_id: str):
 #     print(f"Dleted from neo4j -{nodes} nodes, -{rels} rels")
 
 
-def delete_file_from_neo4j(case_id: str, source: str):
-    _DELETE_FILE_IN_CASE = [
-        # Delete the Source node and its direct relationships
-        "MATCH (c:Case {name:$case})-[:HAS_FILE]->(f:Source {name:$source}) DETACH DELETE f",
+_SOURCE_EVENT_IDS_QUERY = """
+MATCH (:Source {case:$case, name:$source})-[h:HAS_EVENT]->(ev:Event)
+WHERE $attempt IS NULL OR h.ingestAttempt = $attempt
+RETURN collect(ev.id) AS eventIds
+"""
 
-        # Delete Events no longer connected to any Source
-        "MATCH (ev:Event) WHERE NOT (ev)<-[:HAS_EVENT]-(:Source) DETACH DELETE ev",
+_UNLINK_ATTEMPT_CYPHER = """
+MATCH (:Source {case:$case, name:$source})-[h:HAS_EVENT {ingestAttempt: $attempt}]->()
+DELETE h
+"""
 
-        # Delete Entities no longer connected to any Event
-        "MATCH (e:Entity) WHERE NOT (e)<-[:INVOLVES]-(:Event) DETACH DELETE e",
 
-        # Delete Year nodes no longer connected to any Event
-        "MATCH (y:Year) WHERE NOT (y)<-[:HAPPENED_IN]-(:Event) DELETE y"
-    ]
+async def delete_file_from_neo4j(case_id: str, source: str, attempt: Optional[str] = None) -> List[str]:
+    """Delete a source and whatever only it kept alive; returns the deleted event ids.
 
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-        nodes = rels = 0
-        for stmt in _DELETE_FILE_IN_CASE:
-            res = s.run(stmt, case=case_id, source=source).consume()
-            nodes += res.counters.nodes_deleted
-            rels += res.counters.relationships_deleted
+    With `attempt`, the Source stays and only the events linked by that ingest attempt
+    are unlinked (and deleted if no other source holds them).
+    """
+    async with graph_session(case_id) as s:
+        # Events of this file may survive through other files; remember them to re-project
+        record = await (await s.run(
+            _SOURCE_EVENT_IDS_QUERY, case=case_id, source=source, attempt=attempt,
+        )).single()
+        event_ids = record["eventIds"] if record else []
+        affected = await affected_nodes(s, event_ids)
+        stale_keys = await detach_timeline_rows(s, case_id, event_ids)
+
+        # Delete the Source node (or the attempt's links), then whatever only it kept alive
+        if attempt is None:
+            res = await (await s.run(
+                "MATCH (f:Source {case:$case, name:$source}) DETACH DELETE f", case=case_id, source=source
+            )).consume()
+        else:
+            res = await (await s.run(_UNLINK_ATTEMPT_CYPHER, case=case_id, source=source, attempt=attempt)).consume()
+        nodes, rels = await delete_orphans(s, case_id, event_ids, affected)
+        nodes += res.counters.nodes_deleted
+        rels += res.counters.relationships_deleted
+        print(f"🗑 {source}@{case_id}: -{nodes} nodes, -{rels} rels")
+
+        await project_timeline_rows(s, case_id, event_ids, stale_keys)
+        deleted_entities = await missing_entities(s, case_id, affected["entityNames"])
+        await adjust_entity_count(s, case_id, -len(deleted_entities))
+
+        deleted_events = await missing_events(s, event_ids)
+        await record_changes(s, case_id,
+            changes(EVENT, DELETE, deleted_events)
+            + changes(RELATION, DELETE, deleted_events)
+            + changes(ENTITY, DELETE, deleted_entities))
+    await asyncio.to_thread(get_vector_store(case_id).delete, deleted_events)
+    response_cache.bump(case_id)
+    return deleted_events
             
             
 # delete entity entity name
 _CYPHER_DELETE_ENTITY_FROM_CASE = """
 MATCH (e:Entity {case: $case, name: $entity})
+OPTIONAL MATCH (ev:Event)-[:INVOLVES]->(e)
+WITH e, collect(ev.id) AS eventIds
 DETACH DELETE e
+RETURN eventIds
 """
 
-def delete_entity_from_case(case_id: str, entity_name: str):
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-        res = s.run(_CYPHER_DELETE_ENTITY_FROM_CASE, case=case_id, entity=entity_name).consume()
-    print(f"Deleted entity '{entity_name}',from case '{case_id}': -{res.counters.nodes_deleted} node(s), -{res.counters.relationships_deleted} rel(s)")
+
+async def _delete_entity(tx, case: str, query: str, params: Dict[str, Any]):
+    """Delete an entity and re-project the timeline rows of the events that named it.
+
+    Returns the write's summary counters.
+    """
+    result = await tx.run(query, params)
+    record = await result.single()
+    summary = await result.consume()
+    if record is not None:
+        await refresh_timeline_rows(tx, case, record["eventIds"])
+        await adjust_entity_count(tx, case, -summary.counters.nodes_deleted)
+        await record_changes(tx, case,
+            changes(ENTITY, DELETE, [params["entity"]]) + changes(EVENT, UPSERT, record["eventIds"]))
+    return summary.counters
+
+
+async def delete_entity_from_case(case_id: str, entity_name: str):
+    async with graph_session(case_id) as s:
+        res = await s.execute_write(_delete_entity, case_id, _CYPHER_DELETE_ENTITY_FROM_CASE,
+                                    {"case": case_id, "entity": entity_name})
+    response_cache.bump(case_id)
+    logger.info(f"Deleted entity '{entity_name}' from case '{case_id}': -{res.nodes_deleted} node(s), -{res.relationships_deleted} rel(s)")
     return res
 
     
 _QUERY_ENTITY_IN_CASE = """
-MATCH (c:Case {name:$case})-[:HAS_FILE]->(:File)-[:HAS_EVENT]->(ev)
-MATCH (ev)-[:INVOLVES]->(:Entity {case:$case, name:$entity})
+MATCH (:Entity {case:$case, name:$entity})<-[:INVOLVES]-(ev:Event)
 OPTIONAL MATCH (ev)-[:INVOLVES]->(co:Entity {case:$case})
-OPTIONAL MATCH (file:File)-[:HAS_EVENT]->(ev)
+WHERE co.name <> $entity
+OPTIONAL MATCH (file:Source)-[:HAS_EVENT]->(ev)
 RETURN ev.date AS date, ev.statement AS statement,
        collect(DISTINCT co.name)  AS coEntities,
        collect(DISTINCT file.name) AS sourceFiles
-# ORDER BY date"""
+ORDER BY date"""
 
-def get_entity_in_case(case_name: str, entity_name: str):
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-        return s.run(_QUERY_ENTITY_IN_CASE, case=case_name, entity=entity_name).data()
+async def get_entity_in_case(case_name: str, entity_name: str):
+    records = await run_read(_QUERY_ENTITY_IN_CASE, {"case": case_name, "entity": entity_name})
+    return serialize_neo4j_value([record.data() for record in records])
 
 
 async def get_entity_graph_echarts(case_name: str):
@@ -327,14 +816,136 @@ async def get_entity_graph_echarts(case_name: str):
     } AS graph
     """
 
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as driver, driver.session() as session:
-        result = session.run(cypher, case=case_name).single()
-        if result:
-            return result["graph"]
-        return {"nodes": [], "links": [], "categories": []}
+    result = await run_read_single(cypher, {"case": case_name})
+    if result:
+        return result["graph"]
+    return {"nodes": [], "links": [], "categories": []}
     
     
-async def update_entity_and_event(driver, case_name, entity_name, new_name=None, new_statement=None, new_category=None):
+# Level-of-detail entity graph for a whole case. Only the top `max_nodes` entities by
+# REL degree are returned, edges are REL counts between them (weight), and each node
+# keeps its `top_k` heaviest edges; expand_entity_graph_node drills into one entity.
+# Entities are ranked from the REL degrees held by the cached adjacency
+# (helper.entity_adjacency), so a request only reads the links of the chosen nodes.
+_CASE_GRAPH_LINKS_QUERY = """
+    UNWIND $names AS name
+    MATCH (a:Entity {case: $case, name: name})-[r:REL]->(b:Entity {case: $case})
+    WHERE b.name IN $names AND a <> b
+    WITH a, b, count(r) AS weight
+    WHERE weight >= $minWeight
+    RETURN collect({source: a.name, target: b.name, weight: weight}) AS links
+"""
+
+_EXPAND_NODE_QUERY = """
+    MATCH (e:Entity {case: $case, name: $entity})
+    OPTIONAL MATCH (e)-[r:REL]-(n:Entity {case: $case})
+    WHERE n <> e
+    WITH e, n, count(r) AS weight
+    WHERE n IS NULL OR weight >= $minWeight
+    ORDER BY weight DESC, n.name
+    WITH e, collect(CASE WHEN n IS NULL THEN null ELSE {
+        name: n.name, type: n.type, weight: weight,
+        degree: COUNT { (n)-[:REL]-(:Entity) }
+    } END) AS neighbours
+    RETURN e.name AS name, e.type AS type, COUNT { (e)-[:REL]-(:Entity) } AS degree,
+           size(neighbours) AS neighbourCount, neighbours[..$topK] AS neighbours
+"""
+
+
+def _echarts_graph(nodes: List[Dict[str, Any]], links: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Shape entity nodes/weighted links like get_entity_graph_echarts (category = entity type)."""
+    categories = sorted({node.get("type") or "unknown" for node in nodes})
+    category_index = {name: i for i, name in enumerate(categories)}
+    return {
+        "nodes": [{
+            "id": node["name"],
+            "name": node["name"],
+            "value": float(node["degree"]),
+            "symbolSize": 10 + math.sqrt(node["degree"]) * 5,
+            "category": category_index[node.get("type") or "unknown"],
+        } for node in nodes],
+        "links": [{"source": l["source"], "target": l["target"], "value": l["weight"]} for l in links],
+        "categories": [{"name": name} for name in categories],
+    }
+
+
+def _keep_top_k_links(links: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """Merge both REL directions per pair, then keep a link if it is among the
+    `top_k` heaviest of either endpoint."""
+    merged: Dict[Tuple[str, str], int] = {}
+    for link in links:
+        pair = tuple(sorted((link["source"], link["target"])))
+        merged[pair] = merged.get(pair, 0) + link["weight"]
+
+    ranked = sorted(merged.items(), key=lambda item: (-item[1], item[0]))
+    per_node: Dict[str, int] = {}
+    kept = []
+    for (source, target), weight in ranked:
+        if per_node.get(source, 0) < top_k or per_node.get(target, 0) < top_k:
+            kept.append({"source": source, "target": target, "weight": weight})
+            per_node[source] = per_node.get(source, 0) + 1
+            per_node[target] = per_node.get(target, 0) + 1
+    return kept
+
+
+async def get_case_entity_graph(case_name: str, max_nodes: int, min_degree: int, min_weight: int, top_k: int) -> Dict[str, Any]:
+    cache_key = response_cache.key(case_name, "case_graph", max_nodes, min_degree, min_weight, top_k)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    adjacency = await get_entity_adjacency(case_name)
+    top = adjacency.top_by_rel_degree(max_nodes, min_degree).tolist()
+    nodes = [
+        {"name": adjacency.names[i], "type": adjacency.types[i], "degree": int(adjacency.rel_degree[i])}
+        for i in top
+    ]
+    record = await run_read_single(_CASE_GRAPH_LINKS_QUERY, {
+        "case": case_name, "names": [n["name"] for n in nodes], "minWeight": min_weight,
+    }) if nodes else None
+
+    links = _keep_top_k_links(record["links"] if record else [], top_k)
+    graph = _echarts_graph(nodes, links)
+    total_nodes = len(adjacency.names)
+    graph["meta"] = {
+        "totalNodes": total_nodes,
+        "returnedNodes": len(nodes),
+        "returnedLinks": len(links),
+        "truncated": len(nodes) < total_nodes,
+    }
+    response_cache.set(cache_key, graph)
+    return graph
+
+
+async def expand_entity_graph_node(case_name: str, entity_name: str, top_k: int, min_weight: int) -> Optional[Dict[str, Any]]:
+    """The entity plus its `top_k` heaviest neighbours, for drilling into the pruned graph."""
+    cache_key = response_cache.key(case_name, "case_graph_expand", entity_name, top_k, min_weight)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    record = await run_read_single(_EXPAND_NODE_QUERY, {
+        "case": case_name, "entity": entity_name, "topK": top_k, "minWeight": min_weight,
+    })
+    if not record:
+        return None
+
+    neighbours = record["neighbours"]
+    nodes = [{"name": record["name"], "type": record["type"], "degree": record["degree"]}] + neighbours
+    links = [{"source": record["name"], "target": n["name"], "weight": n["weight"]} for n in neighbours]
+    graph = _echarts_graph(nodes, links)
+    graph["meta"] = {
+        "entity": record["name"],
+        "degree": record["degree"],
+        "totalNeighbours": record["neighbourCount"],
+        "returnedNeighbours": len(neighbours),
+        "truncated": len(neighbours) < record["neighbourCount"],
+    }
+    response_cache.set(cache_key, graph)
+    return graph
+    
+    
+async def update_entity_and_event(case_name, entity_name, new_name=None, new_statement=None, new_category=None):
     query = """
     MATCH (c:Case {name: $case_name})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity {name: $entity_name})
     WHERE e.case = $case_name
@@ -347,104 +958,139 @@ async def update_entity_and_event(driver, case_name, entity_name, new_name=None,
     FOREACH (_ IN CASE WHEN $new_category IS NOT NULL THEN [1] ELSE [] END |
       SET ev.category = $new_category
     )
-    RETURN e, ev
+    WITH e, collect(ev) AS events
+    RETURN e, events[0] AS ev, [x IN events | x.id] AS eventIds
     """
-    async with driver.session() as session:
-        result = await session.run(
+
+    async def _update(tx):
+        record = await (await tx.run(
             query,
             case_name=case_name,
             entity_name=entity_name,
             new_name=new_name,
             new_statement=new_statement,
             new_category=new_category,
-        )
-        record = await result.single()
-        if record:
-            return {
-                "entity": record["e"],
-                "event": record["ev"],
-            }
-        return None 
+        )).single()
+        if not record:
+            return None
+        # Names, statements and categories are all part of the timeline key
+        await refresh_timeline_rows(tx, case_name, record["eventIds"])
+        entries = changes(EVENT, UPSERT, record["eventIds"])
+        if new_name is not None and new_name != entity_name:
+            entries += changes(ENTITY, DELETE, [entity_name]) + changes(ENTITY, UPSERT, [new_name])
+        await record_changes(tx, case_name, entries)
+        return {
+            "entity": record["e"],
+            "event": record["ev"],
+        }
+
+    async with graph_session(case_name) as session:
+        updated = await session.execute_write(_update)
+    if updated:
+        response_cache.bump(case_name)
+    return updated
   
 
 async def delete_entity(case_name, entity_name):
     query = """
-    MATCH (c:Case {name: $case_name})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity {name: $entity_name})
-    WHERE e.case = $case_name
+    MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity {name: $entity})
+    WHERE e.case = $case
+    WITH e, collect(DISTINCT ev.id) AS eventIds
     DETACH DELETE e
+    RETURN eventIds
     """
-    with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as driver, driver.session() as session:
-        session.run(query, case_name=case_name, entity_name=entity_name)
+    async with graph_session(case_name) as session:
+        await session.execute_write(_delete_entity, case_name, query, {"case": case_name, "entity": entity_name})
+    response_cache.bump(case_name)
 
     
+_SOURCE_GRAPH_QUERY = """
+    MATCH (f:Source {sourceId: $source_id})
+    WHERE f.case = $case AND coalesce(f.ingestStatus, 'complete') = 'complete'
+    MATCH (f)-[:HAS_EVENT]->(ev:Event)
+    WITH collect(DISTINCT ev) AS events
+    CALL {
+        WITH events
+        UNWIND events AS ev
+        MATCH (ev)-[:INVOLVES]->(e:Entity)
+        RETURN collect(DISTINCT {name: e.name, type: e.type}) AS entities
+    }
+    CALL {
+        WITH events
+        UNWIND events AS ev
+        MATCH (e1:Entity)-[r:REL]->(e2:Entity)
+        WHERE r.eventId = ev.id
+        RETURN collect(DISTINCT {source: e1.name, target: e2.name, relType: r.relType}) AS relations
+    }
+    RETURN entities, relations
+"""
+
+
 # fetch graph data for echarts
 async def fetch_graph_data_new(case_name: str, source_id: str) -> Dict[str, Any]:
+    cache_key = response_cache.key(case_name, "entity_relation", source_id)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-            # 1️⃣ Fetch nodes (entities + their types)
-            nodes_result = s.run("""
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
-                WHERE elementId(f) = $source_id
-                RETURN DISTINCT e.name AS name, e.type AS type
-            """, case=case_name, source_id=source_id)
-
-            nodes = []
-            name_to_id = {}
-            id_counter = 0
-            categories_set = set()
-
-            for record in nodes_result:
-                entity_name = record["name"]
-                entity_type = record.get("type", "unknown") or "unknown"
-
-                node_id = str(id_counter)
-                id_counter += 1
-
-                # Track for links mapping
-                name_to_id[entity_name] = node_id
+        # 1️⃣ Fetch nodes (entities + their types) and relations in one round trip;
+        # REL edges are found by seeking the rel_event_id index per event
+        record = await run_read_single(_SOURCE_GRAPH_QUERY, {"case": case_name, "source_id": source_id})
+        entity_records = record["entities"] if record else []
+        relation_records = record["relations"] if record else []
+
+        nodes = []
+        name_to_id = {}
+        id_counter = 0
+        categories_set = set()
+
+        for record in entity_records:
+            entity_name = record["name"]
+            entity_type = record.get("type", "unknown") or "unknown"
+
+            node_id = str(id_counter)
+            id_counter += 1
+
+            # Track for links mapping
+            name_to_id[entity_name] = node_id
+
+            # Track categories
+            categories_set.add(entity_type)
+
+            nodes.append({
+                "id": node_id,
+                "name": entity_name,
+                "category": entity_type,
+                "type": entity_type,
+                # Optional size, position (can be randomized or calculated on the frontend)
+                "symbolSize": 10
+            })
+            
+        # 2️⃣ Map edges (relations) onto node ids
+        links = []
+        for record in relation_records:
+            source_name = record["source"]
+            target_name = record["target"]
+
+            # Only create links if both entities exist (in case of filter issues)
+            if source_name in name_to_id and target_name in name_to_id:
+                links.append({
+                    "source": name_to_id[source_name],
+                    "target": name_to_id[target_name],
+                    "relType": record["relType"]
+                })
 
-                # Track categories
-                categories_set.add(entity_type)
+        # 3️⃣ Build category list (for filter dropdown in the frontend)
+        categories = [{"name": cat} for cat in sorted(categories_set)]
 
-                nodes.append({
-                    "id": node_id,
-                    "name": entity_name,
-                    "category": entity_type,
-                    "type": entity_type,
-                    # Optional size, position (can be randomized or calculated on the frontend)
-                    "symbolSize": 10
-                })
-                
-            # 2️⃣ Fetch edges (relations)
-            links_result = s.run("""
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)
-                WHERE elementId(f) = $source_id
-                MATCH (e1:Entity)-[r:REL {eventId: ev.id}]->(e2:Entity)
-                RETURN DISTINCT e1.name AS source, e2.name AS target, r.relType AS relType
-            """, case=case_name, source_id=source_id)
-
-            links = []
-            for record in links_result:
-                source_name = record["source"]
-                target_name = record["target"]
-
-                # Only create links if both entities exist (in case of filter issues)
-                if source_name in name_to_id and target_name in name_to_id:
-                    links.append({
-                        "source": name_to_id[source_name],
-                        "target": name_to_id[target_name],
-                        "relType": record["relType"]
-                    })
-
-            # 3️⃣ Build category list (for filter dropdown in the frontend)
-            categories = [{"name": cat} for cat in sorted(categories_set)]
-
-            # 4️⃣ Return in ECharts-friendly format
-            return {
-                "nodes": nodes,
-                "links": links,
-                "categories": categories
-            }
+        # 4️⃣ Return in ECharts-friendly format
+        graph = {
+            "nodes": nodes,
+            "links": links,
+            "categories": categories
+        }
+        response_cache.set(cache_key, graph)
+        return graph
     except Exception as e:
         print(f"Error fetching graph data: {e}")
         return {"nodes": [], "edges": [], "error": str(e)}
@@ -453,67 +1099,66 @@ async def fetch_graph_data_new(case_name: str, source_id: str) -> Dict[str, Any]
 # fetch graph data for echarts
 async def fetch_graph_data_new1(case_name: str) -> Dict[str, Any]:
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-            # 1️⃣ Fetch unique categories from the Events
-            categories_result = s.run("""
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)
-                RETURN DISTINCT ev.category AS name
-            """, case=case_name)
-
-            categories = [{"name": record["name"]} for record in categories_result if record["name"]]
-            category_names = {record["name"] for record in categories_result if record["name"]}
-
-            # 2️⃣ Fetch nodes (entities + linked events with categories)
-            nodes_result = s.run("""
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
-                RETURN DISTINCT e.name AS name, ev.category AS category
-            """, case=case_name)
-
-            nodes = []
-            name_to_id = {}
-            id_counter = 0
-
-            for record in nodes_result:
-                entity_name = record["name"]
-                category_name = record.get("category", "unknown") or "unknown"
-
-                # Track for links mapping
-                node_id = str(id_counter)
-                id_counter += 1
-                name_to_id[entity_name] = node_id
-
-                nodes.append({
-                    "id": node_id,
-                    "name": entity_name,
-                    "category": category_name,
-                    "symbolSize": 10
+        # 1️⃣ Fetch unique categories from the Events
+        category_records = await run_read("""
+            MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)
+            RETURN DISTINCT ev.category AS name
+        """, {"case": case_name})
+
+        categories = [{"name": record["name"]} for record in category_records if record["name"]]
+        category_names = {record["name"] for record in category_records if record["name"]}
+
+        # 2️⃣ Fetch nodes (entities + linked events with categories)
+        node_records = await run_read("""
+            MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)-[:INVOLVES]->(e:Entity)
+            RETURN DISTINCT e.name AS name, ev.category AS category
+        """, {"case": case_name})
+
+        nodes = []
+        name_to_id = {}
+        id_counter = 0
+
+        for record in node_records:
+            entity_name = record["name"]
+            category_name = record.get("category", "unknown") or "unknown"
+
+            # Track for links mapping
+            node_id = str(id_counter)
+            id_counter += 1
+            name_to_id[entity_name] = node_id
+
+            nodes.append({
+                "id": node_id,
+                "name": entity_name,
+                "category": category_name,
+                "symbolSize": 10
+            })
+
+        # 3️⃣ Fetch edges (relations)
+        link_records = await run_read("""
+            MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)
+            MATCH (e1:Entity)-[r:REL {eventId: ev.id}]->(e2:Entity)
+            RETURN DISTINCT e1.name AS source, e2.name AS target, r.relType AS relType
+        """, {"case": case_name})
+
+        links = []
+        for record in link_records:
+            source_name = record["source"]
+            target_name = record["target"]
+
+            if source_name in name_to_id and target_name in name_to_id:
+                links.append({
+                    "source": name_to_id[source_name],
+                    "target": name_to_id[target_name],
+                    "relType": record["relType"]
                 })
 
-            # 3️⃣ Fetch edges (relations)
-            links_result = s.run("""
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(:Source)-[:HAS_EVENT]->(ev:Event)
-                MATCH (e1:Entity)-[r:REL {eventId: ev.id}]->(e2:Entity)
-                RETURN DISTINCT e1.name AS source, e2.name AS target, r.relType AS relType
-            """, case=case_name)
-
-            links = []
-            for record in links_result:
-                source_name = record["source"]
-                target_name = record["target"]
-
-                if source_name in name_to_id and target_name in name_to_id:
-                    links.append({
-                        "source": name_to_id[source_name],
-                        "target": name_to_id[target_name],
-                        "relType": record["relType"]
-                    })
-
-            # 4️⃣ Return data for ECharts
-            return {
-                "nodes": nodes,
-                "links": links,
-                "categories": categories
-            }
+        # 4️⃣ Return data for ECharts
+        return {
+            "nodes": nodes,
+            "links": links,
+            "categories": categories
+        }
 
     except Exception as e:
         print(f"Error fetching graph data: {e}")
@@ -523,61 +1168,67 @@ async def fetch_graph_data_new1(case_name: str) -> Dict[str, Any]:
 
 # fetch graph data for neo4j graph (with real deduplication)
 async def fetch_graph_for_neo4j_graph_unique_relation(case_name: str, source_id: str) -> Dict[str, Any]:
+    cache_key = response_cache.key(case_name, "neo4j_graph", source_id)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-            query = """
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)-[:HAS_EVENT]->(ev:Event)
-                WHERE elementId(f) = $source_id
-
-                MATCH (n:Entity)-[r:REL {eventId: ev.id}]->(m)
-                WHERE (m:Year OR (m:Entity AND m.case = $case))
-                WITH n, m, r.relType AS relType
-                RETURN DISTINCT n, m, relType
-                ORDER BY elementId(n)
-            """
-            result = s.run(query, case=case_name, source_id=source_id)
-
-            nodes = []
-            edges = []
-            node_ids = set()
-            edge_keys = set()
-
-            for record in result:
-                source = record["n"]
-                target = record["m"]
-                rel_type = record["relType"]
-
-                source_id = str(source.id)
-                target_id = str(target.id)
-
-                # Source node
-                if source_id not in node_ids:
-                    nodes.append({
-                        "id": source_id,
-                        "label": source.get("name") or source_id
-                    })
-                    node_ids.add(source_id)
-
-                # Target node
-                if target_id not in node_ids:
-                    nodes.append({
-                        "id": target_id,
-                        "label": target.get("name") or target_id
-                    })
-                    node_ids.add(target_id)
-
-                # Deduplicate by (source, target, rel_type)
-                edge_key = (source_id, target_id, rel_type)
-                if edge_key not in edge_keys:
-                    edges.append({
-                        "from": source_id,
-                        "to": target_id,
-                        "label": rel_type.replace("_", " ") ,
-                        "id": str(uuid4())
-                    })
-                    edge_keys.add(edge_key)
-
-            return {"nodes": nodes, "edges": edges}
+        query = """
+            MATCH (f:Source {sourceId: $source_id})
+            WHERE f.case = $case AND coalesce(f.ingestStatus, 'complete') = 'complete'
+            MATCH (f)-[:HAS_EVENT]->(ev:Event)
+
+            MATCH (n:Entity)-[r:REL]->(m)
+            WHERE r.eventId = ev.id AND (m:Year OR (m:Entity AND m.case = $case))
+            WITH n, m, r.relType AS relType
+            RETURN DISTINCT n, m, relType
+            ORDER BY elementId(n)
+        """
+        records = await run_read(query, {"case": case_name, "source_id": source_id})
+
+        nodes = []
+        edges = []
+        node_ids = set()
+        edge_keys = set()
+
+        for record in records:
+            source = record["n"]
+            target = record["m"]
+            rel_type = record["relType"]
+
+            source_id = str(source.id)
+            target_id = str(target.id)
+
+            # Source node
+            if source_id not in node_ids:
+                nodes.append({
+                    "id": source_id,
+                    "label": source.get("name") or source_id
+                })
+                node_ids.add(source_id)
+
+            # Target node
+            if target_id not in node_ids:
+                nodes.append({
+                    "id": target_id,
+                    "label": target.get("name") or target_id
+                })
+                node_ids.add(target_id)
+
+            # Deduplicate by (source, target, rel_type)
+            edge_key = (source_id, target_id, rel_type)
+            if edge_key not in edge_keys:
+                edges.append({
+                    "from": source_id,
+                    "to": target_id,
+                    "label": rel_type.replace("_", " ") ,
+                    "id": str(uuid4())
+                })
+                edge_keys.add(edge_key)
+
+        graph = {"nodes": nodes, "edges": edges}
+        response_cache.set(cache_key, graph)
+        return graph
 
     except Exception as e:
         print(f"Error: {e}")
@@ -588,55 +1239,57 @@ async def fetch_graph_for_neo4j_graph_unique_relation(case_name: str, source_id:
 # delete event from neo4j
 async def delete_event_by_id(event_id: str):
     query = """
-    MATCH (f:Source)-[he:HAS_EVENT]->(ev:Event)
-    WHERE ev.id = $eventId
+    MATCH (:Source)-[he:HAS_EVENT]->(:Event {id: $eventId})
     DELETE he
-
-    WITH ev, $eventId AS eid
-    OPTIONAL MATCH (ev)<-[:HAS_EVENT]-(:Source)
-    WITH ev, eid, count(*) AS stillLinked
-    WHERE stillLinked = 0
-    OPTIONAL MATCH ()-[re:REL {eventId: eid}]-()
-    DELETE re
-    DETACH DELETE ev
-
-    WITH *
-    MATCH (e:Entity)
-    WHERE NOT (e)<-[:INVOLVES]-(:Event)
-    DETACH DELETE e
-
-    WITH *
-    MATCH (y:Year)
-    WHERE NOT ()-[:HAPPENED_IN]->(y)
-    DETACH DELETE y
     """
+    async def _delete(tx):
+        record = await (await tx.run("MATCH (ev:Event {id: $eventId}) RETURN ev.case AS case", eventId=event_id)).single()
+        if not record:
+            return None
+        case = record["case"]
+        affected = await affected_nodes(tx, [event_id])
+        stale_keys = await detach_timeline_rows(tx, case, [event_id])
+        await (await tx.run(query, eventId=event_id)).consume()
+        await delete_orphans(tx, case, [event_id], affected, batched=False)
+        await project_timeline_rows(tx, case, [event_id], stale_keys)
+
+        deleted = bool(await missing_events(tx, [event_id]))
+        if deleted:
+            entries = changes(EVENT, DELETE, [event_id]) + changes(RELATION, DELETE, [event_id])
+        else:
+            entries = changes(EVENT, UPSERT, [event_id])
+        deleted_entities = await missing_entities(tx, case, affected["entityNames"])
+        await adjust_entity_count(tx, case, -len(deleted_entities))
+        entries += changes(ENTITY, DELETE, deleted_entities)
+        await record_changes(tx, case, entries)
+        return case, deleted
+
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as driver, driver.session() as s:
-            result = s.run(query, eventId=event_id)
-            summary = result.consume()
-            print("Deletion complete:", summary)
-            return True
+        async with graph_session() as s:
+            result = await s.execute_write(_delete)
+            if result is not None:
+                remember_bookmarks(result[0], await s.last_bookmarks())
+        if result is None:
+            return False
+        case, deleted = result
+        if deleted:
+            await asyncio.to_thread(get_vector_store(case).delete, [event_id])
+        response_cache.bump(case)
+        print("Deletion complete:", event_id)
+        return True
     except Exception as e:
         print(f"Error: {e}")
         return False
     
     
 async def update_event_statement(event_id: str, new_statement: str):
-    query = """
-    MATCH (ev:Event {id: $eventId})
-    SET ev.statement = $newStatement
-    RETURN ev
-    """
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as driver, driver.session() as s:
-            result = s.run(query, eventId=event_id, newStatement=new_statement)
-            record = result.single()
-            if record:
-                print("Updated statement for event:", record["ev"])
-                return True
-            else:
-                print("Event not found")
-                return False
+        case = await _write_event_fields(event_id, new_statement, None, None, None)
+        if case is None:
+            print("Event not found")
+            return False
+        print("Updated statement for event:", event_id)
+        return True
     except Exception as e:
         print(f"Error: {e}")
         return False    
@@ -683,30 +1336,50 @@ async def update_event_statement(event_id: str, new_statement: str):
 #         return False
 
 
+_UPDATE_EVENT_FIELDS_QUERY = """
+    MATCH (ev:Event {id: $event_id})
+    SET ev.statement = coalesce($statement, ev.statement),
+        ev.category = coalesce($category, ev.category),
+        ev.date = coalesce(date($date), ev.date),
+        ev.tag       = coalesce($tag, ev.tag)
+    RETURN ev.case AS case
+"""
+
+
+async def _write_event_fields(event_id: str, statement: Optional[str], category: Optional[str], date: Optional[str], tag: Optional[str]) -> Optional[str]:
+    """Set the given fields, re-project the event's timeline row, log the change and
+    invalidate cached reads; returns the event's case, or None if it does not exist."""
+
+    async def _update(tx):
+        record = await (await tx.run(
+            _UPDATE_EVENT_FIELDS_QUERY,
+            event_id=event_id,
+            statement=statement,
+            category=category,
+            date=date,
+            tag=tag
+        )).single()
+        if record:
+            await refresh_timeline_rows(tx, record["case"], [event_id])
+            await record_changes(tx, record["case"], changes(EVENT, UPSERT, [event_id]))
+            return record["case"]
+        return None
+
+    async with graph_session() as session:
+        case = await session.execute_write(_update)
+        if case is not None:
+            remember_bookmarks(case, await session.last_bookmarks())
+    if case is not None:
+        response_cache.bump(case)
+    return case
+
+
 async def update_event_fields_in_neo4j(event_id: str, statement: Optional[str], category: Optional[str], date: Optional[str],  tag: Optional[str] ) -> bool:
     """
     Update only the statement, category, and date fields of an event in Neo4j.
     """
-
-    query_update_event = """
-        MATCH (ev:Event {id: $event_id})
-        SET ev.statement = coalesce($statement, ev.statement),
-            ev.category = coalesce($category, ev.category),
-            ev.date = coalesce(date($date), ev.date),
-            ev.tag       = coalesce($tag, ev.tag)
-    """
-
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as driver, driver.session() as session:
-            session.run(
-                query_update_event,
-                event_id=event_id,
-                statement=statement,
-                category=category,
-                date=date,
-                tag=tag
-            )
-
+        await _write_event_fields(event_id, statement, category, date, tag)
         return True
     except Exception as e:
         print("Error updating event fields in Neo4j:", e)
@@ -715,13 +1388,12 @@ async def update_event_fields_in_neo4j(event_id: str, statement: Optional[str],
 
 async def get_sources_by_case(case_name: str) -> List[Dict[str, Any]]:
     try:
-        with GraphDatabase.driver(URI, auth=(USER, PASSWORD)) as drv, drv.session() as s:
-            result = s.run("""
-                MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)
-                RETURN elementId(f) AS sourceId, f.docTitle AS sourceName
-            """, case=case_name)
-            
-            return [dict(record) for record in result]
+        records = await run_read("""
+            MATCH (c:Case {name: $case})-[:HAS_FILE]->(f:Source)
+            RETURN f.sourceId AS sourceId, f.docTitle AS sourceName,
+                   coalesce(f.ingestStatus, 'complete') AS ingestStatus
+        """, {"case": case_name})
+        return [record.data() for record in records]
     except Exception as e:
         print(f"Error fetching source IDs: {e}")
         return []
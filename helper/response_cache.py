@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from config import settings
+
+
+class ResponseCache:
+    """In-process LRU cache for timeline and graph reads.
+
+    Keys carry a per-case version; writers call `bump(case)` so every cached
+    response for that case becomes unreachable at once. Entries also expire after
+    `ttl_seconds`, which bounds staleness across worker processes.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def version(self, case: str) -> int:
+        return self._versions.get(case, 0)
+
+    def bump(self, case: str) -> int:
+        """Invalidate everything cached for `case` and return its new version."""
+        self._versions[case] = self.version(case) + 1
+        stale = [key for key in self._entries if key[0] == case]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += 1
+        return self._versions[case]
+
+    def key(self, case: str, namespace: str, *parts: Hashable) -> Tuple:
+        return (case, self.version(case), namespace, *parts)
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Tuple, value: Any) -> None:
+        if self.max_entries <= 0 or value is None:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+)
@@ -156,7 +156,7 @@ async def scrape_any(url: str, csv_path: str | None = "corpus.csv",
 async def scrape_content(db, limit: int = 10):
     try:
         cursor = db.documents.find(
-            {"is_data_scraped":{"$ne": True}, "document_type": "link", "status": 'pending'},
+            {"is_data_scraped":{"$ne": True}, "document_type": "link", "status": 'pending', "deleting": {"$ne": True}},
             {"document_url": 1, "_id": 1}
             ).sort("created_at", 1).limit(limit)
         
@@ -0,0 +1,189 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from neo4j.exceptions import Neo4jError
+from neo4j.time import Date
+from config import settings
+from database import run_read, run_read_single
+from data_processing.embeddings import embedding_service
+from helper.neo4j_timeline import _timeline_where_clause
+from helper.response_cache import ResponseCache, response_cache
+from helper.vector_store import get_vector_store
+
+# Semantic search over event embeddings. Cases with a local vector store
+# (helper.vector_store) are searched in process. Otherwise Event.embedding is used:
+# small cases are scored exactly in NumPy, larger ones go through the `event_embedding`
+# vector index with enough candidates to cover the case's share of it, falling back to
+# exact scoring when that is not enough. Hits are reported as the timeline rows that
+# project the matching events, so results look like TimelineEntry.
+
+query_embedding_cache = ResponseCache(
+    max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+)
+
+_ROW_FIELDS = """
+    row.source AS source, row.eventId AS eventId, row.date AS date, row.statement AS statement,
+    row.category AS category, row.tag AS tag, row.entities AS entities
+"""
+
+_EXACT_CANDIDATES_QUERY = """
+    MATCH (row:TimelineRow {{case: $case}})
+    {where_clause}
+    MATCH (row)-[:PROJECTS]->(ev:Event)
+    WHERE ev.embedding IS NOT NULL
+    RETURN """ + _ROW_FIELDS + """, ev.embedding AS embedding
+"""
+
+_LOCAL_HITS_QUERY = """
+    UNWIND $hits AS hit
+    MATCH (row:TimelineRow {{case: $case}})-[:PROJECTS]->(:Event {{id: hit.eventId}})
+    {where_clause}
+    WITH row, max(hit.score) AS score
+    ORDER BY score DESC
+    LIMIT $limit
+    RETURN """ + _ROW_FIELDS + """, score
+"""
+
+# The index spans every case, so over-fetch and filter down to this case afterwards.
+# How many candidates to ask for is worked out by _vector_search.
+_VECTOR_SEARCH_QUERY = """
+    CALL db.index.vector.queryNodes('event_embedding', $candidates, $embedding)
+    YIELD node AS ev, score
+    WHERE ev.case = $case
+    MATCH (row:TimelineRow {{case: $case}})-[:PROJECTS]->(ev)
+    {where_clause}
+    WITH row, max(score) AS score
+    ORDER BY score DESC
+    LIMIT $limit
+    RETURN """ + _ROW_FIELDS + """, score
+"""
+
+
+async def embed_query(text: str) -> List[float]:
+    key = query_embedding_cache.key("*", settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS, text)
+    cached = query_embedding_cache.get(key)
+    if cached is not None:
+        return cached
+    embedding = (await embedding_service.embed([text]))[0]
+    query_embedding_cache.set(key, embedding)
+    return embedding
+
+
+_INDEXED_EVENTS_QUERY = """
+    MATCH (c:Case)
+    RETURN sum(coalesce(c.timelineCount, 0)) AS events
+"""
+
+# The index-wide total only sizes the first candidate request, so a few minutes'
+# staleness is harmless and the scan over every Case node is not paid per search
+indexed_events_cache = ResponseCache(max_entries=1, ttl_seconds=settings.SEMANTIC_SEARCH_INDEX_COUNT_TTL_SECONDS)
+
+
+async def _indexed_events() -> int:
+    key = indexed_events_cache.key("*", "indexed_events")
+    cached = indexed_events_cache.get(key)
+    if cached is not None:
+        return cached
+    record = await run_read_single(_INDEXED_EVENTS_QUERY)
+    events = record["events"] if record else 0
+    indexed_events_cache.set(key, events)
+    return events
+
+
+async def _vector_search(params: Dict[str, Any], where_clause: str, limit: int, case_events: int) -> Optional[List[Dict[str, Any]]]:
+    """Rows from the shared vector index, or None when it cannot give this case a full answer.
+
+    The case holds only its share of the index, so the first request is scaled up by
+    that share. If filtering leaves fewer than `limit` rows, the request grows 4x at
+    a time up to SEMANTIC_SEARCH_VECTOR_MAX_CANDIDATES. Once it covers the whole
+    index, a short result is the true answer.
+    """
+    indexed = max(await _indexed_events(), case_events, 1)
+    share = case_events / indexed
+    candidates = max(limit * settings.SEMANTIC_SEARCH_OVERSAMPLE, 100)
+    candidates = int(min(candidates / max(share, 1e-9), settings.SEMANTIC_SEARCH_VECTOR_MAX_CANDIDATES))
+    query = _VECTOR_SEARCH_QUERY.format(where_clause=where_clause)
+    while True:
+        data = [r.data() for r in await run_read(query, {**params, "candidates": candidates})]
+        if len(data) >= limit or candidates >= indexed:
+            return data
+        if candidates >= settings.SEMANTIC_SEARCH_VECTOR_MAX_CANDIDATES:
+            return None
+        candidates = min(candidates * 4, settings.SEMANTIC_SEARCH_VECTOR_MAX_CANDIDATES)
+
+
+def _rank_exact(query: List[float], candidates: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Cosine similarity in NumPy; a row scores as its best-matching event."""
+    if not candidates:
+        return []
+    matrix = np.asarray([c["embedding"] for c in candidates], dtype=np.float32)
+    q = np.asarray(query, dtype=np.float32)
+    # Compare on the shared prefix when EMBEDDING_DIMENSIONS differs from the stored size
+    dim = min(matrix.shape[1], len(q))
+    matrix, q = matrix[:, :dim], q[:dim]
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(q)
+    scores = matrix @ q / np.maximum(norms, 1e-12)
+
+    best: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+    for candidate, score in zip(candidates, scores.tolist()):
+        current = best.get(candidate["eventId"])
+        if current is None or score > current[0]:
+            best[candidate["eventId"]] = (score, candidate)
+
+    ranked = sorted(best.values(), key=lambda item: -item[0])[:limit]
+    results = []
+    for score, candidate in ranked:
+        item = {k: v for k, v in candidate.items() if k != "embedding"}
+        item["score"] = round(score, 6)
+        results.append(item)
+    return results
+
+
+async def search_timeline_events(case_id: str, q: str, limit: int, start_date, end_date) -> Tuple[List[Dict[str, Any]], str]:
+    """Top `limit` timeline rows by cosine similarity to `q`; returns (rows, mode)."""
+    cache_key = response_cache.key(case_id, "semantic_search", q, limit, start_date, end_date)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    embedding = await embed_query(q)
+    params: Dict[str, Any] = {"case": case_id, "limit": limit, "embedding": embedding}
+    where_clause = _timeline_where_clause(start_date, end_date, params)
+
+    store = get_vector_store(case_id)
+    local_rows = await asyncio.to_thread(len, store)
+
+    # Each query is its own managed read, so a failed vector query cannot poison the fallback
+    data: Optional[List[Dict[str, Any]]] = None
+    if local_rows:
+        # Over-fetch so date filters and row de-duplication still leave `limit` rows
+        hits = await asyncio.to_thread(store.search, embedding, max(limit * settings.SEMANTIC_SEARCH_OVERSAMPLE, 100))
+        params["hits"] = [{"eventId": event_id, "score": score} for event_id, score in hits]
+        data = [r.data() for r in await run_read(_LOCAL_HITS_QUERY.format(where_clause=where_clause), params)]
+        mode = "local"
+    else:
+        record = await run_read_single(
+            "MATCH (c:Case {name: $case}) RETURN coalesce(c.timelineCount, 0) AS events", {"case": case_id}
+        )
+        event_count = record["events"] if record else 0
+
+        mode = "exact"
+        if event_count > settings.SEMANTIC_SEARCH_EXACT_MAX_EVENTS:
+            try:
+                data = await _vector_search(params, where_clause, limit, event_count)
+                if data is not None:
+                    mode = "vector"
+            except Neo4jError as e:
+                print(f"Vector search failed, falling back to exact scoring: {e}")
+
+        if data is None:
+            candidates = [r.data() for r in await run_read(_EXACT_CANDIDATES_QUERY.format(where_clause=where_clause), params)]
+            data = _rank_exact(embedding, candidates, limit)
+
+    for item in data:
+        if isinstance(item["date"], Date):
+            item["date"] = item["date"].iso_format()
+
+    response_cache.set(cache_key, (data, mode))
+    return data, mode
@@ -0,0 +1,239 @@
+from typing import Any, Iterable, List
+
+# Materialized timeline: one (:TimelineRow) per unique
+# (date, statement, category, tag, sorted entities) in a case, holding the fields
+# the timeline endpoint returns plus the event id and source of the latest ingested file.
+# Rows link to every event they stand for via [:PROJECTS] and are rebuilt at write time,
+# so timeline reads are a plain index range scan on (case, date, eventId).
+#
+# Rows are also counted into (:TimelineBucket {case, day, category, tag, count}) nodes,
+# one per day/category/tag combination. Every statement that creates or deletes rows
+# adjusts these counts itself, so histograms read O(buckets) instead of O(events).
+# The Case node's totals move the same way: each step applies the rows it created or
+# deleted as a delta, and the date span is only looked up again (through the
+# (case, date) index) when a deleted row sat on its current min or max.
+
+# Takes `row` in scope; decrements its bucket and drops buckets that reach zero
+_BUCKET_DECREMENT = """
+CALL {
+    WITH row
+    MATCH (b:TimelineBucket {case: $case, day: row.date, category: coalesce(row.category, ''), tag: coalesce(row.tag, '')})
+    SET b.count = b.count - 1
+    WITH b WHERE b.count <= 0
+    DELETE b
+}
+"""
+
+_CYPHER_DETACH_ROWS = """
+UNWIND $eventIds AS eid
+MATCH (:Event {id: eid})<-[:PROJECTS]-(row:TimelineRow {case: $case})
+WITH DISTINCT row
+""" + _BUCKET_DECREMENT + """
+WITH collect(row.key) AS keys, collect(row) AS rows, collect(row.date) AS dates
+FOREACH (r IN rows | DETACH DELETE r)
+RETURN keys, size(rows) AS removed, dates
+"""
+
+_CYPHER_REKEY_EVENTS = """
+UNWIND $eventIds AS eid
+MATCH (ev:Event {id: eid})
+OPTIONAL MATCH (ev)-[:INVOLVES]->(e:Entity)
+WITH ev, apoc.coll.sort(collect(DISTINCT e.name)) AS entities
+SET ev.case = coalesce(ev.case, $case),
+    ev.timelineEntities = entities,
+    ev.timelineKey = CASE WHEN size(entities) = 0 THEN null ELSE apoc.util.sha1([
+        coalesce(toString(ev.date), ''),
+        coalesce(ev.statement, ''),
+        coalesce(ev.category, ''),
+        coalesce(ev.tag, ''),
+        apoc.text.join(entities, ',')
+    ]) END
+RETURN collect(DISTINCT ev.timelineKey) AS keys
+"""
+
+_CYPHER_DROP_KEYS = """
+MATCH (row:TimelineRow {case: $case})
+WHERE row.key IN $keys
+""" + _BUCKET_DECREMENT + """
+WITH collect(row) AS rows, collect(row.date) AS dates
+FOREACH (r IN rows | DETACH DELETE r)
+RETURN size(rows) AS removed, dates
+"""
+
+_CYPHER_BUILD_ROWS = """
+UNWIND $keys AS key
+MATCH (ev:Event {case: $case, timelineKey: key})
+MATCH (f:Source {case: $case})-[:HAS_EVENT]->(ev)
+// Sources still ingesting (or failed) stay off the timeline until they complete
+WHERE coalesce(f.ingestStatus, 'complete') = 'complete'
+WITH key, ev, f
+ORDER BY f.ingestedAt DESC
+WITH key, collect(ev) AS events, collect({ev: ev, source: f})[0] AS latest
+WITH key, events, latest.ev AS ev, latest.source AS f
+// (case, key) is unique; a row built concurrently by another writer is reused, and
+// only rows created here count towards buckets and totals
+MERGE (row:TimelineRow {case: $case, key: key})
+WITH row, events, ev, f, row.eventId IS NULL AS created
+SET row += {
+    eventId: ev.id,
+    date: ev.date,
+    statement: ev.statement,
+    category: ev.category,
+    tag: coalesce(ev.tag, ''),
+    entities: ev.timelineEntities,
+    entityText: apoc.text.join(ev.timelineEntities, ' '),
+    source: f.name,
+    ingestedAt: f.ingestedAt
+}
+FOREACH (_ IN CASE WHEN created AND row.date IS NOT NULL THEN [1] ELSE [] END |
+    MERGE (b:TimelineBucket {case: $case, day: row.date, category: coalesce(row.category, ''), tag: row.tag})
+      ON CREATE SET b.count = 0
+    SET b.count = b.count + 1
+)
+WITH row, events, created
+CALL {
+    WITH row, events
+    UNWIND events AS member
+    MERGE (row)-[:PROJECTS]->(member)
+}
+WITH row WHERE created
+RETURN count(row) AS added, min(row.date) AS minDate, max(row.date) AS maxDate
+"""
+
+_CYPHER_CASE_EVENT_IDS = """
+MATCH (:Source {case: $case})-[:HAS_EVENT]->(ev:Event)
+RETURN collect(DISTINCT ev.id) AS eventIds
+"""
+
+_CYPHER_DROP_CASE_ROWS = """
+MATCH (row:TimelineRow {case: $case})
+DETACH DELETE row
+"""
+
+_CYPHER_DROP_CASE_BUCKETS = """
+MATCH (b:TimelineBucket {case: $case})
+DELETE b
+"""
+
+# Per-case totals kept on the Case node so reads never have to count the timeline.
+# `boundRemoved` is read before the SET: a deleted row on the old min/max date means
+# the span has to be looked up again.
+_CYPHER_ROW_DELTA = """
+MATCH (c:Case {name: $case})
+WITH c, coalesce(c.minDate IN $removedDates OR c.maxDate IN $removedDates, false) AS boundRemoved
+SET c.timelineCount = coalesce(c.timelineCount, 0) + $delta,
+    c.sourceCount = COUNT { (c)-[:HAS_FILE]->(:Source) },
+    c.minDate = CASE WHEN c.minDate IS NULL OR $addedMin < c.minDate THEN $addedMin ELSE c.minDate END,
+    c.maxDate = CASE WHEN c.maxDate IS NULL OR $addedMax > c.maxDate THEN $addedMax ELSE c.maxDate END
+RETURN boundRemoved
+"""
+
+# Both ends come off the (case, date, eventId) index in order, one row each
+_CYPHER_DATE_SPAN = """
+MATCH (c:Case {name: $case})
+SET c.minDate = COLLECT {
+        MATCH (row:TimelineRow {case: $case}) WHERE row.date IS NOT NULL
+        RETURN row.date ORDER BY row.date ASC LIMIT 1
+    }[0],
+    c.maxDate = COLLECT {
+        MATCH (row:TimelineRow {case: $case}) WHERE row.date IS NOT NULL
+        RETURN row.date ORDER BY row.date DESC LIMIT 1
+    }[0]
+"""
+
+_CYPHER_ENTITY_DELTA = """
+MATCH (c:Case {name: $case})
+SET c.entityCount = coalesce(c.entityCount, 0) + $delta
+"""
+
+# Full recount, only for rebuilds and backfills
+_CYPHER_CASE_COUNTERS = """
+MATCH (c:Case {name: $case})
+CALL {
+    MATCH (row:TimelineRow {case: $case})
+    RETURN count(row) AS events, min(row.date) AS minDate, max(row.date) AS maxDate
+}
+CALL {
+    MATCH (e:Entity {case: $case})
+    RETURN count(e) AS entities
+}
+SET c.timelineCount = events,
+    c.entityCount = entities,
+    c.sourceCount = COUNT { (c)-[:HAS_FILE]->(:Source) },
+    c.minDate = minDate,
+    c.maxDate = maxDate
+"""
+
+_REBUILD_BATCH_SIZE = 1000
+
+
+async def detach_timeline_rows(tx, case: str, event_ids: Iterable[str]) -> List[str]:
+    """Drop the rows projecting `event_ids` and return their keys.
+
+    Call before deleting events, while the [:PROJECTS] links still exist.
+    `tx` is anything with an async `run` (session or transaction).
+    """
+    record = await (await tx.run(_CYPHER_DETACH_ROWS, case=case, eventIds=list(event_ids))).single()
+    if not record:
+        return []
+    await _apply_row_delta(tx, case, -record["removed"], record["dates"])
+    return record["keys"]
+
+
+async def project_timeline_rows(tx, case: str, event_ids: Iterable[str], stale_keys: Iterable[str] = ()) -> None:
+    """Re-key `event_ids` and rebuild every row sharing their old or new key."""
+    record = await (await tx.run(_CYPHER_REKEY_EVENTS, case=case, eventIds=list(event_ids))).single()
+    keys = set(stale_keys) | set(record["keys"] if record else [])
+    if not keys:
+        await _apply_row_delta(tx, case, 0)
+        return
+    keys = list(keys)
+    dropped = await (await tx.run(_CYPHER_DROP_KEYS, case=case, keys=keys)).single()
+    await _apply_row_delta(tx, case, -dropped["removed"], dropped["dates"])
+    built = await (await tx.run(_CYPHER_BUILD_ROWS, case=case, keys=keys)).single()
+    await _apply_row_delta(tx, case, built["added"], added_min=built["minDate"], added_max=built["maxDate"])
+
+
+async def _apply_row_delta(tx, case: str, delta: int, removed_dates: Iterable[Any] = (), added_min=None, added_max=None) -> None:
+    """Move the Case node's timeline total and date span by one step's created/deleted rows."""
+    record = await (await tx.run(
+        _CYPHER_ROW_DELTA, case=case, delta=delta, removedDates=list(removed_dates),
+        addedMin=added_min, addedMax=added_max
+    )).single()
+    if record and record["boundRemoved"]:
+        await (await tx.run(_CYPHER_DATE_SPAN, case=case)).consume()
+
+
+async def adjust_entity_count(tx, case: str, delta: int) -> None:
+    """Add the entities a write created (or, negative, deleted) to the Case node's total."""
+    if delta:
+        await (await tx.run(_CYPHER_ENTITY_DELTA, case=case, delta=delta)).consume()
+
+
+async def refresh_case_counters(tx, case: str) -> None:
+    """Recount the event/entity/source totals and date span stored on the Case node."""
+    await (await tx.run(_CYPHER_CASE_COUNTERS, case=case)).consume()
+
+
+async def refresh_timeline_rows(tx, case: str, event_ids: Iterable[str]) -> None:
+    """Rebuild the rows of events that were created or edited in place."""
+    event_ids = list(event_ids)
+    stale_keys = await detach_timeline_rows(tx, case, event_ids)
+    await project_timeline_rows(tx, case, event_ids, stale_keys)
+
+
+async def drop_timeline_projection(tx, case: str) -> None:
+    await (await tx.run(_CYPHER_DROP_CASE_ROWS, case=case)).consume()
+    await (await tx.run(_CYPHER_DROP_CASE_BUCKETS, case=case)).consume()
+
+
+async def rebuild_timeline_projection(tx, case: str) -> int:
+    """Rebuild a whole case from its events; used to backfill existing data."""
+    await drop_timeline_projection(tx, case)
+    record = await (await tx.run(_CYPHER_CASE_EVENT_IDS, case=case)).single()
+    event_ids: List[Any] = record["eventIds"] if record else []
+    for i in range(0, len(event_ids), _REBUILD_BATCH_SIZE):
+        await project_timeline_rows(tx, case, event_ids[i:i + _REBUILD_BATCH_SIZE])
+    # The drop above bypassed the deltas, so count from scratch
+    await refresh_case_counters(tx, case)
+    return len(event_ids)
@@ -0,0 +1,469 @@
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from config import settings
+
+# Per-case event embeddings kept outside the graph store.
+#
+# Each case has a directory under VECTOR_STORE_DIR. Its data lives in a generation
+# directory named by the CURRENT file (or, for a store never rewritten, directly in the
+# case directory). A generation holds:
+#   meta.json     {"dim": ..., "dtype": "float32" | "int8"}
+#   vectors.f32   unit-normalized float32 rows, append-only, read through np.memmap
+#   vectors.i8    (int8 stores) the same rows quantized per row to int8 ...
+#   scales.f32    ... with one float32 scale per row: vector ~= int8 row * scale
+#   ids.log       one line per operation: "+<eventId>" appended a row, "-<eventId>" tombstones it
+#   ivf.npz       optional inverted-file index over the rows that existed when it was built
+#
+# Writers take an exclusive flock on `.lock` and append the vectors before their ids,
+# so a reader replaying ids.log never sees a row that is not on disk yet. Readers only
+# mmap and replay, so any number of API workers can search the same case concurrently.
+# Compaction and re-encoding write a complete new generation and switch CURRENT with
+# one rename; a reader resolves CURRENT once per load and opens every file of that one
+# generation. The previous generation is kept until the next switch so readers that
+# resolved it just before can still open it.
+#
+# Within a process one VectorStore per case is shared by many threads (asyncio.to_thread).
+# What a load produces is an immutable _Snapshot swapped in with a single assignment;
+# readers work on the snapshot they got, so a concurrent reload or compaction never
+# hands them half-updated arrays. Loads and maintenance are serialized by a thread lock.
+
+_SEARCH_CHUNK_ROWS = 65536
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE = 50000
+_DTYPES = {"float32": np.float32, "int8": np.int8}
+_VECTOR_FILES = {"float32": "vectors.f32", "int8": "vectors.i8"}
+_POINTER = "CURRENT"
+_GENERATION_PREFIX = "gen-"
+
+
+def _case_dir_name(case: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", case)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _quantize(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization; returns (int8 rows, float32 scales)."""
+    scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class _Snapshot(NamedTuple):
+    vectors: Optional[np.memmap]
+    scales: Optional[np.memmap]
+    alive: np.ndarray
+    row_ids: List[str]
+    live: Dict[str, int]
+    # IVF index of the same generation, if one was built
+    ivf: Optional[Dict[str, np.ndarray]] = None
+
+    def rows(self, index) -> np.ndarray:
+        """float32 copies of the rows at `index` (a slice or an index array), dequantized."""
+        block = np.array(self.vectors[index], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[index])[:, None]
+        return block
+
+
+_EMPTY = _Snapshot(None, None, np.zeros(0, dtype=bool), [], {})
+
+
+class VectorStore:
+    def __init__(self, path: Path, dtype: Optional[str] = None):
+        self.path = path
+        # Encoding used when the store is created; an existing store keeps its own
+        self.dtype = dtype or settings.VECTOR_STORE_DTYPE
+        self._thread_lock = threading.RLock()
+        self._log_stamp = None
+        self._ivf_stamp = None
+        self._state: _Snapshot = _EMPTY
+
+    @staticmethod
+    def exists_at(path: Path) -> bool:
+        return (path / _POINTER).exists() or (path / "meta.json").exists()
+
+    def _root(self) -> Path:
+        """Directory of the current generation."""
+        try:
+            return self.path / (self.path / _POINTER).read_text().strip()
+        except FileNotFoundError:
+            return self.path
+
+    def _log_path(self, root: Optional[Path] = None) -> Path:
+        return (root or self._root()) / "ids.log"
+
+    def _vectors_path(self, dtype: str, root: Optional[Path] = None) -> Path:
+        return (root or self._root()) / _VECTOR_FILES[dtype]
+
+    def _scales_path(self, root: Optional[Path] = None) -> Path:
+        return (root or self._root()) / "scales.f32"
+
+    def _ivf_path(self, root: Optional[Path] = None) -> Path:
+        return (root or self._root()) / "ivf.npz"
+
+    @contextmanager
+    def _locked(self):
+        """This thread alone in the process, and this process alone on the store's files."""
+        with self._thread_lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / ".lock", "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _meta(self, root: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        meta = (root or self._root()) / "meta.json"
+        if not meta.exists():
+            return None
+        # Stores written before quantization support have no dtype
+        return {"dtype": "float32", **json.loads(meta.read_text())}
+
+    # -- writes -----------------------------------------------------------------
+
+    def add(self, ids: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Append (or replace) the vectors of `ids`; the latest row of an id wins."""
+        if not ids:
+            return
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+        with self._locked():
+            root = self._root()
+            meta = self._meta(root)
+            if meta is None:
+                meta = {"dim": matrix.shape[1], "dtype": self.dtype}
+                (root / "meta.json").write_text(json.dumps(meta))
+            if matrix.shape[1] != meta["dim"]:
+                raise ValueError(f"Vector store for {self.path.name} holds {meta['dim']}-d vectors, got {matrix.shape[1]}-d")
+
+            scales = None
+            if meta["dtype"] == "int8":
+                matrix, scales = _quantize(matrix)
+            self._append(self._vectors_path(meta["dtype"], root), matrix)
+            if scales is not None:
+                self._append(self._scales_path(root), scales)
+            with open(self._log_path(root), "a") as f:
+                f.write("".join(f"+{i}\n" for i in ids))
+
+    @staticmethod
+    def _append(path: Path, array: np.ndarray) -> None:
+        with open(path, "ab") as f:
+            f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Tombstone `ids`; their rows are skipped by searches until the next compaction."""
+        lines = "".join(f"-{i}\n" for i in ids)
+        if not lines or not self.path.exists():
+            return
+        with self._locked():
+            log_path = self._log_path()
+            if log_path.exists():
+                with open(log_path, "a") as f:
+                    f.write(lines)
+
+    # -- reads ------------------------------------------------------------------
+
+    def _read_snapshot(self, root: Path) -> _Snapshot:
+        row_ids: List[str] = []
+        live: Dict[str, int] = {}
+        if self._log_path(root).exists():
+            with open(self._log_path(root)) as f:
+                for line in f:
+                    op, event_id = line[:1], line[1:].rstrip("\n")
+                    if op == "+":
+                        live[event_id] = len(row_ids)
+                        row_ids.append(event_id)
+                    elif op == "-":
+                        live.pop(event_id, None)
+
+        meta = self._meta(root)
+        rows = len(row_ids)
+        vectors = scales = None
+        if meta and rows:
+            dtype, dim = _DTYPES[meta["dtype"]], meta["dim"]
+            vectors_path = self._vectors_path(meta["dtype"], root)
+            rows = min(rows, vectors_path.stat().st_size // (np.dtype(dtype).itemsize * dim))
+            if meta["dtype"] == "int8":
+                rows = min(rows, self._scales_path(root).stat().st_size // 4)
+            if rows:
+                if meta["dtype"] == "int8":
+                    scales = np.memmap(self._scales_path(root), dtype=np.float32, mode="r", shape=(rows,))
+                vectors = np.memmap(vectors_path, dtype=dtype, mode="r", shape=(rows, dim))
+        alive = np.zeros(rows, dtype=bool)
+        alive[[row for row in live.values() if row < rows]] = True
+        return _Snapshot(vectors, scales, alive, row_ids[:rows], live)
+
+    def _load(self) -> _Snapshot:
+        """Replay ids.log and remap the vectors if another writer appended or switched generation."""
+        with self._thread_lock:
+            for _ in range(3):
+                try:
+                    return self._load_generation(self._root())
+                except FileNotFoundError:
+                    # The generation was retired between resolving CURRENT and opening it
+                    continue
+            return self._load_generation(self._root())
+
+    def _load_generation(self, root: Path) -> _Snapshot:
+        log_path = self._log_path(root)
+        if log_path.exists():
+            stat = log_path.stat()
+            log_stamp = (root.name, stat.st_size, stat.st_mtime_ns)
+        else:
+            log_stamp = (root.name, 0, 0)
+        if log_stamp != self._log_stamp:
+            self._state = self._read_snapshot(root)
+            self._log_stamp = log_stamp
+
+        ivf_path = self._ivf_path(root)
+        ivf_stamp = (root.name, ivf_path.stat().st_mtime_ns) if ivf_path.exists() else None
+        if ivf_stamp != self._ivf_stamp:
+            self._state = self._state._replace(ivf=dict(np.load(ivf_path)) if ivf_stamp else None)
+            self._ivf_stamp = ivf_stamp
+        return self._state
+
+    def __len__(self) -> int:
+        return int(self._load().alive.sum())
+
+    def get(self, event_id: str) -> Optional[np.ndarray]:
+        state = self._load()
+        row = state.live.get(event_id)
+        if row is None or state.vectors is None or row >= len(state.vectors):
+            return None
+        return state.rows(np.asarray([row]))[0]
+
+    def ids(self) -> List[str]:
+        """Event ids with a live vector, in row order."""
+        live = self._load().live
+        return sorted(live, key=live.get)
+
+    def known(self, ids: Iterable[str]) -> set:
+        """The subset of `ids` that currently have a live vector."""
+        live = self._load().live
+        return {i for i in ids if i in live}
+
+    def matching(self, vectors: Dict[str, Sequence[float]], min_cosine: float = 0.99) -> List[str]:
+        """Ids whose stored vector agrees with the given full-size vector.
+
+        Stored rows may be int8 or shortened, so each vector is cut to the stored size
+        and compared by cosine; int8 rounding stays well above the default threshold.
+        """
+        state = self._load()
+        matching = []
+        for event_id, vector in vectors.items():
+            row = state.live.get(event_id)
+            if row is None or row >= len(state.alive):
+                continue
+            stored = state.rows(np.asarray([row]))[0]
+            given = np.asarray(vector, dtype=np.float32)[:len(stored)]
+            norm = float(np.linalg.norm(given) * np.linalg.norm(stored))
+            if norm and float(given @ stored) / norm >= min_cosine:
+                matching.append(event_id)
+        return matching
+
+    @staticmethod
+    def _candidate_rows(ivf: Optional[Dict[str, np.ndarray]], total_rows: int, q: np.ndarray, nprobe: int) -> Optional[np.ndarray]:
+        """Rows in the `nprobe` nearest IVF lists plus everything appended after the build."""
+        if ivf is None or ivf["centroids"].shape[1] != len(q):
+            return None
+        centroids, offsets, rows = ivf["centroids"], ivf["offsets"], ivf["rows"]
+        built_rows = int(ivf["built_rows"])
+        nearest = np.argsort(-(centroids @ q))[:nprobe]
+        probed = [rows[offsets[c]:offsets[c + 1]] for c in nearest]
+        probed.append(np.arange(built_rows, total_rows))
+        return np.concatenate(probed)
+
+    def search(self, query: Sequence[float], k: int, nprobe: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top-k live (eventId, cosine score) pairs for `query`."""
+        state = self._load()
+        if state.vectors is None or not state.alive.any():
+            return []
+        # Shortened text-embedding-3 vectors are prefixes of the full ones, so a query
+        # embedded at more dimensions than the store holds is truncated to match
+        q = _normalize(np.asarray(query, dtype=np.float32)[None, :state.vectors.shape[1]])[0]
+        total = len(state.alive)
+
+        candidates = self._candidate_rows(state.ivf, total, q, nprobe or settings.VECTOR_STORE_IVF_NPROBE)
+        if candidates is not None:
+            rows = np.unique(candidates[candidates < total])
+            rows = rows[state.alive[rows]]
+            scores = state.rows(rows) @ q
+        else:
+            scores = np.empty(total, dtype=np.float32)
+            for start in range(0, total, _SEARCH_CHUNK_ROWS):
+                scores[start:start + _SEARCH_CHUNK_ROWS] = state.rows(slice(start, start + _SEARCH_CHUNK_ROWS)) @ q
+            scores[~state.alive] = -np.inf
+            rows = np.arange(total)
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(state.row_ids[rows[i]], float(scores[i])) for i in top]
+
+    # -- maintenance ------------------------------------------------------------
+
+    def _new_generation(self) -> Path:
+        root = self._root()
+        number = int(root.name[len(_GENERATION_PREFIX):]) + 1 if root != self.path else 1
+        target = self.path / f"{_GENERATION_PREFIX}{number}"
+        # Leftover of a rewrite that died before switching
+        shutil.rmtree(target, ignore_errors=True)
+        target.mkdir()
+        return target
+
+    def _switch(self, target: Path) -> None:
+        """Point CURRENT at `target` with one rename, then retire all but the previous generation."""
+        previous = self._root()
+        pointer = self.path / (_POINTER + ".tmp")
+        with open(pointer, "w") as f:
+            f.write(target.name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer, self.path / _POINTER)
+
+        for path in self.path.glob(_GENERATION_PREFIX + "*"):
+            if path not in (target, previous):
+                shutil.rmtree(path, ignore_errors=True)
+        if previous != self.path:
+            # Files of a store from before generations, once no reader can still be on them
+            for name in ("meta.json", "ids.log", "scales.f32", "ivf.npz", *_VECTOR_FILES.values()):
+                (self.path / name).unlink(missing_ok=True)
+        self._reset()
+
+    @staticmethod
+    def _write_synced(path: Path, data: bytes) -> None:
+        with open(path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def compact(self) -> None:
+        """Rewrite only the live rows into a new generation; the old IVF index is not carried over."""
+        with self._locked():
+            self._log_stamp = None
+            state = self._load()
+            if state.vectors is None:
+                return
+            meta = self._meta()
+            live = sorted(state.live.items(), key=lambda item: item[1])
+            target = self._new_generation()
+            with open(self._vectors_path(meta["dtype"], target), "wb") as f, open(self._scales_path(target), "wb") as g:
+                for start in range(0, len(live), _SEARCH_CHUNK_ROWS):
+                    chunk = [row for _, row in live[start:start + _SEARCH_CHUNK_ROWS]]
+                    f.write(np.ascontiguousarray(state.vectors[chunk]).tobytes())
+                    if state.scales is not None:
+                        g.write(np.ascontiguousarray(state.scales[chunk]).tobytes())
+                for handle in (f, g):
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            if state.scales is None:
+                self._scales_path(target).unlink()
+            self._write_synced(target / "meta.json", json.dumps(meta).encode())
+            self._write_synced(self._log_path(target), "".join(f"+{event_id}\n" for event_id, _ in live).encode())
+            # Readers still holding the old snapshot keep their mappings of the old generation
+            self._switch(target)
+
+    def build_ivf(self, nlist: Optional[int] = None) -> None:
+        """K-means the live rows into `nlist` lists (default sqrt of the row count)."""
+        self.compact()
+        with self._locked():
+            state = self._load()
+            if state.vectors is None:
+                return
+            n = len(state.alive)
+            nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+            rng = np.random.default_rng(0)
+            sample = state.rows(np.sort(rng.choice(n, size=min(n, _KMEANS_SAMPLE), replace=False)))
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+            for _ in range(_KMEANS_ITERATIONS):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(nlist):
+                    members = sample[assign == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                centroids = _normalize(centroids)
+
+            assign = np.empty(n, dtype=np.int64)
+            for start in range(0, n, _SEARCH_CHUNK_ROWS):
+                assign[start:start + _SEARCH_CHUNK_ROWS] = np.argmax(
+                    state.rows(slice(start, start + _SEARCH_CHUNK_ROWS)) @ centroids.T, axis=1
+                )
+            order = np.argsort(assign, kind="stable")
+            offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+
+            root = self._root()
+            tmp = root / "ivf.tmp.npz"
+            np.savez(tmp, centroids=centroids, offsets=offsets, rows=order, built_rows=np.int64(n))
+            os.replace(tmp, self._ivf_path(root))
+
+    def maybe_build_ivf(self) -> None:
+        """Build (or rebuild) the IVF index once the store has grown past the threshold."""
+        state = self._load()
+        rows = len(state.alive)
+        if rows < settings.VECTOR_STORE_IVF_MIN_ROWS:
+            return
+        ivf = state.ivf
+        built_rows = int(ivf["built_rows"]) if ivf is not None else 0
+        if rows >= 2 * built_rows:
+            self.build_ivf()
+
+    def reencode(self, dtype: str, dim: Optional[int] = None, batch_rows: int = _SEARCH_CHUNK_ROWS) -> None:
+        """Rewrite the live rows as `dtype`, optionally truncated to the first `dim` dimensions.
+
+        Truncated rows are renormalized, which matches asking text-embedding-3 for fewer
+        dimensions. The IVF index is dropped and rebuilt on the next maybe_build_ivf.
+        """
+        with self._locked():
+            self._log_stamp = None
+            state = self._load()
+            # A generation directory is laid out like a store that was never rewritten
+            target = self._new_generation()
+            writer = VectorStore(target, dtype)
+            live = sorted(state.live.items(), key=lambda item: item[1])
+            for start in range(0, len(live), batch_rows):
+                batch = live[start:start + batch_rows]
+                vectors = state.rows(np.asarray([row for _, row in batch], dtype=np.int64))
+                writer.add([event_id for event_id, _ in batch], vectors[:, :dim])
+            (target / ".lock").unlink(missing_ok=True)
+            self._switch(target)
+            self.dtype = dtype
+
+    def _reset(self) -> None:
+        """Forget everything loaded so the next `_load` starts from the files on disk."""
+        with self._thread_lock:
+            self._log_stamp = None
+            self._ivf_stamp = None
+            self._state = _EMPTY
+
+    def drop(self) -> None:
+        with self._thread_lock:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._reset()
+
+
+_stores: Dict[str, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(case: str) -> VectorStore:
+    with _stores_lock:
+        store = _stores.get(case)
+        if store is None:
+            store = VectorStore(Path(settings.VECTOR_STORE_DIR) / _case_dir_name(case))
+            _stores[case] = store
+        return store
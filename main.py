@@ -8,11 +8,16 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from helper.exception_handler import custom_http_exception_handler, global_exception_handler, value_error_exception_handler
 from config import settings
-from database import connect_to_mongodb, close_mongodb_connection
+from database import connect_to_mongodb, close_mongodb_connection, connect_to_neo4j, close_neo4j_connection
+from database import BOOKMARK_HEADER, request_bookmarks, decode_bookmarks, encode_bookmarks
 from routes import auth, cases, timeline
 from pathlib import Path
 from pydantic import ValidationError
 from data_processing.data_pre_processing import data_ingestion_pipeline
+from data_processing.schema_migrations import run_schema_migrations
+from helper.graph_layout import shutdown_layout_executor
+from data_processing.embeddings import embedding_service
+from helper.deletion_queue import run_deletion_worker
 
 
 # Configure logging
@@ -29,6 +34,14 @@ async def lifespan(app: FastAPI):
     # Startup actions
     print("App is starting up...")
     await connect_to_mongodb()
+    await connect_to_neo4j()
+    if settings.NEO4J_MIGRATE_ON_STARTUP:
+        try:
+            await run_schema_migrations()
+        except Exception as e:
+            logger.error(f"Neo4j schema migration failed: {str(e)}")
+    # Purges cases and documents queued by the DELETE endpoints
+    deletion_worker = asyncio.create_task(run_deletion_worker())
   
     # async def cron_runner():
     #     while True:
@@ -42,7 +55,12 @@ async def lifespan(app: FastAPI):
     yield
     # Shutdown actions
     print("App is shutting down...")
+    deletion_worker.cancel()
+    await asyncio.gather(deletion_worker, return_exceptions=True)
     await close_mongodb_connection()
+    await close_neo4j_connection()
+    await embedding_service.close()
+    shutdown_layout_executor()
 
 
 # Initialize FastAPI app
@@ -62,9 +80,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[BOOKMARK_HEADER],
 )
 
 
+# Carry Neo4j bookmarks between a client's requests so reads routed to another
+# cluster member (or served by another worker) still see that client's writes
+@app.middleware("http")
+async def neo4j_bookmarks(request: Request, call_next):
+    holder = {"in": decode_bookmarks(request.headers.get(BOOKMARK_HEADER)), "out": None}
+    token = request_bookmarks.set(holder)
+    try:
+        response = await call_next(request)
+    finally:
+        request_bookmarks.reset(token)
+    if holder["out"] is not None:
+        response.headers[BOOKMARK_HEADER] = encode_bookmarks(holder["out"])
+    return response
+
+
 # Create uploads directory
 uploads_dir = Path("./uploads")
 uploads_dir.mkdir(exist_ok=True)
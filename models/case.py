@@ -39,6 +39,7 @@ class DocumentResponse(DocumentBase):
     content_type: Optional[str] = None
     file_path: Optional[str] = None
     file_extension: Optional[str] = None
+    source_id: Optional[str] = Field(None, description="Graph source id, set once the document is processed")
     status: DocumentStatus
     created_at: datetime
     updated_at: datetime
@@ -1,7 +1,7 @@
 import os
 import re
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,6 +16,8 @@ class TimelineEntry(BaseModel):
     category: Optional[str] = ""
     entities: List[str] = ""
     tag: Optional[str]= ""
+    score: Optional[float] = None
+    highlight: Optional[Dict[str, Any]] = None
     # entityWithTypeList: Optional[List[str]]
     
     def serialize(self):
@@ -25,7 +27,7 @@ class TimelineEntry(BaseModel):
         if source_cleaned.startswith("doc_"):
             source_cleaned = f"{BASE_URL}/uploads/{source_cleaned}"
 
-        return {
+        data = {
             "eventId": self.eventId,
             "source": source_cleaned,
             "date": self.date,
@@ -35,6 +37,12 @@ class TimelineEntry(BaseModel):
             "tag": self.tag
             # "entityWithTypeList": self.entityWithTypeList
         }
+        # Only search results carry a relevance score and highlights
+        if self.score is not None:
+            data["score"] = self.score
+        if self.highlight is not None:
+            data["highlight"] = self.highlight
+        return data
 
 
 
@@ -55,6 +63,31 @@ class PaginatedTimelineResponse(BaseModel):
         }
 
 
+class CursorTimelineResponse(BaseModel):
+    list: List[TimelineEntry]
+    next_cursor: Optional[str] = None
+    has_more: bool
+    total_items: int
+
+    class Config:
+        alias_generator = lambda string: ''.join(
+            word.capitalize() if i else word for i, word in enumerate(string.split('_'))
+        )
+        populate_by_name = True
+
+
+class SearchTimelineResponse(BaseModel):
+    list: List[TimelineEntry]
+    total_items: int
+    mode: str
+
+    class Config:
+        alias_generator = lambda string: ''.join(
+            word.capitalize() if i else word for i, word in enumerate(string.split('_'))
+        )
+        populate_by_name = True
+
+
 class UpdateEventStatementRequest(BaseModel):
     statement: str
     
@@ -7,7 +7,7 @@ from typing import Dict, Any, List, Optional
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, BackgroundTasks, Query
 from routes.auth import get_current_user
-from helper.neo4j_timeline import delete_file_from_neo4j, delete_case_from_neo4j
+from helper.deletion_queue import enqueue_case_deletion, enqueue_document_deletion, get_deletion_job
 from models.case import (
     CaseResponse, CaseUpdate, 
     DocumentCreate, DocumentResponse, DocumentUpdate,
@@ -299,7 +299,7 @@ async def get_cases(
     user_id = str(current_user.get("_id"))
     
     # Build match stage
-    match_stage: dict = {"user_id": user_id}
+    match_stage: dict = {"user_id": user_id, "deleting": {"$ne": True}}
     if status and status != 'all':
         match_stage["status"] = status
     
@@ -366,7 +366,9 @@ async def get_cases(
         }},
         {"$addFields": {
             "id": "$case_id_str",
-            "document_count": {"$size": "$documents_array"}
+            "document_count": {"$size": {"$filter": {
+                "input": "$documents_array", "cond": {"$ne": ["$$this.deleting", True]}
+            }}}
         }},
         {"$project": {
             "_id": 0,
@@ -405,7 +407,7 @@ async def get_case(
     """Get a specific case by ID without documents."""
     
     pipeline = [
-        {"$match": {"_id": ObjectId(case_id), "user_id": str(current_user.get("_id"))}},
+        {"$match": {"_id": ObjectId(case_id), "user_id": str(current_user.get("_id")), "deleting": {"$ne": True}}},
         {"$addFields": {"case_id_str": {"$toString": "$_id"}}},
         {"$lookup": {
             "from": "documents",
@@ -415,7 +417,9 @@ async def get_case(
         }},
         {"$addFields": {
             "id": "$case_id_str",
-            "document_count": {"$size": "$documents_array"}
+            "document_count": {"$size": {"$filter": {
+                "input": "$documents_array", "cond": {"$ne": ["$$this.deleting", True]}
+            }}}
         }},
         {"$project": {
             "_id": 0,
@@ -457,16 +461,16 @@ async def get_case_documents(
     Get all documents related to a specific case with pagination.
     """
     # Validate case existence
-    case_exists = await db.cases.find_one({"_id": ObjectId(case_id), "user_id": str(current_user["_id"])})
+    case_exists = await db.cases.find_one({"_id": ObjectId(case_id), "user_id": str(current_user["_id"]), "deleting": {"$ne": True}})
     if not case_exists:
         raise HTTPException(status_code=404, detail="Case not found")
 
     # Count total documents
-    total_count = await db.documents.count_documents({"case_id": case_id})
+    total_count = await db.documents.count_documents({"case_id": case_id, "deleting": {"$ne": True}})
     total_pages = (total_count + size - 1) // size
     # Apply pagination
     skip = (page - 1) * size
-    documents_cursor = db.documents.find({"case_id": case_id}).sort('created_at', -1).skip(skip).limit(size)
+    documents_cursor = db.documents.find({"case_id": case_id, "deleting": {"$ne": True}}).sort('created_at', -1).skip(skip).limit(size)
 
     # Fetch and serialize
     documents = []
@@ -603,13 +607,40 @@ async def update_document(
     return DocumentResponse(**updated_document)
 
 
-@router.delete("/{case_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.get("/deletions/{job_id}")
+async def get_deletion_status(
+    job_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db = Depends(get_database)
+):
+    """Progress of a queued case or document deletion."""
+    job = await get_deletion_job(db, job_id, str(current_user["_id"]))
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Deletion job not found"
+        )
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "case_id": job["case_id"],
+        "document_id": job.get("document_id"),
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+@router.delete("/{case_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_case(
     case_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    """Delete a case and all its documents."""
+    """Mark a case and its documents as deleting and queue their purge."""
     # Check if case exists
     case = await db.cases.find_one({"_id": ObjectId(case_id), "user_id": str(current_user["_id"])})
     if not case:
@@ -617,33 +648,28 @@ async def delete_case(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Case not found"
         )
-    
-    # Get documents to delete files
-    async for document in db.documents.find({"case_id": case_id}):
-        if "file_path" in document:
-            file_path = Path("." + document["file_path"])
-            if file_path.exists():
-                file_path.unlink()
-    
-    # Delete documents
-    await db.documents.delete_many({"case_id": case_id})
-    
-    # Delete case
-    await db.cases.delete_one({"_id": ObjectId(case_id)})
-    
-    # Delete case from neo4j
-    delete_case_from_neo4j(case_id)
-    return None
 
+    # Files, Mongo records and graph data are removed by the deletion worker
+    job_id = await enqueue_case_deletion(db, case_id, str(current_user["_id"]))
+    return {"job_id": job_id, "status": "queued"}
 
-@router.delete("/{case_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+
+@router.delete("/{case_id}/documents/{document_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_document(
     case_id: str,
     document_id: str,
     current_user: Dict[str, Any] = Depends(get_current_user),
     db = Depends(get_database)
 ):
-    """Delete a document."""
+    """Mark a document as deleting and queue its purge."""
+    # The job is recorded under the current user, so the case must be theirs
+    case = await db.cases.find_one({"_id": ObjectId(case_id), "user_id": str(current_user["_id"])})
+    if not case:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Case not found"
+        )
+
     # Check if document exists and belongs to the case
     document = await db.documents.find_one({
         "_id": ObjectId(document_id),
@@ -655,19 +681,7 @@ async def delete_document(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found or does not belong to the specified case"
         )
-    
-    # Delete file if exists
-    if "file_path" in document:
-        file_path = Path("." + document["file_path"])
-        if file_path.exists():
-            file_path.unlink()
-    
-    # Delete document
-    await db.documents.delete_one({"_id": ObjectId(document_id)})
-    
-    # Delete case fron neo4j   
-    source = document.get("document_url") if document["document_type"] == 'link' else clean_source(document['file_path'])
-    delete_file_from_neo4j(case_id, source)
-    
-    return None
 
+    source = document.get("document_url") if document["document_type"] == 'link' else clean_source(document['file_path'])
+    job_id = await enqueue_document_deletion(db, case_id, document, source, str(current_user["_id"]))
+    return {"job_id": job_id, "status": "queued"}
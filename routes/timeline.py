@@ -1,28 +1,40 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
-from fastapi.responses import JSONResponse, Response
-from models.timeline import PaginatedTimelineResponse, TimelineEntry, EventUpdateRequest
-from helper.neo4j_timeline import  get_timeline_data_by_case_id, update_entity_and_event, fetch_graph_data_new, fetch_graph_for_neo4j_graph_unique_relation, delete_event_by_id, update_event_statement, update_event_fields_in_neo4j, get_sources_by_case
-from typing import Optional, Dict, Any
+import csv
+import io
+import json
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from models.timeline import PaginatedTimelineResponse, CursorTimelineResponse, SearchTimelineResponse, TimelineEntry, EventUpdateRequest
+from helper.neo4j_timeline import  get_timeline_data_by_case_id, search_timeline_by_text, get_timeline_page_by_cursor, get_case_timeline_stats, stream_timeline_rows, update_entity_and_event, fetch_graph_data_new, fetch_graph_for_neo4j_graph_unique_relation, delete_event_by_id, update_event_statement, update_event_fields_in_neo4j, get_sources_by_case, get_case_entity_graph, expand_entity_graph_node, get_case_changes_since, get_entity_in_case, get_timeline_histogram, HISTOGRAM_SPLITS
+from typing import Optional, Dict, Any, List
 from datetime import date
 from routes.auth import get_current_user
+from helper.response_cache import response_cache
+from helper.graph_layout import apply_precomputed_layout
+from helper.semantic_search import search_timeline_events
+from helper.entity_adjacency import get_entity_neighbourhood, get_entity_path
 
 # Initialize router
 router = APIRouter()
 
 
 # Get timeline data for a case
-@router.get("/data/{case_id}", response_model=PaginatedTimelineResponse)
+# Search/score fields are only set on search results, so unset fields are left out
+@router.get("/data/{case_id}", response_model=PaginatedTimelineResponse, response_model_exclude_unset=True)
 async def get_timeline(
     case_id: str,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
+    q: Optional[str] = Query(None, min_length=1, max_length=500, description="Keywords or \"quoted phrases\"; ranks by relevance"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     skip = (page - 1) * size
     try:
-        data, total_count = get_timeline_data_by_case_id(case_id, skip, size, start_date, end_date)
+        if q:
+            data, total_count = await search_timeline_by_text(case_id, q, skip, size, start_date, end_date)
+        else:
+            data, total_count = await get_timeline_data_by_case_id(case_id, skip, size, start_date, end_date)
         
         total_pages = (total_count + size - 1) // size
         data = [TimelineEntry(**e).serialize() for e in data]
@@ -39,10 +51,240 @@ async def get_timeline(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Get timeline data for a case with cursor (keyset) pagination
+@router.get("/data/{case_id}/cursor", response_model=CursorTimelineResponse, response_model_exclude_unset=True)
+async def get_timeline_by_cursor(
+    case_id: str,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    seek_date: Optional[date] = Query(None, description="Start the page at the first event on or after this date"),
+    size: int = Query(10, ge=1, le=100),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    if cursor and seek_date:
+        raise HTTPException(status_code=400, detail="Use either cursor or seek_date, not both")
+    try:
+        data, next_cursor = await get_timeline_page_by_cursor(case_id, size, cursor, seek_date, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    data = [TimelineEntry(**e).serialize() for e in data]
+    return CursorTimelineResponse(
+        list=data,
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None,
+        total_items=len(data)
+    )
+
+
+# Semantic search: timeline rows ranked by embedding similarity to q
+@router.get("/{case_id}/search", response_model=SearchTimelineResponse, response_model_exclude_unset=True)
+async def search_timeline(
+    case_id: str,
+    q: str = Query(..., min_length=1, max_length=2000),
+    size: int = Query(10, ge=1, le=100),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        data, mode = await search_timeline_events(case_id, q, size, start_date, end_date)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    data = [TimelineEntry(**e).serialize() for e in data]
+    return SearchTimelineResponse(list=data, total_items=len(data), mode=mode)
+
+
+EXPORT_COLUMNS = ["eventId", "date", "statement", "category", "tag", "entities", "source"]
+
+
+async def _export_ndjson(rows):
+    async for row in rows:
+        yield json.dumps(TimelineEntry(**row).serialize()) + "\n"
+
+
+async def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return line
+
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+    async for row in rows:
+        entry = TimelineEntry(**row).serialize()
+        entry["entities"] = "; ".join(entry["entities"] or [])
+        writer.writerow([entry[col] for col in EXPORT_COLUMNS])
+        yield flush()
+
+
+# Stream the whole timeline of a case as NDJSON or CSV
+@router.get("/{case_id}/export")
+async def export_timeline(
+    case_id: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    rows = stream_timeline_rows(case_id, start_date, end_date)
+    if format == "csv":
+        body, media_type = _export_csv(rows), "text/csv"
+    else:
+        body, media_type = _export_ndjson(rows), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="timeline_{case_id}.{format}"'}
+    )
+
+
+# Events, entities and relations changed after version `since`; poll with the returned version
+@router.get("/{case_id}/changes")
+async def get_timeline_changes(
+    case_id: str,
+    since: int = Query(0, ge=0, description="version from the previous response; 0 for everything still logged"),
+    source_id: Optional[str] = Query(None, description="Limit upserted events and relations to one source"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        return await get_case_changes_since(case_id, since, source_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Hit/miss/eviction counters of the timeline and graph response cache
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: Dict[str, Any] = Depends(get_current_user)):
+    return response_cache.stats()
+
+
+# Event counts per interval bucket, optionally split by category and/or tag
+@router.get("/{case_id}/histogram")
+async def get_timeline_histogram_route(
+    case_id: str,
+    interval: str = Query("month", pattern="^(day|week|month|quarter|year)$"),
+    split_by: List[str] = Query([], description="category and/or tag"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    unknown = [field for field in split_by if field not in HISTOGRAM_SPLITS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot split by {', '.join(unknown)}")
+    try:
+        return await get_timeline_histogram(case_id, interval, list(dict.fromkeys(split_by)), start_date, end_date)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Get precomputed timeline totals for a case
+@router.get("/{case_id}/stats")
+async def get_timeline_stats(case_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    try:
+        return await get_case_timeline_stats(case_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Case-wide entity graph pruned to a bounded size; expand nodes with /entity-graph/expand
+@router.get("/{case_id}/entity-graph")
+async def get_case_graph(
+    case_id: str,
+    max_nodes: int = Query(150, ge=1, le=1000, description="Keep only the most connected entities"),
+    min_degree: int = Query(1, ge=0, description="Drop entities with fewer relations"),
+    min_weight: int = Query(1, ge=1, description="Drop links backed by fewer relations"),
+    top_k: int = Query(10, ge=1, le=100, description="Heaviest links kept per entity"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        return await get_case_entity_graph(case_id, max_nodes, min_degree, min_weight, top_k)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Neighbours of one entity, for drilling into the pruned case graph
+@router.get("/{case_id}/entity-graph/expand")
+async def expand_case_graph_node(
+    case_id: str,
+    entity: str = Query(..., description="Entity name to expand"),
+    top_k: int = Query(25, ge=1, le=200),
+    min_weight: int = Query(1, ge=1),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        graph = await expand_entity_graph_node(case_id, entity, top_k, min_weight)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if graph is None:
+        raise HTTPException(status_code=404, detail="Entity not found")
+    return graph
+
+
+# Entities within `hops` of an entity, from the in-memory adjacency cache
+@router.get("/{case_id}/entity-graph/neighbourhood")
+async def get_case_graph_neighbourhood(
+    case_id: str,
+    entity: str = Query(..., description="Entity name to start from"),
+    hops: int = Query(2, ge=1, le=6),
+    limit: int = Query(200, ge=1, le=5000, description="Maximum entities returned"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        data = await get_entity_neighbourhood(case_id, entity, hops, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Entity not found")
+    return data
+
+
+# Shortest connection between two entities, from the in-memory adjacency cache
+@router.get("/{case_id}/entity-graph/path")
+async def get_case_graph_path(
+    case_id: str,
+    source: str = Query(..., description="Entity name to start from"),
+    target: str = Query(..., description="Entity name to reach"),
+    max_hops: int = Query(6, ge=1, le=12),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    try:
+        data = await get_entity_path(case_id, source, target, max_hops)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Entity not found")
+    return data
+
+
+# Events an entity is involved in, with co-involved entities and sources
+@router.get("/{case_id}/entity/{entity_name}/events")
+async def get_entity_events(case_id: str, entity_name: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    try:
+        return await get_entity_in_case(case_id, entity_name)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{case_id}/entity-relation/{source_id}")
-async def get_entities_with_relationships(case_id: str, source_id:str , current_user: Dict[str, Any] = Depends(get_current_user)):
+async def get_entities_with_relationships(
+    case_id: str,
+    source_id: str,
+    layout: Optional[str] = Query(None, pattern="^precomputed$", description="precomputed: nodes come with x/y from the server"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
     try:
         data = await fetch_graph_data_new(case_id, source_id)
+        if layout == "precomputed" and data.get("nodes"):
+            data = await apply_precomputed_layout(case_id, source_id, data)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
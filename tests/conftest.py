@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Settings are read from the environment at import time; give the required ones
+# harmless values so modules can be imported without a .env file
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
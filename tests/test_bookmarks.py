@@ -0,0 +1,34 @@
+import pytest
+from neo4j import Bookmarks
+import database
+
+
+@pytest.fixture(autouse=True)
+def fresh_bookmarks(monkeypatch):
+    monkeypatch.setattr(database, "_case_bookmarks", database.OrderedDict())
+
+
+def _bookmark(value):
+    return Bookmarks.from_raw_values([value])
+
+
+def test_case_bookmarks_are_kept_for_the_most_recent_cases(monkeypatch):
+    monkeypatch.setattr(database.settings, "NEO4J_BOOKMARK_MAX_CASES", 2)
+    database.remember_bookmarks("a", _bookmark("bm:a"))
+    database.remember_bookmarks("b", _bookmark("bm:b"))
+    # Reading a keeps it; c then evicts b
+    assert database._bookmarks_for("a").raw_values == {"bm:a"}
+    database.remember_bookmarks("c", _bookmark("bm:c"))
+    assert list(database._case_bookmarks) == ["a", "c"]
+
+    database.remember_bookmarks("a", _bookmark("bm:a2"))
+    assert database._bookmarks_for("b") is None
+    assert database._bookmarks_for("a").raw_values == {"bm:a2"}
+
+
+def test_expired_case_bookmarks_are_dropped(monkeypatch):
+    database.remember_bookmarks("a", _bookmark("bm:a"))
+    monkeypatch.setattr(database.settings, "NEO4J_BOOKMARK_TTL_SECONDS", -1)
+
+    assert database._bookmarks_for("a") is None
+    assert "a" not in database._case_bookmarks
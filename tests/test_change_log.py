@@ -0,0 +1,135 @@
+import asyncio
+from contextlib import asynccontextmanager
+import pytest
+from helper import change_log, neo4j_timeline
+from helper.change_log import DELETE, ENTITY, EVENT, RELATION, UPSERT, changes, record_changes
+from helper.response_cache import ResponseCache
+
+
+class _Result:
+    def __init__(self, record=None, rows=()):
+        self._record = record
+        self._rows = list(rows)
+
+    async def single(self):
+        return self._record
+
+    async def consume(self):
+        return None
+
+    async def data(self):
+        return self._rows
+
+
+class _Log:
+    """In-memory case holding the change log and the rows delta reads return."""
+
+    def __init__(self):
+        self.version = 0
+        self.floor = 0
+        self.entries = []
+        self.queries = []
+
+    async def run(self, query, **params):
+        self.queries.append(query)
+        if query == change_log._CYPHER_RECORD_CHANGES:
+            self.version += 1
+            self.entries += [{**ch, "version": self.version} for ch in params["changes"]]
+            return _Result({"version": self.version})
+        if query == change_log._CYPHER_PRUNE_CHANGES:
+            if self.version - params["retention"] > self.floor:
+                self.floor = self.version - params["retention"]
+                self.entries = [e for e in self.entries if e["version"] > self.floor]
+            return _Result()
+        if query == neo4j_timeline._CHANGES_SINCE_QUERY:
+            since = [
+                {k: e[k] for k in ("kind", "op", "key")}
+                for e in self.entries if e["version"] > params["since"]
+            ]
+            return _Result({"version": self.version, "floor": self.floor, "changes": since})
+        if query == neo4j_timeline._CHANGED_EVENTS_QUERY:
+            return _Result(rows=[{"eventId": eid, "date": None} for eid in params["eventIds"]])
+        if query == neo4j_timeline._CHANGED_ENTITIES_QUERY:
+            return _Result(rows=[{"name": name, "type": "other"} for name in params["names"]])
+        if query == neo4j_timeline._CHANGED_RELATIONS_QUERY:
+            return _Result(rows=[{"eventId": eid} for eid in params["eventIds"]])
+        raise AssertionError(f"unexpected query: {query}")
+
+    async def execute_read(self, work):
+        return await work(self)
+
+
+@pytest.fixture
+def log(monkeypatch):
+    log = _Log()
+
+    @asynccontextmanager
+    async def graph_read_session(case=None, **kwargs):
+        yield log
+
+    monkeypatch.setattr(neo4j_timeline, "graph_read_session", graph_read_session)
+    monkeypatch.setattr(neo4j_timeline, "response_cache", ResponseCache(max_entries=16, ttl_seconds=60))
+    monkeypatch.setattr(change_log.settings, "CHANGE_LOG_RETENTION", 3)
+    return log
+
+
+def _record(log, entries):
+    version = asyncio.run(record_changes(log, "Case A", entries))
+    # Writers bump the read cache along with the log
+    neo4j_timeline.response_cache.bump("Case A")
+    return version
+
+
+def _since(since):
+    return asyncio.run(neo4j_timeline.get_case_changes_since("Case A", since))
+
+
+def test_changes_drop_duplicate_and_missing_keys():
+    assert changes(EVENT, UPSERT, ["e1", None, "e2", "e1"]) == [
+        {"kind": EVENT, "op": UPSERT, "key": "e1"},
+        {"kind": EVENT, "op": UPSERT, "key": "e2"},
+    ]
+
+
+def test_nothing_is_logged_for_an_empty_write(log):
+    assert _record(log, []) is None
+    assert log.queries == [] and log.version == 0
+
+
+def test_delta_reads_return_what_changed_after_a_version(log):
+    first = _record(log, changes(EVENT, UPSERT, ["e1", "e2"]) + changes(ENTITY, UPSERT, ["Acme"]))
+    second = _record(log, changes(EVENT, UPSERT, ["e3"]) + changes(RELATION, UPSERT, ["e3"]))
+    assert (first, second) == (1, 2)
+
+    full = _since(0)
+    assert full["version"] == 2 and not full["reset"]
+    assert [e["eventId"] for e in full["events"]["upserted"]] == ["e1", "e2", "e3"]
+    assert full["entities"]["upserted"] == [{"name": "Acme", "type": "other"}]
+    assert full["relations"]["upserted"] == [{"eventId": "e3"}]
+
+    later = _since(first)
+    assert [e["eventId"] for e in later["events"]["upserted"]] == ["e3"]
+    assert later["entities"]["upserted"] == []
+    assert _since(second)["events"] == {"upserted": [], "deleted": []}
+
+
+def test_a_later_delete_wins_over_an_earlier_upsert(log):
+    _record(log, changes(EVENT, UPSERT, ["e1", "e2"]))
+    _record(log, changes(EVENT, DELETE, ["e1"]) + changes(ENTITY, DELETE, ["Acme"]))
+
+    delta = _since(0)
+    assert [e["eventId"] for e in delta["events"]["upserted"]] == ["e2"]
+    assert delta["events"]["deleted"] == ["e1"]
+    assert delta["entities"]["deleted"] == ["Acme"]
+
+
+def test_versions_outside_the_retained_log_ask_for_a_full_refetch(log):
+    for i in range(5):
+        _record(log, changes(EVENT, UPSERT, [f"e{i}"]))
+    assert log.floor == 2
+
+    assert _since(1)["reset"]
+    assert _since(9)["reset"]
+    kept = _since(2)
+    assert not kept["reset"]
+    assert [e["eventId"] for e in kept["events"]["upserted"]] == ["e2", "e3", "e4"]
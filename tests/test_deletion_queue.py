@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+from bson import ObjectId
+from helper import deletion_queue
+from helper.deletion_queue import RUNNING, enqueue_case_deletion, get_deletion_job
+
+
+class _Jobs:
+    """Just enough of a Motor collection for the queue's queries (equality filters only)."""
+
+    def __init__(self, *jobs):
+        self.jobs = list(jobs)
+
+    def _match(self, query):
+        return [job for job in self.jobs if all(job.get(k) == v for k, v in query.items())]
+
+    async def find_one(self, query, projection=None):
+        found = self._match(query)
+        return dict(found[0]) if found else None
+
+    async def find_one_and_update(self, query, update):
+        found = self._match(query)
+        if found:
+            found[0].update(update["$set"])
+            return dict(found[0])
+        return None
+
+    async def update_one(self, query, update):
+        for job in self._match(query)[:1]:
+            job.update(update["$set"])
+
+    async def update_many(self, query, update):
+        for job in self._match(query):
+            job.update(update["$set"])
+
+    async def insert_one(self, job):
+        self.jobs.append(job)
+        return SimpleNamespace(inserted_id=job["_id"])
+
+
+def test_deletion_job_is_only_visible_to_its_owner():
+    job_id = ObjectId()
+    db = SimpleNamespace(deletion_jobs=_Jobs({"_id": job_id, "user_id": "alice", "kind": "case"}))
+
+    assert asyncio.run(get_deletion_job(db, str(job_id), "alice"))["id"] == str(job_id)
+    assert asyncio.run(get_deletion_job(db, str(job_id), "bob")) is None
+    assert asyncio.run(get_deletion_job(db, "not-an-object-id", "alice")) is None
+
+
+def test_repeated_case_deletes_return_the_queued_job():
+    case_id = ObjectId()
+    db = SimpleNamespace(cases=_Jobs({"_id": case_id}), documents=_Jobs(), deletion_jobs=_Jobs())
+
+    first = asyncio.run(enqueue_case_deletion(db, str(case_id), "alice"))
+    second = asyncio.run(enqueue_case_deletion(db, str(case_id), "alice"))
+
+    assert first == second
+    assert len(db.deletion_jobs.jobs) == 1
+
+
+def test_running_job_keeps_renewing_its_lease(monkeypatch):
+    job = {"_id": ObjectId(), "status": RUNNING, "attempts": 1, "lease_until": None}
+    db = SimpleNamespace(deletion_jobs=_Jobs(job))
+    monkeypatch.setattr(deletion_queue.settings, "DELETION_LEASE_SECONDS", 0.03)
+
+    async def slow_purge(db, job):
+        await asyncio.sleep(0.1)
+    monkeypatch.setattr(deletion_queue, "_purge", slow_purge)
+
+    asyncio.run(deletion_queue._run_job(db, dict(job)))
+    assert job["lease_until"] is not None
@@ -0,0 +1,47 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from data_processing import embeddings
+from data_processing.embeddings import EmbeddingService
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    async def create(model, input, **kwargs):
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[float(len(text))]) for text in input])
+
+    monkeypatch.setattr(embeddings.embedding_client.embeddings, "create", create)
+    # One token per character; keeps tiktoken from downloading its encoding
+    monkeypatch.setattr(EmbeddingService, "_fit", lambda self, text: (text, len(text)))
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_BATCH_WAIT_MS", 0)
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_BATCH_MAX_INPUTS", 1)
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_CONCURRENCY", 1)
+
+
+def test_close_fails_texts_that_were_never_sent(fake_api):
+    async def run():
+        service = EmbeddingService()
+        pending = asyncio.create_task(service.embed(["a", "bb", "ccc"]))
+        await asyncio.sleep(0.01)
+        await service.close()
+        with pytest.raises(RuntimeError, match="closed"):
+            await asyncio.wait_for(pending, 1)
+
+    asyncio.run(run())
+
+
+def test_dispatch_error_fails_its_batch_and_keeps_serving(fake_api, monkeypatch):
+    async def run():
+        service = EmbeddingService()
+        # Comparing token counts against a bad limit raises inside the dispatcher
+        monkeypatch.setattr(embeddings.settings, "EMBEDDING_BATCH_MAX_INPUTS", 2)
+        monkeypatch.setattr(embeddings.settings, "EMBEDDING_BATCH_MAX_TOKENS", None)
+        with pytest.raises(TypeError):
+            await asyncio.wait_for(service.embed(["a", "bb"]), 1)
+
+        monkeypatch.setattr(embeddings.settings, "EMBEDDING_BATCH_MAX_TOKENS", 8000)
+        assert await asyncio.wait_for(service.embed(["ccc"]), 1) == [[3.0]]
+        await service.close()
+
+    asyncio.run(run())
@@ -0,0 +1,121 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import numpy as np
+from helper import entity_adjacency
+from helper.entity_adjacency import EntityAdjacency
+
+
+def _graph(edges, n):
+    names = [f"n{i}" for i in range(n)]
+    return EntityAdjacency(names, ["person"] * n, {edge: f"rel{edge[0]}{edge[1]}" for edge in edges})
+
+
+# 0 - 1 - 2 - 3, plus a shortcut 0 - 4 - 3 and an isolated 5
+_EDGES = [(0, 1), (1, 2), (2, 3), (0, 4), (4, 3)]
+
+
+def test_bfs_distances_and_parents_are_undirected():
+    graph = _graph(_EDGES, 6)
+    distance, parent, parent_edge = graph.bfs(3, max_hops=5)
+
+    assert distance.tolist() == [2, 2, 1, 0, 1, -1]
+    assert parent[3] == -1 and parent[5] == -1
+    # Each parent edge leads from the parent to the node
+    for node in (0, 1, 2, 4):
+        p = parent[node]
+        assert distance[p] == distance[node] - 1
+        assert graph.indices[parent_edge[node]] == node
+        assert graph.indptr[p] <= parent_edge[node] < graph.indptr[p + 1]
+
+
+def test_bfs_stops_at_max_hops_and_at_the_target():
+    graph = _graph(_EDGES, 6)
+    assert graph.bfs(0, max_hops=1)[0].tolist() == [0, 1, -1, -1, 1, -1]
+
+    distance, parent, _ = graph.bfs(0, max_hops=5, target=3)
+    assert distance[3] == 2 and parent[3] == 4
+    # Walking back from the target gives the shortest path
+    path, node = [], 3
+    while node != -1:
+        path.append(node)
+        node = parent[node]
+    assert path[::-1] == [0, 4, 3]
+
+
+def test_bfs_visits_at_most_limit_nodes():
+    star = _graph([(0, i) for i in range(1, 10)], 10)
+    distance, _, _ = star.bfs(0, max_hops=3, limit=4)
+    assert (distance >= 0).sum() == 4
+
+
+def test_graph_without_edges():
+    graph = _graph([], 3)
+    assert graph.edge_count == 0
+    assert graph.bfs(1, max_hops=2)[0].tolist() == [-1, 0, -1]
+    assert graph.links_between(np.arange(3)) == []
+
+
+class _Records:
+    def __init__(self, rows):
+        self._rows = rows
+
+    async def data(self):
+        return self._rows
+
+    def __aiter__(self):
+        async def rows():
+            for row in self._rows:
+                yield row
+        return rows()
+
+
+def test_build_prefers_rel_labels_and_counts_rel_degrees():
+    answers = {
+        entity_adjacency._ENTITIES_QUERY: [{"name": n, "type": "person"} for n in "abc"],
+        entity_adjacency._CO_INVOLVED_PAIRS_QUERY: [{"source": "a", "target": "b"}, {"source": "b", "target": "c"}],
+        entity_adjacency._REL_EDGES_QUERY: [{"source": "b", "target": "a", "relType": "sued", "count": 2}],
+    }
+
+    async def run(query, **params):
+        return _Records(answers[query])
+
+    graph = asyncio.run(entity_adjacency._build(SimpleNamespace(run=run), "Case A"))
+    assert graph.edge_count == 2
+    assert graph.rel_degree.tolist() == [2, 2, 0]
+    assert graph.links_between(np.arange(3)) == [
+        {"source": "a", "target": "b", "relType": "sued"},
+        {"source": "b", "target": "c", "relType": entity_adjacency._CO_INVOLVED},
+    ]
+
+
+def test_cached_graph_is_rebuilt_only_when_the_graph_version_moves(monkeypatch):
+    versions = iter([1, 1, 2])
+    builds = []
+
+    async def run_read_single(query, parameters=None, case=None):
+        assert query == entity_adjacency._GRAPH_VERSION_QUERY
+        return {"version": next(versions)}
+
+    @asynccontextmanager
+    async def graph_read_session(case=None):
+        async def execute_read(work, case):
+            builds.append(case)
+            return _graph([(0, 1)], 2)
+        yield SimpleNamespace(execute_read=execute_read)
+
+    monkeypatch.setattr(entity_adjacency, "run_read_single", run_read_single)
+    monkeypatch.setattr(entity_adjacency, "graph_read_session", graph_read_session)
+    monkeypatch.setattr(entity_adjacency.settings, "ADJACENCY_RECHECK_SECONDS", 3600)
+    case = "Adjacency case"
+
+    async def scenario():
+        first = await entity_adjacency.get_entity_adjacency(case)
+        # A statement edit bumps the response cache but logs no entity or relation change
+        entity_adjacency.response_cache.bump(case)
+        assert await entity_adjacency.get_entity_adjacency(case) is first
+        entity_adjacency.response_cache.bump(case)
+        assert await entity_adjacency.get_entity_adjacency(case) is not first
+
+    asyncio.run(scenario())
+    assert builds == [case, case]
@@ -0,0 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from helper import neo4j_timeline
+
+
+class _Result:
+    def __init__(self, record, counters):
+        self._record = record
+        self._counters = counters
+
+    async def single(self):
+        return self._record
+
+    async def consume(self):
+        return SimpleNamespace(counters=self._counters)
+
+
+class _Session:
+    """Runs managed writes against a transaction whose `run` returns one canned result."""
+
+    def __init__(self, result):
+        self.tx = SimpleNamespace(run=self._run, queries=[])
+        self._result = result
+
+    async def _run(self, query, parameters=None):
+        self.tx.queries.append((query, parameters))
+        return self._result
+
+    async def execute_write(self, work, *args):
+        return await work(self.tx, *args)
+
+
+def _stub(monkeypatch, result):
+    session = _Session(result)
+    calls = []
+
+    @asynccontextmanager
+    async def graph_session(case=None, **kwargs):
+        yield session
+
+    async def refresh_timeline_rows(tx, case, event_ids):
+        calls.append(("refresh", case, event_ids))
+
+    async def adjust_entity_count(tx, case, delta):
+        calls.append(("entities", case, delta))
+
+    async def record_changes(tx, case, entries):
+        calls.append(("changes", case, entries))
+
+    monkeypatch.setattr(neo4j_timeline, "graph_session", graph_session)
+    monkeypatch.setattr(neo4j_timeline, "refresh_timeline_rows", refresh_timeline_rows)
+    monkeypatch.setattr(neo4j_timeline, "adjust_entity_count", adjust_entity_count)
+    monkeypatch.setattr(neo4j_timeline, "record_changes", record_changes)
+    return session, calls
+
+
+def test_delete_entity_from_case_returns_counters_and_refreshes_rows(monkeypatch):
+    counters = SimpleNamespace(nodes_deleted=1, relationships_deleted=3)
+    session, calls = _stub(monkeypatch, _Result({"eventIds": ["ev1", "ev2"]}, counters))
+    version = neo4j_timeline.response_cache.version("Case A")
+
+    res = asyncio.run(neo4j_timeline.delete_entity_from_case("Case A", "Acme"))
+
+    assert res is counters
+    assert session.tx.queries[0][1] == {"case": "Case A", "entity": "Acme"}
+    assert calls[0] == ("refresh", "Case A", ["ev1", "ev2"])
+    assert calls[1] == ("entities", "Case A", -1)
+    assert calls[2] == ("changes", "Case A", [
+        {"kind": "entity", "op": "delete", "key": "Acme"},
+        {"kind": "event", "op": "upsert", "key": "ev1"},
+        {"kind": "event", "op": "upsert", "key": "ev2"},
+    ])
+    assert neo4j_timeline.response_cache.version("Case A") == version + 1
+
+
+def test_deleting_a_missing_entity_changes_nothing(monkeypatch):
+    counters = SimpleNamespace(nodes_deleted=0, relationships_deleted=0)
+    _, calls = _stub(monkeypatch, _Result(None, counters))
+
+    assert asyncio.run(neo4j_timeline.delete_entity_from_case("Case A", "Nobody")) is counters
+    assert calls == []
@@ -0,0 +1,48 @@
+import asyncio
+import numpy as np
+from helper import neo4j_timeline
+from helper.entity_adjacency import EntityAdjacency
+from helper.neo4j_timeline import _keep_top_k_links
+
+
+def _link(source, target, weight):
+    return {"source": source, "target": target, "weight": weight}
+
+
+def test_both_rel_directions_are_merged_into_one_link():
+    kept = _keep_top_k_links([_link("a", "b", 2), _link("b", "a", 3)], top_k=5)
+    assert kept == [_link("a", "b", 5)]
+
+
+def test_link_is_dropped_only_when_both_endpoints_have_top_k_heavier_links():
+    # a-c is the lightest link of both a and c; c still keeps b-c, which is b's second
+    links = [_link("a", "b", 3), _link("b", "c", 2), _link("a", "c", 1)]
+    kept = _keep_top_k_links(links, top_k=1)
+    assert kept == [_link("a", "b", 3), _link("b", "c", 2)]
+
+
+def test_heaviest_links_come_first_with_ties_broken_by_name():
+    kept = _keep_top_k_links([_link("c", "d", 2), _link("a", "b", 2), _link("x", "y", 5)], top_k=3)
+    assert [(l["source"], l["target"]) for l in kept] == [("x", "y"), ("a", "b"), ("c", "d")]
+
+
+def test_case_graph_ranks_entities_from_the_adjacency_and_reads_only_their_links(monkeypatch):
+    adjacency = EntityAdjacency(["a", "b", "c", "d"], ["person", "org", "org", "person"], {},
+                                np.asarray([3, 5, 1, 5]))
+    asked = []
+
+    async def get_entity_adjacency(case):
+        return adjacency
+
+    async def run_read_single(query, parameters=None, case=None):
+        asked.append(parameters)
+        return {"links": [_link("b", "d", 2), _link("d", "b", 1)]}
+
+    monkeypatch.setattr(neo4j_timeline, "get_entity_adjacency", get_entity_adjacency)
+    monkeypatch.setattr(neo4j_timeline, "run_read_single", run_read_single)
+    graph = asyncio.run(neo4j_timeline.get_case_entity_graph("Graph case", max_nodes=3, min_degree=2, min_weight=1, top_k=5))
+
+    assert [n["name"] for n in graph["nodes"]] == ["b", "d", "a"]
+    assert asked == [{"case": "Graph case", "names": ["b", "d", "a"], "minWeight": 1}]
+    assert graph["links"] == [{"source": "b", "target": "d", "value": 3}]
+    assert graph["meta"]["totalNodes"] == 4 and graph["meta"]["truncated"]
@@ -0,0 +1,59 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from helper import neo4j_timeline
+
+
+def _stub(monkeypatch, case):
+    calls = []
+
+    async def run(query, **params):
+        calls.append(("query", params))
+
+        class _Result:
+            async def single(self):
+                return {"case": case} if case else None
+        return _Result()
+
+    async def execute_write(work):
+        return await work(SimpleNamespace(run=run))
+
+    async def last_bookmarks():
+        return "bookmarks"
+
+    @asynccontextmanager
+    async def graph_session(case=None, **kwargs):
+        yield SimpleNamespace(execute_write=execute_write, last_bookmarks=last_bookmarks)
+
+    async def refresh_timeline_rows(tx, case, event_ids):
+        calls.append(("refresh", case, event_ids))
+
+    async def record_changes(tx, case, entries):
+        calls.append(("changes", case, entries))
+
+    monkeypatch.setattr(neo4j_timeline, "graph_session", graph_session)
+    monkeypatch.setattr(neo4j_timeline, "refresh_timeline_rows", refresh_timeline_rows)
+    monkeypatch.setattr(neo4j_timeline, "record_changes", record_changes)
+    monkeypatch.setattr(neo4j_timeline, "remember_bookmarks", lambda case, bookmarks: calls.append(("bookmarks", case)))
+    return calls
+
+
+def test_statement_edit_refreshes_the_row_logs_the_change_and_invalidates_reads(monkeypatch):
+    calls = _stub(monkeypatch, "Edit case")
+    version = neo4j_timeline.response_cache.version("Edit case")
+
+    assert asyncio.run(neo4j_timeline.update_event_statement("ev1", "New text")) is True
+
+    assert calls[0] == ("query", {"event_id": "ev1", "statement": "New text", "category": None, "date": None, "tag": None})
+    assert calls[1:] == [
+        ("refresh", "Edit case", ["ev1"]),
+        ("changes", "Edit case", [{"kind": "event", "op": "upsert", "key": "ev1"}]),
+        ("bookmarks", "Edit case"),
+    ]
+    assert neo4j_timeline.response_cache.version("Edit case") == version + 1
+
+
+def test_statement_edit_of_a_missing_event_reports_false(monkeypatch):
+    calls = _stub(monkeypatch, None)
+    assert asyncio.run(neo4j_timeline.update_event_statement("nope", "New text")) is False
+    assert [c[0] for c in calls] == ["query"]
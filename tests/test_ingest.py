@@ -0,0 +1,244 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+import pytest
+from data_processing import graph_db
+from helper import change_log, neo4j_timeline
+from helper.response_cache import ResponseCache
+from helper.timeline_projection import _CYPHER_ENTITY_DELTA
+from helper.vector_store import VectorStore
+
+_COUNTERS = SimpleNamespace(nodes_created=0, relationships_created=0, properties_set=0)
+
+
+class _Result:
+    def __init__(self, record=None, counters=_COUNTERS, rows=()):
+        self._record = record
+        self._counters = counters
+        self._rows = list(rows)
+
+    async def single(self):
+        return self._record
+
+    async def consume(self):
+        return SimpleNamespace(counters=self._counters)
+
+    async def data(self):
+        return self._rows
+
+
+class _Graph:
+    """Session stand-in that logs every query and helper call in order."""
+
+    def __init__(self):
+        self.log = []
+        self.fail_chunks = {}
+        self.previous = "new"
+        self.deleted = []
+        self.version = 0
+        self.entries = []
+        self.before_chunk = None
+
+    async def run(self, query, parameters=None, **kwargs):
+        params = {**(parameters or {}), **kwargs}
+        if query == change_log._CYPHER_RECORD_CHANGES:
+            self.log.append(("changes", params["changes"]))
+            self.version += 1
+            self.entries += [(self.version, ch) for ch in params["changes"]]
+            return _Result({"version": self.version})
+        if query == neo4j_timeline._CHANGES_SINCE_QUERY:
+            since = [ch for version, ch in self.entries if version > params["since"]]
+            return _Result({"version": self.version, "floor": 0, "changes": since})
+        if query == neo4j_timeline._CHANGED_EVENTS_QUERY:
+            return _Result(rows=[{"eventId": eid, "date": None} for eid in params["eventIds"]])
+        if query in (neo4j_timeline._CHANGED_ENTITIES_QUERY, neo4j_timeline._CHANGED_RELATIONS_QUERY):
+            return _Result()
+        self.log.append(("query", query, params))
+        if query == graph_db._ENTITY_MERGE_CYPHER:
+            # Pretend only names containing "new" did not exist yet
+            created = sum("new" in e["name"] for e in params["entities"])
+            return _Result(counters=SimpleNamespace(nodes_created=created, relationships_created=0, properties_set=created))
+        return _Result({"n": 0, "previous": self.previous})
+
+    async def execute_write(self, work, *args):
+        if getattr(work, "__name__", "") == "_write_chunk":
+            chunk_no = args[-1]
+            if self.before_chunk:
+                await self.before_chunk(chunk_no)
+            if self.fail_chunks.get(chunk_no):
+                self.fail_chunks[chunk_no] -= 1
+                self.log.append(("failed", chunk_no))
+                raise graph_db.TransientError("leader switch")
+        return await work(self, *args)
+
+    async def execute_read(self, work):
+        return await work(self)
+
+
+@pytest.fixture
+def graph(monkeypatch, tmp_path):
+    graph = _Graph()
+
+    @asynccontextmanager
+    async def graph_session(case=None, **kwargs):
+        yield graph
+
+    async def refresh_timeline_rows(tx, case, event_ids):
+        graph.log.append(("refresh", list(event_ids)))
+
+    async def embed_statements(statements):
+        return [[1.0, float(i)] for i in range(len(statements))]
+
+    async def known_event_ids(case_name, event_ids):
+        return set()
+
+    async def delete_file_from_neo4j(case, source, attempt=None):
+        graph.log.append(("delete source", source, attempt))
+        return graph.deleted
+
+    store = VectorStore(tmp_path / "case", "float32")
+    monkeypatch.setattr(graph_db, "graph_session", graph_session)
+    monkeypatch.setattr(graph_db, "refresh_timeline_rows", refresh_timeline_rows)
+    monkeypatch.setattr(neo4j_timeline, "graph_read_session", graph_session)
+    monkeypatch.setattr(neo4j_timeline, "response_cache", ResponseCache(max_entries=16, ttl_seconds=60))
+    monkeypatch.setattr(graph_db, "embed_statements", embed_statements)
+    monkeypatch.setattr(graph_db, "delete_file_from_neo4j", delete_file_from_neo4j)
+    monkeypatch.setattr(graph_db, "get_vector_store", lambda case: store)
+    monkeypatch.setattr(graph_db.neo4j_data_ingestor, "_known_event_ids", known_event_ids)
+    monkeypatch.setattr(graph_db.settings, "INGEST_CHUNK_ROWS", 2)
+    monkeypatch.setattr(graph_db.settings, "INGEST_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(graph_db.settings, "INGEST_MAX_RETRIES", 2)
+    return graph
+
+
+def _rows(n):
+    return [{"Date": f"2020-01-{i + 1:02d}", "Statement": f"Statement {i}", "Entities": f"Acme; Person {i}"}
+            for i in range(n)]
+
+
+def _push(rows):
+    return asyncio.run(graph_db.neo4j_data_ingestor.push("Case A", "doc.pdf", "Doc", rows))
+
+
+def _position(log, query):
+    return next(i for i, entry in enumerate(log) if entry[0] == "query" and entry[1] == query)
+
+
+def test_changes_are_logged_only_once_the_source_is_complete(graph):
+    counters = _push(_rows(3))
+    assert counters["chunks"] == 2
+
+    complete = _position(graph.log, graph_db._SOURCE_COMPLETE_CYPHER)
+    logged = [i for i, entry in enumerate(graph.log) if entry[0] == "changes"]
+    assert len(logged) == 2 and min(logged) > complete
+
+    events = [ch["key"] for i in logged for ch in graph.log[i][1] if ch["kind"] == "event"]
+    assert events == [graph_db.neo4j_data_ingestor._hash_event("Case A", r["Date"], r["Statement"]) for r in _rows(3)]
+    entities = {ch["key"] for i in logged for ch in graph.log[i][1] if ch["kind"] == "entity"}
+    assert entities == {"Acme", "Person 0", "Person 1", "Person 2"}
+
+
+def _ran(log, query):
+    return [entry for entry in log if entry[0] == "query" and entry[1] == query]
+
+
+def _ids(rows):
+    return [graph_db.neo4j_data_ingestor._hash_event("Case A", r["Date"], r["Statement"]) for r in rows]
+
+
+def test_a_failed_chunk_is_retried_and_the_ingest_completes(graph):
+    graph.fail_chunks = {1: 2}
+    _push(_rows(3))
+
+    assert [e for e in graph.log if e[0] == "failed"] == [("failed", 1), ("failed", 1)]
+    assert len(_ran(graph.log, graph_db._SOURCE_COMPLETE_CYPHER)) == 1
+    assert not [e for e in graph.log if e[0] == "delete source"]
+
+
+def test_a_new_source_is_marked_failed_and_removed_when_retries_run_out(graph):
+    graph.fail_chunks = {1: 3}
+    with pytest.raises(graph_db.TransientError):
+        _push(_rows(3))
+
+    assert len(_ran(graph.log, graph_db._SOURCE_FAILED_CYPHER)) == 1
+    assert [e for e in graph.log if e[0] == "delete source"] == [("delete source", "doc.pdf", None)]
+    assert not _ran(graph.log, graph_db._SOURCE_COMPLETE_CYPHER)
+    assert not [e for e in graph.log if e[0] == "changes"]
+
+
+def test_a_failed_reingest_keeps_the_previously_complete_source(graph):
+    graph.previous = "complete"
+    graph.fail_chunks = {1: 3}
+    rows = _rows(3)
+    # The first chunk's second event was new in this attempt and only this source held it
+    graph.deleted = _ids(rows)[1:2]
+    with pytest.raises(graph_db.TransientError):
+        _push(rows)
+
+    attempt = _ran(graph.log, graph_db._SOURCE_START_CYPHER)[0][2]["attempt"]
+    assert all(q[2]["attempt"] == attempt for q in _ran(graph.log, graph_db._CORE_CYPHER))
+    assert [e for e in graph.log if e[0] == "delete source"] == [("delete source", "doc.pdf", attempt)]
+    assert not _ran(graph.log, graph_db._SOURCE_FAILED_CYPHER)
+    assert len(_ran(graph.log, graph_db._SOURCE_RESTORED_CYPHER)) == 1
+    # The surviving event of the written chunk is shown and logged again
+    logged = [ch["key"] for e in graph.log if e[0] == "changes" for ch in e[1] if ch["kind"] == "event"]
+    assert logged == _ids(rows)[:1]
+
+
+def test_entity_counter_moves_by_the_entities_each_chunk_created(graph):
+    rows = _rows(3)
+    rows[0]["Entities"] = "Acme; new client"
+    rows[2]["Relations"] = [{"Subject": "Acme", "Predicate": "sued", "Object": "new court"}]
+    _push(rows)
+
+    merges = _ran(graph.log, graph_db._ENTITY_MERGE_CYPHER)
+    assert {e["name"]: e["type"] for e in merges[1][2]["entities"]} == {
+        "Acme": "other", "new court": None, "Person 2": "other",
+    }
+    deltas = [q[2]["delta"] for q in _ran(graph.log, _CYPHER_ENTITY_DELTA)]
+    assert deltas == [1, 1]
+
+
+def _delta(since=0):
+    neo4j_timeline.response_cache.bump("Case A")
+    return asyncio.run(neo4j_timeline.get_case_changes_since("Case A", since))
+
+
+def test_a_poller_sees_the_events_only_once_the_source_completes(graph):
+    seen = []
+
+    async def poll(chunk_no):
+        neo4j_timeline.response_cache.bump("Case A")
+        seen.append(await neo4j_timeline.get_case_changes_since("Case A", 0))
+
+    graph.before_chunk = poll
+    rows = _rows(3)
+    _push(rows)
+
+    # Mid-ingest, after the first chunk was written, the log has nothing to offer yet
+    assert [d["version"] for d in seen] == [0, 0]
+    assert all(d["events"]["upserted"] == [] for d in seen)
+    delta = _delta()
+    assert delta["version"] == 2
+    assert [e["eventId"] for e in delta["events"]["upserted"]] == _ids(rows)
+
+
+def test_a_failed_new_source_leaves_nothing_to_sync(graph):
+    graph.fail_chunks = {1: 3}
+    with pytest.raises(graph_db.TransientError):
+        _push(_rows(3))
+
+    delta = _delta()
+    assert delta["version"] == 0 and delta["events"]["upserted"] == []
+
+
+def test_write_with_retry_does_not_retry_other_errors(graph):
+    calls = []
+
+    async def work(tx):
+        calls.append(tx)
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError):
+        asyncio.run(graph_db.write_with_retry(graph, work))
+    assert len(calls) == 1
@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+from helper import semantic_search
+
+
+def _fake_reads(monkeypatch, indexed, case_rows_within):
+    """The index holds `indexed` events; this case's rows appear once `candidates` reaches each threshold."""
+    asked = []
+
+    async def run_read_single(query, parameters=None, case=None):
+        return {"events": indexed}
+
+    async def run_read(query, parameters=None, case=None):
+        asked.append(parameters["candidates"])
+        return [SimpleNamespace(data=lambda i=i: {"eventId": i})
+                for i, within in enumerate(case_rows_within) if within <= parameters["candidates"]]
+
+    monkeypatch.setattr(semantic_search, "run_read_single", run_read_single)
+    monkeypatch.setattr(semantic_search, "run_read", run_read)
+    monkeypatch.setattr(semantic_search, "indexed_events_cache", semantic_search.ResponseCache(1, 300))
+    return asked
+
+
+def test_candidates_are_scaled_by_the_case_share_of_the_index(monkeypatch):
+    monkeypatch.setattr(semantic_search.settings, "SEMANTIC_SEARCH_OVERSAMPLE", 10)
+    asked = _fake_reads(monkeypatch, indexed=100_000, case_rows_within=[0] * 5)
+
+    data = asyncio.run(semantic_search._vector_search({}, "", 5, case_events=10_000))
+    assert len(data) == 5
+    # 100 candidates for a case holding a tenth of the index
+    assert asked == [1000]
+
+
+def test_short_results_grow_the_request_then_fall_back(monkeypatch):
+    monkeypatch.setattr(semantic_search.settings, "SEMANTIC_SEARCH_OVERSAMPLE", 10)
+    monkeypatch.setattr(semantic_search.settings, "SEMANTIC_SEARCH_VECTOR_MAX_CANDIDATES", 5000)
+    asked = _fake_reads(monkeypatch, indexed=1_000_000, case_rows_within=[0, 3000, 10**9])
+
+    assert asyncio.run(semantic_search._vector_search({}, "", 3, case_events=100_000)) is None
+    assert asked == [1000, 4000, 5000]
+
+
+def test_index_wide_event_count_is_read_once_per_ttl(monkeypatch):
+    counted = []
+
+    async def run_read_single(query, parameters=None, case=None):
+        counted.append(query)
+        return {"events": 1000}
+
+    async def run_read(query, parameters=None, case=None):
+        return [SimpleNamespace(data=lambda: {"eventId": 1})]
+
+    monkeypatch.setattr(semantic_search, "run_read_single", run_read_single)
+    monkeypatch.setattr(semantic_search, "run_read", run_read)
+    monkeypatch.setattr(semantic_search, "indexed_events_cache", semantic_search.ResponseCache(1, 300))
+    for _ in range(3):
+        asyncio.run(semantic_search._vector_search({}, "", 1, case_events=100))
+    assert counted == [semantic_search._INDEXED_EVENTS_QUERY]
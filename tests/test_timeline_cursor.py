@@ -0,0 +1,19 @@
+import pytest
+from helper.neo4j_timeline import decode_timeline_cursor, encode_timeline_cursor
+
+
+def test_cursor_round_trips_date_and_event_id():
+    cursor = encode_timeline_cursor("2021-03-04", "ev/42?")
+    assert "=" not in cursor
+    assert decode_timeline_cursor(cursor) == ("2021-03-04", "ev/42?")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode_timeline_cursor("2021-13-40", "ev1"),
+    # valid base64 and JSON, but without an eventId
+    "eyJkYXRlIjoiMjAyMS0wMy0wNCJ9",
+])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_timeline_cursor(cursor)
@@ -0,0 +1,85 @@
+import asyncio
+from helper import timeline_projection as tp
+
+
+class _Result:
+    def __init__(self, record=None):
+        self._record = record
+
+    async def single(self):
+        return self._record
+
+    async def consume(self):
+        return None
+
+
+class _Tx:
+    """Transaction stand-in answering each projection query with a canned record."""
+
+    def __init__(self, records):
+        self.records = records
+        self.log = []
+
+    async def run(self, query, **params):
+        self.log.append((query, params))
+        return _Result(self.records.get(query))
+
+    def ran(self, query):
+        return [params for q, params in self.log if q == query]
+
+
+def _refresh(tx, event_ids):
+    asyncio.run(tp.refresh_timeline_rows(tx, "Case A", event_ids))
+
+
+def test_refresh_rebuilds_the_old_and_new_keys_of_edited_events():
+    tx = _Tx({
+        tp._CYPHER_DETACH_ROWS: {"keys": ["old"], "removed": 1, "dates": ["2020-01-05"]},
+        tp._CYPHER_REKEY_EVENTS: {"keys": ["new"]},
+        tp._CYPHER_DROP_KEYS: {"removed": 1, "dates": ["2020-01-01"]},
+        tp._CYPHER_BUILD_ROWS: {"added": 2, "minDate": "2020-01-01", "maxDate": "2020-01-09"},
+        tp._CYPHER_ROW_DELTA: {"boundRemoved": False},
+    })
+    _refresh(tx, ["e1", "e2"])
+
+    order = [q for q, _ in tx.log if q != tp._CYPHER_ROW_DELTA]
+    assert order == [tp._CYPHER_DETACH_ROWS, tp._CYPHER_REKEY_EVENTS, tp._CYPHER_DROP_KEYS, tp._CYPHER_BUILD_ROWS]
+    assert tx.ran(tp._CYPHER_DETACH_ROWS)[0]["eventIds"] == ["e1", "e2"]
+    # Rows sharing the detached key are rebuilt along with the new one
+    assert sorted(tx.ran(tp._CYPHER_DROP_KEYS)[0]["keys"]) == ["new", "old"]
+    assert tx.ran(tp._CYPHER_BUILD_ROWS)[0]["keys"] == tx.ran(tp._CYPHER_DROP_KEYS)[0]["keys"]
+
+    deltas = tx.ran(tp._CYPHER_ROW_DELTA)
+    assert [d["delta"] for d in deltas] == [-1, -1, 2]
+    assert [d["removedDates"] for d in deltas] == [["2020-01-05"], ["2020-01-01"], []]
+    assert (deltas[2]["addedMin"], deltas[2]["addedMax"]) == ("2020-01-01", "2020-01-09")
+    assert not tx.ran(tp._CYPHER_DATE_SPAN)
+
+
+def test_date_span_is_looked_up_again_only_when_a_bound_row_is_removed():
+    tx = _Tx({
+        tp._CYPHER_DETACH_ROWS: {"keys": ["k"], "removed": 1, "dates": ["2020-01-01"]},
+        tp._CYPHER_REKEY_EVENTS: {"keys": ["k"]},
+        tp._CYPHER_DROP_KEYS: {"removed": 0, "dates": []},
+        tp._CYPHER_BUILD_ROWS: {"added": 1, "minDate": "2020-01-02", "maxDate": "2020-01-02"},
+        tp._CYPHER_ROW_DELTA: {"boundRemoved": True},
+    })
+    _refresh(tx, ["e1"])
+
+    assert len(tx.ran(tp._CYPHER_DATE_SPAN)) == 3
+    tx.records[tp._CYPHER_ROW_DELTA] = {"boundRemoved": False}
+    tx.log.clear()
+    _refresh(tx, ["e1"])
+    assert not tx.ran(tp._CYPHER_DATE_SPAN)
+
+
+def test_events_without_rows_or_keys_only_touch_the_source_count():
+    tx = _Tx({
+        tp._CYPHER_DETACH_ROWS: {"keys": [], "removed": 0, "dates": []},
+        tp._CYPHER_REKEY_EVENTS: {"keys": []},
+        tp._CYPHER_ROW_DELTA: {"boundRemoved": False},
+    })
+    _refresh(tx, ["e1"])
+
+    assert not tx.ran(tp._CYPHER_DROP_KEYS) and not tx.ran(tp._CYPHER_BUILD_ROWS)
+    assert [d["delta"] for d in tx.ran(tp._CYPHER_ROW_DELTA)] == [0, 0]
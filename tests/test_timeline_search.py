@@ -0,0 +1,55 @@
+import asyncio
+from datetime import date
+from helper import neo4j_timeline
+
+
+def _capture_query(monkeypatch):
+    asked = []
+
+    async def run_read_single(query, parameters=None, case=None):
+        asked.append((query, parameters))
+        return {"total": 0, "rows": []}
+
+    monkeypatch.setattr(neo4j_timeline, "run_read_single", run_read_single)
+    return asked
+
+
+def test_date_filter_is_applied_before_the_hit_cap(monkeypatch):
+    asked = _capture_query(monkeypatch)
+    asyncio.run(neo4j_timeline.search_timeline_by_text("Case A", "contract", 0, 10, date(2020, 1, 1), None))
+
+    query, params = asked[0]
+    assert "{limit: $maxHits}" not in query
+    assert query.index("row.date >= date($start_date)") < query.index("LIMIT $maxHits")
+    assert params["start_date"] == "2020-01-01"
+
+
+def test_unfiltered_search_caps_hits_inside_the_index(monkeypatch):
+    asked = _capture_query(monkeypatch)
+    asyncio.run(neo4j_timeline.search_timeline_by_text("Case A", "invoice", 0, 10, None, None))
+
+    query, _ = asked[0]
+    assert "{limit: $maxHits}" in query
+    assert "WHERE" not in query
+
+
+def test_lucene_query_is_scoped_to_the_case_and_searches_both_fields():
+    assert neo4j_timeline._lucene_query("Case A", "breach") == (
+        'case:"Case A" AND (statement:(breach) OR entityText:(breach))'
+    )
+
+
+def test_lucene_operators_are_escaped_and_phrases_kept():
+    query = neo4j_timeline._lucene_query('Doe "v" Roe', 'title:x* "late payment" a&&b -c')
+    assert query.startswith('case:"Doe \\"v\\" Roe" AND ')
+    assert 'statement:(title\\:x\\* "late payment" a\\&&b \\-c)' in query
+
+
+def test_empty_terms_fall_back_to_an_empty_phrase():
+    assert 'statement:("")' in neo4j_timeline._lucene_query("Case A", '"')
+
+
+def test_boolean_keywords_are_searched_as_words():
+    assert "statement:(not)" in neo4j_timeline._lucene_query("Case A", "NOT")
+    assert "statement:(smith and)" in neo4j_timeline._lucene_query("Case A", "smith AND")
+    assert 'statement:(a or "B AND C")' in neo4j_timeline._lucene_query("Case A", 'a OR "B AND C"')
@@ -0,0 +1,147 @@
+import numpy as np
+import pytest
+from helper.vector_store import VectorStore
+
+
+def _vectors(n, dim, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return VectorStore(tmp_path / "case", "float32")
+
+
+def test_reencode_after_build_ivf_drops_stale_index(store):
+    vectors = _vectors(200, 64)
+    ids = [f"ev{i}" for i in range(200)]
+    store.add(ids, vectors)
+    store.build_ivf(nlist=8)
+    assert store.search(vectors[3], 1)[0][0] == "ev3"
+
+    store.reencode("int8", 32)
+
+    hits = store.search(vectors[3], 1)
+    assert hits[0][0] == "ev3"
+    assert store.get("ev3").shape == (32,)
+    assert not store._ivf_path().exists()
+
+
+def test_searches_stay_consistent_while_another_thread_compacts(store):
+    from concurrent.futures import ThreadPoolExecutor
+
+    vectors = _vectors(400, 32)
+    store.add([f"ev{i}" for i in range(400)], vectors)
+    store.delete([f"ev{i}" for i in range(0, 400, 2)])
+
+    def search(i):
+        return store.search(vectors[i], 1)[0][0]
+
+    with ThreadPoolExecutor(8) as pool:
+        pending = [pool.submit(search, i) for i in range(1, 400, 2)]
+        store.compact()
+        assert [f.result() for f in pending] == [f"ev{i}" for i in range(1, 400, 2)]
+    assert len(store) == 200
+
+
+def test_matching_only_accepts_ids_stored_with_the_same_vector(tmp_path):
+    vectors = _vectors(3, 16)
+    store = VectorStore(tmp_path / "case", "int8")
+    store.add(["a", "b"], vectors[:2])
+
+    # b is stored with a different vector and c was never copied
+    assert store.matching({"a": vectors[0], "b": vectors[2], "c": vectors[2]}) == ["a"]
+
+
+def _unit(v):
+    return v / np.linalg.norm(v)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_added_vectors_are_stored_normalized_and_searchable(tmp_path, dtype):
+    vectors = _vectors(50, 32)
+    store = VectorStore(tmp_path / "case", dtype)
+    store.add([f"ev{i}" for i in range(50)], vectors)
+
+    assert len(store) == 50
+    assert np.allclose(store.get("ev7"), _unit(vectors[7]), atol=0.01)
+    event_id, score = store.search(vectors[7] * 3, 1)[0]
+    assert event_id == "ev7" and score == pytest.approx(1, abs=0.01)
+    assert store.get("missing") is None
+
+
+def test_deleted_ids_disappear_and_readding_replaces_the_vector(store):
+    vectors = _vectors(4, 16)
+    store.add(["a", "b", "c"], vectors[:3])
+    store.delete(["b", "never-stored"])
+
+    assert store.ids() == ["a", "c"]
+    assert store.known(["a", "b"]) == {"a"}
+    assert "b" not in [event_id for event_id, _ in store.search(vectors[1], 3)]
+
+    store.add(["a"], vectors[3:4])
+    assert store.ids() == ["c", "a"]
+    assert np.allclose(store.get("a"), _unit(vectors[3]), atol=1e-6)
+
+
+def test_compact_keeps_live_vectors_and_drops_dead_rows(store):
+    vectors = _vectors(10, 8)
+    store.add([f"ev{i}" for i in range(10)], vectors)
+    store.delete([f"ev{i}" for i in range(5)])
+    size = store._vectors_path("float32").stat().st_size
+
+    store.compact()
+
+    assert store._vectors_path("float32").stat().st_size == size // 2
+    assert store.ids() == [f"ev{i}" for i in range(5, 10)]
+    assert np.allclose(store.get("ev8"), _unit(vectors[8]), atol=1e-6)
+    # Another handle on the same directory reads the compacted files
+    assert VectorStore(store.path).ids() == store.ids()
+
+
+def test_ivf_search_finds_rows_added_after_the_build(store):
+    vectors = _vectors(300, 32)
+    store.add([f"ev{i}" for i in range(200)], vectors[:200])
+    store.build_ivf(nlist=10)
+    store.add([f"ev{i}" for i in range(200, 300)], vectors[200:])
+
+    assert store.search(vectors[250], 1, nprobe=1)[0][0] == "ev250"
+    # Probing every list is exact
+    exact = store.search(vectors[5], 5, nprobe=10)
+    store.drop()
+    flat = VectorStore(store.path, "float32")
+    flat.add([f"ev{i}" for i in range(300)], vectors)
+    assert [i for i, _ in exact] == [i for i, _ in flat.search(vectors[5], 5)]
+
+
+def test_reencode_to_fewer_dimensions_renormalizes_rows(store):
+    vectors = _vectors(20, 64)
+    store.add([f"ev{i}" for i in range(20)], vectors)
+
+    store.reencode("int8", 16)
+
+    assert store.dtype == "int8"
+    assert store.ids() == [f"ev{i}" for i in range(20)]
+    assert np.allclose(store.get("ev4"), _unit(vectors[4][:16]), atol=0.01)
+    # Full-size queries are cut to the stored size
+    assert store.search(vectors[4], 1)[0][0] == "ev4"
+
+
+def test_rewrites_switch_generations_with_ids_and_vectors_together(store):
+    vectors = _vectors(6, 8)
+    store.add([f"ev{i}" for i in range(6)], vectors)
+    reader = VectorStore(store.path)
+    assert reader.search(vectors[5], 1)[0][0] == "ev5"
+
+    store.delete(["ev0", "ev1"])
+    store.compact()
+    first = store._root()
+    store.reencode("int8")
+
+    # Only the current generation and the one before it remain
+    assert sorted(p.name for p in store.path.glob("gen-*")) == [first.name, store._root().name]
+    assert not (store.path / "ids.log").exists()
+    # A reader that had loaded the original files picks up the new generation as a whole
+    assert reader.search(vectors[5], 1)[0][0] == "ev5"
+    assert reader.ids() == [f"ev{i}" for i in range(2, 6)]
+    assert len(reader._load().vectors) == 4